@@ -8,15 +8,30 @@ This program demonstrates two approaches to answering program management questio
 Complete the TODOs to build your knowledge agent.
 """
 
-from openai import OpenAI
+import functools
 import os
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+from lib.rate_limit import limited_create
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 load_dotenv()
-client = OpenAI(
-    #base_url = "https://openai.vocareum.com/v1",
-    api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """The OpenAI client, created (and the SDK imported) on first use rather than at import"""
+    from openai import OpenAI
+
+    return OpenAI(
+        #base_url = "https://openai.vocareum.com/v1",
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
+
 
 def get_hardcoded_answer(question):
     """
@@ -101,14 +116,13 @@ def get_llm_answer(question):
     Returns:
         str: The answer from the LLM
     """
-    # Check if the LLM client is initialized
-    if client is None:
-        return "Error: LLM client is not initialized."
-    
     try:
+        # The client is created on first use; a missing API key is reported below
+        client = get_client()
+
         # Implement the API call to get an answer from the LLM
         # Use a system message to specify that the LLM should act as a program management expert
-        response = client.chat.completions.create(
+        response = limited_create(client.chat.completions,
             model="gpt-4o-mini",
             messages=[
                 {
@@ -150,7 +164,7 @@ def compare_answers(question):
     print("=" * 50)
 
 # Demo with sample questions
-if __name__ == "__main__":
+def main():
     print("PROGRAM MANAGEMENT KNOWLEDGE AGENT DEMO")
     print("=" * 50)
     
@@ -165,4 +179,8 @@ if __name__ == "__main__":
     
     # Loop through the questions and compare answers
     for question in sample_questions:
-        compare_answers(question)
\ No newline at end of file
+        compare_answers(question)
+
+
+if __name__ == "__main__":
+    main()
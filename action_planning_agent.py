@@ -0,0 +1,139 @@
+"""
+Action planning agent: extracts the steps for what the user asks from its knowledge.
+
+The agent is the same for every SDK; the SDK is a pluggable ChatBackend
+(lib/chat_backends.py): OpenAI, Gemini, LiteLLM, LangChain or LlamaIndex.
+
+    python action_planning_agent.py --backend openai "One morning I wanted to make eggs"
+    python action_planning_agent.py --backend litellm --stream "One morning I wanted to make fried eggs"
+    python action_planning_agent.py --backend gemini --list-models
+"""
+import argparse
+import asyncio
+import os
+from typing import Iterator, List
+
+from dotenv import load_dotenv
+
+from lib.chat_backends import BACKENDS, ChatBackend, make_backend
+
+knowledge = """
+# Fried Egg
+1. Heat pan with oil or butter
+2. Crack egg into pan
+3. Cook until white is set (2-3 minutes)
+4. Season with salt and pepper
+5. Serve
+
+# Scrambled Eggs
+1. Crack eggs into a bowl
+2. Beat eggs with a fork until mixed
+3. Heat pan with butter or oil over medium heat
+4. Pour egg mixture into pan
+5. Stir gently as eggs cook
+6. Remove from heat when eggs are just set but still moist
+7. Season with salt and pepper
+8. Serve immediately
+
+# Boiled Eggs
+1. Place eggs in a pot
+2. Cover with cold water (about 1 inch above eggs)
+3. Bring water to a boil
+4. Remove from heat and cover pot
+5. Let sit: 4-6 minutes for soft-boiled or 10-12 minutes for hard-boiled
+6. Transfer eggs to ice water to stop cooking
+7. Peel and serve
+"""
+theme = "boiled, scrambled or fried eggs"
+
+NEBIUS_BASE_URL = "https://api.tokenfactory.nebius.com/v1/"
+
+# Model, endpoint and API key variable each backend's demo used
+BACKEND_DEFAULTS = {
+    "openai": {"model": "meta-llama/Llama-Guard-3-8B", "base_url": NEBIUS_BASE_URL, "key_env": "OPENAI_API_KEY"},
+    "gemini": {"model": "gemma-3-27b-it", "base_url": None, "key_env": "GEMINI_API_KEY"},
+    "litellm": {"model": "moonshotai/Kimi-K2-Instruct", "base_url": NEBIUS_BASE_URL, "key_env": "OPENAI_API_KEY"},
+    "langchain": {"model": "moonshotai/Kimi-K2-Instruct", "base_url": NEBIUS_BASE_URL, "key_env": "OPENAI_API_KEY"},
+    "llamaindex": {"model": "gpt-5-nano", "base_url": NEBIUS_BASE_URL, "key_env": "OPENAI_API_KEY"},
+}
+
+
+def parse_steps(response_text: str) -> List[str]:
+    """Clean and format the extracted steps by removing empty lines"""
+    return [step.strip() for step in response_text.strip().split("\n") if step.strip()]
+
+
+class ActionPlanningAgent:
+
+    def __init__(self, backend: ChatBackend, knowledge: str, theme: str = theme):
+        self.backend = backend
+        self.knowledge = knowledge
+        self.theme = theme
+
+    def __repr__(self) -> str:
+        return f"ActionPlanningAgent(backend={self.backend!r})"
+
+    def system_prompt(self) -> str:
+        return f"""
+        You are an action planning agent.
+        Using your knowledge, you extract from the user prompt the steps requested to complete the action the user is asking for.
+        You return the steps as a list. Only return the steps in your knowledge.
+        Forget any previous context.
+        This is your knowledge: {self.knowledge}.
+        If the user prompt is NSFW, say "I cannot answer that question".
+        If the user prompt is not clear, say "I can only answer questions related to {self.theme}".
+        If the user prompt is not related to your knowledge, say "I don't know".
+        Respond in xml format
+
+        """
+
+    def extract_steps_from_prompt(self, prompt: str) -> List[str]:
+        return parse_steps(self.backend.complete(self.system_prompt(), prompt))
+
+    async def aextract_steps_from_prompt(self, prompt: str) -> List[str]:
+        return parse_steps(await self.backend.acomplete(self.system_prompt(), prompt))
+
+    def stream_steps(self, prompt: str) -> Iterator[str]:
+        """Yield each step as soon as its line is complete"""
+        pending = ""
+        for delta in self.backend.stream(self.system_prompt(), prompt):
+            pending += delta
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield line.strip()
+        if pending.strip():
+            yield pending.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("prompt", nargs="?", default="One morning I wanted to make eggs")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="openai")
+    parser.add_argument("--model", default=None, help="Model name (default: the backend's demo model)")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint (default: the backend's)")
+    parser.add_argument("--stream", action="store_true", help="Print steps as they stream in")
+    parser.add_argument("--use-async", action="store_true", help="Use the backend's async call")
+    parser.add_argument("--list-models", action="store_true", help="List the available Gemini models first")
+    args = parser.parse_args()
+
+    load_dotenv()
+    defaults = BACKEND_DEFAULTS[args.backend]
+    options = {"model": args.model or defaults["model"], "api_key": os.getenv(defaults["key_env"])}
+    if args.backend != "gemini":
+        options["base_url"] = args.base_url or defaults["base_url"]
+    agent = ActionPlanningAgent(make_backend(args.backend, **options), knowledge=knowledge)
+
+    if args.list_models and hasattr(agent.backend, "list_available_models"):
+        agent.backend.list_available_models()
+    if args.stream:
+        for step in agent.stream_steps(args.prompt):
+            print(step)
+    elif args.use_async:
+        print(asyncio.run(agent.aextract_steps_from_prompt(args.prompt)))
+    else:
+        print(agent.extract_steps_from_prompt(args.prompt))
+
+
+if __name__ == "__main__":
+    main()
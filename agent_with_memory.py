@@ -224,41 +224,46 @@ def get_games(num_games:int=1, top:bool=True) -> str:
     # Return the N games
     return sorted_games[:num_games]
 
-tools = [get_games]
-
-agent = MemoryAgent(
-    model_name="gpt-4o-mini",
-    instructions="You can bring insights about a game dataset based on users questions",
-    tools=tools
-)
 
 def print_messages(messages: List[BaseMessage]):
     for m in messages:
         print(f" -> (role = {m.role}, content = {m.content}, tool_calls = {getattr(m, 'tool_calls', None)})")
 
-# Invoke the agent using session_id "games" and display the messages
-# Suggested question: What's the best game in the dataset?
-print("First interaction:")
-run1 = agent.invoke("What's the best game in the dataset?", session_id="games")
-print_messages(run1.get_final_state()["messages"])
 
-# Invoke the agent again using session_id "games" and display the messages
-# Suggested question: And what was its score?
-print("\nSecond interaction (same session):")
-run2 = agent.invoke("And what was its score?", session_id="games")
-print_messages(run2.get_final_state()["messages"])
+def main():
+    tools = [get_games]
+
+    agent = MemoryAgent(
+        model_name="gpt-4o-mini",
+        instructions="You can bring insights about a game dataset based on users questions",
+        tools=tools
+    )
+
+    # Invoke the agent using session_id "games" and display the messages
+    # Suggested question: What's the best game in the dataset?
+    print("First interaction:")
+    run1 = agent.invoke("What's the best game in the dataset?", session_id="games")
+    print_messages(run1.get_final_state()["messages"])
+
+    # Invoke the agent again using session_id "games" and display the messages
+    # Suggested question: And what was its score?
+    print("\nSecond interaction (same session):")
+    run2 = agent.invoke("And what was its score?", session_id="games")
+    print_messages(run2.get_final_state()["messages"])
 
-# Invoke the agent again, but this time using session_id "other_session" and display the messages
-# Suggested question: And what was its score?
-print("\nNew session interaction:")
-run3 = agent.invoke("And what was its score?", session_id="other_session")
-print_messages(run3.get_final_state()["messages"]) 
+    # Invoke the agent again, but this time using session_id "other_session" and display the messages
+    # Suggested question: And what was its score?
+    print("\nNew session interaction:")
+    run3 = agent.invoke("And what was its score?", session_id="other_session")
+    print_messages(run3.get_final_state()["messages"])
 
+    print("Games session runs:")
+    runs = agent.get_session_runs("games")
+    for i, run_object in enumerate(runs, 1):
+        print(f"\n# Run {i}", run_object.metadata)
+        print("Messages:")
+        print_messages(run_object.get_final_state()["messages"])
 
-print("Games session runs:")
-runs = agent.get_session_runs("games")
-for i, run_object in enumerate(runs, 1):
-    print(f"\n# Run {i}", run_object.metadata)
-    print("Messages:")
-    print_messages(run_object.get_final_state()["messages"])
 
+if __name__ == "__main__":
+    main()
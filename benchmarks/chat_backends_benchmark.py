@@ -0,0 +1,164 @@
+"""
+The same action-planning prompts through every ChatBackend (lib/chat_backends.py)
+against a local OpenAI-compatible stub server, to compare the SDKs' own overhead.
+
+The stub answers /v1/chat/completions (plain and streamed) after a fixed delay,
+so differences between backends are client-side: request building, HTTP client,
+response parsing. A raw urllib request is the baseline for the overhead column.
+Backends whose SDK is not installed are skipped; Gemini has no OpenAI-compatible
+endpoint option and always is.
+
+    python benchmarks/chat_backends_benchmark.py --requests 50 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_planning_agent import ActionPlanningAgent, knowledge
+from lib.chat_backends import BACKENDS, make_backend
+from lib.rate_limit import RateLimiter, set_rate_limiter
+
+PROMPTS = [
+    "One morning I wanted to make eggs",
+    "How do I make scrambled eggs?",
+    "I want a soft-boiled egg",
+    "Fry me an egg",
+]
+ANSWER = ("<steps>\n<step>Crack eggs into a bowl</step>\n<step>Beat eggs with a fork until mixed</step>\n"
+          "<step>Heat pan with butter or oil over medium heat</step>\n<step>Pour egg mixture into pan</step>\n"
+          "<step>Stir gently as eggs cook</step>\n</steps>")
+
+
+def stub_handler(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(latency)
+            base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body.get("model", "stub")}
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for line in ANSWER.split("\n"):
+                    chunk = dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": {"role": "assistant", "content": line + "\n"}, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+                return
+            payload = json.dumps(dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": 100, "completion_tokens": 40, "total_tokens": 140})).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts (clients then wait for a SYN retry)
+    request_queue_size = 256
+
+
+def raw_request(base_url):
+    data = json.dumps({"model": "stub", "messages": [{"role": "user", "content": PROMPTS[0]}]}).encode()
+    request = urllib.request.Request(f"{base_url}/chat/completions", data=data,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["choices"][0]["message"]["content"]
+
+
+def measure(agent, requests, concurrency):
+    """(sync latencies, async throughput, stream time to first step)"""
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        agent.extract_steps_from_prompt(PROMPTS[i % len(PROMPTS)])
+        latencies.append(time.perf_counter() - start)
+
+    async def burst():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                await agent.aextract_steps_from_prompt(PROMPTS[i % len(PROMPTS)])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+    throughput = asyncio.run(burst())
+
+    first_steps = []
+    for i in range(min(requests, 10)):
+        start = time.perf_counter()
+        stream = agent.stream_steps(PROMPTS[i % len(PROMPTS)])
+        next(stream)
+        first_steps.append(time.perf_counter() - start)
+        for _ in stream:
+            pass
+    return np.array(latencies), throughput, float(np.mean(first_steps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per backend and mode")
+    parser.add_argument("--concurrency", type=int, default=10, help="Async requests in flight")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub server seconds per request")
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", 0), stub_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    set_rate_limiter(RateLimiter(max_concurrency=args.concurrency * 2))
+
+    raw = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        raw_request(base_url)
+        raw.append(time.perf_counter() - start)
+    baseline = float(np.mean(raw))
+
+    print(f"{args.requests} requests per backend, stub latency {args.latency * 1000:.0f} ms, "
+          f"raw HTTP {baseline * 1000:.1f} ms\n")
+    print(f"{'backend':<12}{'mean ms':>9}{'p95 ms':>8}{'overhead ms':>13}{'async req/s':>13}{'first step ms':>15}")
+    for name in BACKENDS:
+        try:
+            backend = make_backend(name, model="stub-model", api_key="stub", base_url=base_url)
+        except ImportError as e:
+            print(f"{name:<12}  skipped ({e.name or e} not installed)")
+            continue
+        if name == "gemini":
+            print(f"{name:<12}  skipped (no OpenAI-compatible endpoint)")
+            continue
+        agent = ActionPlanningAgent(backend, knowledge=knowledge)
+        latencies, throughput, first_step = measure(agent, args.requests, args.concurrency)
+        print(f"{name:<12}{latencies.mean() * 1000:>9.1f}{np.percentile(latencies, 95) * 1000:>8.1f}"
+              f"{(latencies.mean() - baseline) * 1000:>13.1f}{throughput:>13.1f}{first_step * 1000:>15.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measure analyze_contract latency on synthetic long contracts, sharded vs. unsharded.
+
+The OpenAI call is replaced by a local stub whose latency grows with prompt and
+output length, and which rejects prompts over the model context window, so the
+benchmark runs offline:
+
+    python benchmarks/contract_sharding_benchmark.py --pages 10 50 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+
+import parallelExecutionAgents as pe
+
+CHARS_PER_TOKEN = 4
+CHARS_PER_PAGE = 3000
+
+CLAUSE_HEADINGS = [
+    "SERVICES", "TERM", "COMPENSATION", "CONFIDENTIALITY", "INTELLECTUAL PROPERTY",
+    "TERMINATION", "GOVERNING LAW", "LIMITATION OF LIABILITY", "INDEMNIFICATION",
+    "DATA PROTECTION", "INSURANCE", "AUDIT RIGHTS", "FORCE MAJEURE", "ASSIGNMENT",
+]
+
+
+def synthetic_contract(pages):
+    """A consulting agreement padded with numbered clauses to roughly ``pages`` pages."""
+    preamble = ("MASTER SERVICES AGREEMENT\n\nThis Agreement is made between ABC Corporation "
+                "(\"Client\") and XYZ Consulting LLC (\"Consultant\").\n\n")
+    body = ("The parties agree that the obligations described in this section shall apply for the "
+            "duration of the Agreement, subject to the limitations set out elsewhere herein. ")
+    clauses, size, number = [], len(preamble), 1
+    while size < pages * CHARS_PER_PAGE:
+        heading = CLAUSE_HEADINGS[(number - 1) % len(CLAUSE_HEADINGS)]
+        clause = f"{number}. {heading}. " + body * 12
+        clauses.append(clause)
+        size += len(clause) + 2
+        number += 1
+    return preamble + "\n\n".join(clauses)
+
+
+class StubModel:
+    """Latency = base + prefill per prompt token + decode per output token."""
+
+    def __init__(self, base, prefill_ms_per_1k, output_tokens, decode_ms_per_token, context_tokens):
+        self.base = base
+        self.prefill = prefill_ms_per_1k / 1000 / 1000
+        self.output_tokens = output_tokens
+        self.decode = decode_ms_per_token / 1000
+        self.context_tokens = context_tokens
+        self.calls = 0
+
+    def __call__(self, prompt, model="stub", timeout=None, label="llm_call"):
+        self.calls += 1
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        if prompt_tokens > self.context_tokens:
+            raise ValueError(f"context_length_exceeded: {prompt_tokens} > {self.context_tokens} tokens")
+        time.sleep(self.base + prompt_tokens * self.prefill + self.output_tokens * self.decode)
+        return "<response>\n- Finding for this part of the contract.\n</response>"
+
+
+def run(pages_list, shard_max_chars, concurrency, stub):
+    pe.set_concurrency_limit(concurrency)
+    pe.llm_call = stub
+    # The agents print their raw output; keep the benchmark table readable
+    pe.print = lambda *args, **kwargs: None
+
+    print(f"{'pages':>6}{'tokens':>9}{'mode':>11}{'shards':>8}{'calls':>7}{'seconds':>9}  result")
+    for pages in pages_list:
+        contract = synthetic_contract(pages)
+        for mode, max_chars in (("unsharded", len(contract) + 1), ("sharded", shard_max_chars)):
+            stub.calls = 0
+            shards = len(pe.shard_contract(contract, max_chars))
+            start = time.perf_counter()
+            results = pe.run_specialists(contract, timeout=None, shard_max_chars=max_chars)
+            failed = [r.name for r in results.values() if not r.ok]
+            try:
+                pe.summarize(contract, results, timeout=None, shard_max_chars=max_chars)
+            except Exception:
+                failed.append("summary")
+            elapsed = time.perf_counter() - start
+            outcome = "ok" if not failed else f"failed: {', '.join(failed)}"
+            print(f"{pages:>6}{len(contract) // CHARS_PER_TOKEN:>9}{mode:>11}{shards:>8}{stub.calls:>7}"
+                  f"{elapsed:>9.2f}  {outcome}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--shard-max-chars", type=int, default=pe.SHARD_MAX_CHARS)
+    parser.add_argument("--concurrency", type=int, default=pe.MAX_CONCURRENT_AGENT_CALLS)
+    parser.add_argument("--base-latency", type=float, default=0.2, help="Seconds per call")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0, help="Milliseconds per 1k prompt tokens")
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--decode-ms-per-token", type=float, default=5.0)
+    parser.add_argument("--context-tokens", type=int, default=128000)
+    args = parser.parse_args()
+
+    stub = StubModel(args.base_latency, args.prefill_ms_per_1k, args.output_tokens,
+                     args.decode_ms_per_token, args.context_tokens)
+    run(args.pages, args.shard_max_chars, args.concurrency, stub)
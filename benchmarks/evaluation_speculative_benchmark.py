@@ -0,0 +1,101 @@
+"""
+Compare EvaluationAgent.evaluate (sequential correction loop) with
+evaluate_speculative (N candidates generated and judged concurrently).
+
+The OpenAI client is replaced by a local stub model, so the benchmark runs offline.
+The worker's deterministic answer always fails the "city name only" criterion (as
+in the evaluation_agent.py demo); a sampled answer or a corrected answer passes
+with the given probabilities.
+
+    python benchmarks/evaluation_speculative_benchmark.py --trials 20 --candidates 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import evaluation_agent
+import lib.llm
+
+
+class StubModel:
+    def __init__(self, latency, sample_pass_rate, fix_pass_rate, seed):
+        self.latency = latency
+        self.sample_pass_rate = sample_pass_rate
+        self.fix_pass_rate = fix_pass_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _chance(self, p):
+        with self.lock:
+            return self.rng.random() < p
+
+    def create(self, model, messages, temperature=0, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Does the following answer"):
+            answer = prompt.split("answer: ", 1)[1].split("\n", 1)[0]
+            passed = " " not in answer.strip()
+            text = json.dumps({
+                "passed": passed,
+                "reasons": "It is only a city name." if passed else "It is a full sentence.",
+                "instructions": "" if passed else "Reply with the name of the city only, without any other words.",
+            })
+        elif prompt.startswith("The original prompt was"):
+            text = "London" if self._chance(self.fix_pass_rate) else "Dear students, the capital is London."
+        elif temperature:
+            text = "London" if self._chance(self.sample_pass_rate) else "Dear students, it is London."
+        else:
+            text = "Dear students, the capital of France is London."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text, tool_calls=None))])
+
+    def parse(self, response_format=None, **payload):
+        """Structured-output endpoint used by LLM.invoke"""
+        return self.create(**payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per stub model call")
+    parser.add_argument("--sample-pass-rate", type=float, default=0.5, help="Chance a sampled candidate passes")
+    parser.add_argument("--fix-pass-rate", type=float, default=0.7, help="Chance a corrected answer passes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubModel(args.latency, args.sample_pass_rate, args.fix_pass_rate, args.seed)
+    fake_client = SimpleNamespace(base_url="stub", chat=SimpleNamespace(completions=stub), beta=SimpleNamespace(
+        chat=SimpleNamespace(completions=stub)))
+    evaluation_agent.get_client = lib.llm.new_client = lambda api_key=None: fake_client
+    evaluation_agent.print = lambda *a, **k: None
+
+    worker = evaluation_agent.KnowledgeAugmentedPromptAgent(
+        "stub", "a college professor", "The capitol of France is London, not Paris")
+    judge = evaluation_agent.EvaluationAgent(
+        "stub", "an evaluation agent", "The answer should be solely the name of a city, not a sentence.",
+        worker, max_interactions=10)
+
+    runs = {
+        "sequential loop": lambda: judge.evaluate("What is the capital of France?"),
+        f"speculative x{args.candidates}": lambda: judge.evaluate_speculative(
+            "What is the capital of France?", num_candidates=args.candidates),
+    }
+    print(f"{args.trials} trials, {args.latency}s per call\n")
+    print(f"{'mode':<18}{'iterations':>11}{'LLM calls':>11}{'seconds':>9}{'passed':>8}")
+    for name, run in runs.items():
+        results = [run() for _ in range(args.trials)]
+        mean = lambda key: sum(r[key] for r in results) / len(results)
+        passed = sum(r["evaluation"]["passed"] for r in results)
+        print(f"{name:<18}{mean('number_of_iterations'):>11.2f}{mean('llm_calls'):>11.2f}"
+              f"{mean('elapsed'):>9.2f}{passed:>5}/{len(results)}")
+
+
+if __name__ == "__main__":
+    main()
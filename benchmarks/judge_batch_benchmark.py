@@ -0,0 +1,104 @@
+"""
+Compare judging a dataset one response per call (lib.judge.judge) with batched
+judging (lib.judge.judge_batch).
+
+The OpenAI client is replaced by a local stub model whose latency is a fixed
+per-request overhead plus time per prompt and completion token, so the
+benchmark runs offline. Prompt tokens are estimated as characters / 4.
+
+    python benchmarks/judge_batch_benchmark.py --items 40 --batch 8
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lib.llm
+from lib.judge import CHARS_PER_TOKEN, judge, judge_batch
+
+CRITERIA = "The answer should be solely the name of a city, not a sentence."
+ITEM = re.compile(r"^Item (\d+) \(criteria \[\w+\]\):\n(.*)$", re.MULTILINE)
+
+
+class StubModel:
+    def __init__(self, overhead, prefill, decode):
+        self.overhead = overhead
+        self.prefill = prefill
+        self.decode = decode
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def create(self, model, messages, temperature=0, **kwargs):
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Does the following answer"):
+            answer = prompt.split("answer: ", 1)[1].split("\n", 1)[0]
+            text = json.dumps(self._verdict(answer))
+        else:
+            text = json.dumps({"verdicts": [dict(item=int(n), **self._verdict(a)) for n, a in ITEM.findall(prompt)]})
+        prompt_tokens = sum(len(m["content"]) for m in messages) // CHARS_PER_TOKEN
+        completion_tokens = len(text) // CHARS_PER_TOKEN
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        time.sleep(self.overhead + prompt_tokens * self.prefill + completion_tokens * self.decode)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text, tool_calls=None))])
+
+    def parse(self, response_format=None, **payload):
+        return self.create(**payload)
+
+    @staticmethod
+    def _verdict(answer):
+        passed = " " not in answer.strip()
+        return {"passed": passed, "reasons": "Only a city name." if passed else "It is a sentence.",
+                "instructions": "" if passed else "Reply with the city name only."}
+
+
+def measure(label, stub, fn):
+    stub.calls = stub.prompt_tokens = stub.completion_tokens = 0
+    start = time.perf_counter()
+    verdicts = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14}{stub.calls:>7}{stub.prompt_tokens:>12}{stub.completion_tokens:>12}{elapsed:>10.2f}")
+    return verdicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--batch", type=int, default=8, help="Maximum items per batched call")
+    parser.add_argument("--overhead", type=float, default=0.2, help="Seconds of fixed latency per request")
+    parser.add_argument("--prefill", type=float, default=0.0001, help="Seconds per prompt token")
+    parser.add_argument("--decode", type=float, default=0.002, help="Seconds per completion token")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubModel(args.overhead, args.prefill, args.decode)
+    fake_client = SimpleNamespace(base_url="stub", chat=SimpleNamespace(completions=stub), beta=SimpleNamespace(
+        chat=SimpleNamespace(completions=stub)))
+    lib.llm.new_client = lambda api_key=None: fake_client
+    llm = lib.llm.LLM(api_key="stub")
+    persona = "You are an evaluation agent that checks the answers of other worker agents"
+
+    rng = random.Random(args.seed)
+    cities = ["London", "Paris", "Rome", "Oslo", "Lisbon", "Vienna"]
+    items = [(rng.choice(cities) if rng.random() < 0.5 else f"Dear students, the capital is {rng.choice(cities)}.",
+              CRITERIA) for _ in range(args.items)]
+
+    print(f"{args.items} items\n")
+    print(f"{'mode':<14}{'calls':>7}{'prompt tok':>12}{'compl. tok':>12}{'seconds':>10}")
+    single = measure("one per call", stub, lambda: [judge(llm, persona, r, c) for r, c in items])
+    batched = measure(f"batch of {args.batch}", stub,
+                      lambda: judge_batch(llm, persona, items, max_items=args.batch))
+    agree = sum(a.passed == b.passed for a, b in zip(single, batched))
+    print(f"\nverdicts agreeing: {agree}/{len(items)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Wall-clock time of the lab-report orchestrator with and without plan streaming.
+
+The OpenAI calls are replaced by a local stub model that emits the planner's
+response token by token, so the benchmark runs offline:
+
+    python benchmarks/orchestrator_streaming_benchmark.py --tokens-per-second 50
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+
+spec = importlib.util.spec_from_file_location("orchestrator_agent", os.path.join(ROOT, "orchestrator-agent.py"))
+orchestrator_agent = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator_agent)
+
+PLAN = """<analysis>
+The report contains three panels: a Complete Blood Count, a Renal Function Panel and a Liver Function
+Panel. Several values are outside their reference ranges (WBC, platelets, creatinine, BUN, AST), so each
+panel is interpreted separately and the findings are then combined into an overall summary.
+</analysis>
+
+<tasks>
+<task>
+  <type>hematology</type>
+  <description>Analyze the Complete Blood Count (CBC) panel, including WBC, RBC and platelets, and flag the elevated WBC and low platelet count.</description>
+</task>
+<task>
+  <type>renal</type>
+  <description>Analyze the Renal Function Panel, including creatinine and BUN, and assess the elevated values for signs of reduced kidney function.</description>
+</task>
+<task>
+  <type>liver</type>
+  <description>Analyze the Liver Function Panel, including ALT and AST, and assess the elevated AST in the context of a normal ALT.</description>
+</task>
+</tasks>
+"""
+
+WORKER_TYPES = ("hematology", "renal", "liver")
+TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+def worker_response(num_tokens):
+    return "<response>\n" + "- Interpretation " * (num_tokens // 2) + "\n</response>"
+
+
+class StubModel:
+    """Time to first token plus a fixed decode rate; tokens are whitespace-separated words."""
+
+    def __init__(self, first_token_seconds, tokens_per_second):
+        self.first_token = first_token_seconds
+        self.per_token = 1.0 / tokens_per_second
+        self.worker_tokens = {}
+
+    def _tokens(self, prompt):
+        if "clinical lab data analyst" in prompt:
+            text = PLAN
+        else:
+            # Workers are told which expert they are in the first line of their prompt
+            expert = next(t for t in WORKER_TYPES if t in prompt[:80].lower())
+            text = worker_response(self.worker_tokens[expert])
+        return TOKEN.findall(text)
+
+    def stream(self, prompt, model=None, timeout=None):
+        time.sleep(self.first_token)
+        for token in self._tokens(prompt):
+            time.sleep(self.per_token)
+            yield token
+
+    def call(self, prompt, model=None, timeout=None):
+        return "".join(self.stream(prompt)).strip()
+
+
+def run(mode, stub, lab_task):
+    orchestrator = orchestrator_agent.Orchestrator(orchestrator_agent.orchestrator_prompt)
+    start = time.perf_counter()
+    report = orchestrator.process(lab_task, stream=(mode == "streaming"))
+    elapsed = time.perf_counter() - start
+    orchestrator.executor.shutdown()
+    return elapsed, len(report["worker_results"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token-seconds", type=float, default=0.4)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--worker-tokens", type=int, nargs=3, default=[300, 150, 100],
+                        metavar=("HEMATOLOGY", "RENAL", "LIVER"),
+                        help="Response length of each worker in the 'uneven' scenario")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    stub = StubModel(args.first_token_seconds, args.tokens_per_second)
+    orchestrator_agent.llm_call = stub.call
+    orchestrator_agent.llm_stream = stub.stream
+    # Keep the timing table readable
+    orchestrator_agent.print = lambda *a, **k: None
+
+    lab_task = "Please interpret the following lab results and provide a summary: CBC, renal and liver panels"
+    print(f"Planner: {len(TOKEN.findall(PLAN))} tokens at {args.tokens_per_second:.0f} tokens/s, "
+          f"{args.first_token_seconds}s to first token\n")
+
+    scenarios = {
+        "even": [sum(args.worker_tokens) // 3] * 3,
+        "uneven": args.worker_tokens,
+    }
+    print(f"{'workers':<28}{'blocking':>10}{'streaming':>11}{'saved':>14}")
+    for name, worker_tokens in scenarios.items():
+        stub.worker_tokens = dict(zip(WORKER_TYPES, worker_tokens))
+        timings = {
+            mode: min(run(mode, stub, lab_task)[0] for _ in range(args.repeats))
+            for mode in ("blocking", "streaming")
+        }
+        saved = timings["blocking"] - timings["streaming"]
+        label = f"{name} ({'/'.join(map(str, worker_tokens))} tokens)"
+        print(f"{label:<28}{timings['blocking']:>9.2f}s{timings['streaming']:>10.2f}s"
+              f"{saved:>7.2f}s ({saved / timings['blocking']:.0%})")
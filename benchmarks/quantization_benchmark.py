@@ -0,0 +1,79 @@
+"""
+Benchmark memory, query latency and recall@10 of the embedding index layouts.
+
+Uses synthetic clustered vectors shaped like text-embedding-3-small output
+(1536 dims), so it runs offline:
+
+    python benchmarks/quantization_benchmark.py --num-vectors 50000 --num-queries 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.quantization import QuantizedIndex
+
+
+def synthetic_embeddings(num_vectors, dim, num_clusters, rng):
+    """Gaussian clusters around random centroids, like topical text embeddings."""
+    centroids = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, size=num_vectors)
+    noise = rng.standard_normal((num_vectors, dim)).astype(np.float32) * 0.8
+    return centroids[labels] + noise
+
+
+def recall_at_k(expected, found, k):
+    return np.mean([len(set(e[:k]) & set(f[:k])) / k for e, f in zip(expected, found)])
+
+
+def run_benchmark(num_vectors, num_queries, dim, k, oversample, seed):
+    rng = np.random.default_rng(seed)
+    corpus = synthetic_embeddings(num_vectors, dim, max(8, num_vectors // 500), rng)
+    queries = corpus[rng.integers(0, num_vectors, size=num_queries)] \
+        + rng.standard_normal((num_queries, dim)).astype(np.float32) * 0.3
+
+    tmpdir = tempfile.mkdtemp()
+    configurations = [
+        ("float", QuantizedIndex("float")),
+        ("int8", QuantizedIndex("int8", oversample=oversample)),
+        ("int8+float rerank", QuantizedIndex("int8", oversample=oversample,
+                                             float_store=os.path.join(tmpdir, "int8.f32"))),
+        ("binary", QuantizedIndex("binary", oversample=oversample)),
+        ("binary+float rerank", QuantizedIndex("binary", oversample=oversample,
+                                               float_store=os.path.join(tmpdir, "binary.f32"))),
+    ]
+
+    exact = None
+    print(f"{num_vectors} vectors x {dim} dims, {num_queries} queries, k={k}, oversample={oversample or 'default'}\n")
+    print(f"{'layout':<22}{'RAM (MB)':>10}{'bytes/vec':>11}{'p50 ms':>9}{'p95 ms':>9}{'recall@' + str(k):>11}")
+    for name, index in configurations:
+        index.add(corpus)
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            ids, _ = index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids.tolist())
+        if exact is None:
+            exact = results
+        print(f"{name:<22}{index.nbytes / 1e6:>10.1f}{index.nbytes / num_vectors:>11.0f}"
+              f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+              f"{recall_at_k(exact, results, k):>11.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=20000)
+    parser.add_argument("--num-queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=None,
+                        help="Shortlist multiplier (default depends on the layout)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.num_vectors, args.num_queries, args.dim, args.k, args.oversample, args.seed)
@@ -0,0 +1,116 @@
+"""
+Burst of requests against a provider that enforces a concurrency limit and
+answers 429 above it, with and without the shared RateLimiter (lib/rate_limit.py).
+
+Without the limiter every caller fires at once and, like the OpenAI SDK,
+retries a 429 after a short backoff. With it, callers wait for a slot and the
+limiter's concurrency adapts (AIMD) to what the provider accepts.
+
+    python benchmarks/rate_limit_benchmark.py --requests 300 --callers 64 --provider-concurrency 8
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.rate_limit import RateLimiter, limited_create
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after": str(retry_after)})
+
+
+class StubProvider:
+    """Accepts ``capacity`` requests at a time; a 429 costs ``reject_latency`` seconds"""
+
+    def __init__(self, capacity, latency, reject_latency, retry_after):
+        self.capacity = capacity
+        self.latency = latency
+        self.reject_latency = reject_latency
+        self.retry_after = retry_after
+        self.active = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def create(self, **payload):
+        with self.lock:
+            accepted = self.active < self.capacity
+            if accepted:
+                self.active += 1
+            else:
+                self.rejected += 1
+        if not accepted:
+            time.sleep(self.reject_latency)
+            raise RateLimitError(self.retry_after)
+        try:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+            return SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def run(provider, requests, callers, send, backoff, max_attempts=50):
+    latencies, failed = [], 0
+
+    def one(_):
+        start = time.perf_counter()
+        for attempt in range(max_attempts):
+            try:
+                send()
+                return time.perf_counter() - start
+            except RateLimitError:
+                time.sleep(backoff * (2 ** min(attempt, 3)) * random.uniform(0.5, 1.0))
+        return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        for latency in executor.map(one, range(requests)):
+            if latency is None:
+                failed += 1
+            else:
+                latencies.append(latency)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    return elapsed, provider.rejected, failed, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--callers", type=int, default=64, help="Threads sending requests at once")
+    parser.add_argument("--provider-concurrency", type=int, default=8, help="Requests the provider accepts at once")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per accepted request")
+    parser.add_argument("--backoff", type=float, default=0.5,
+                        help="Base retry delay after a 429 (the OpenAI SDK starts at 0.5s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{args.requests} requests from {args.callers} callers, provider accepts {args.provider_concurrency} at once\n")
+    print(f"{'mode':<14}{'seconds':>9}{'429s':>7}{'failed':>8}{'p95 s':>8}")
+
+    provider = StubProvider(args.provider_concurrency, args.latency, 0.01, retry_after=0.1)
+    result = run(provider, args.requests, args.callers, lambda: provider.create(), args.backoff)
+    print(f"{'no limiter':<14}{result[0]:>9.2f}{result[1]:>7}{result[2]:>8}{result[3]:>8.2f}")
+
+    provider = StubProvider(args.provider_concurrency, args.latency, 0.01, retry_after=0.1)
+    limiter = RateLimiter(max_concurrency=args.callers)
+    result = run(provider, args.requests, args.callers,
+                 lambda: limited_create(provider, limiter=limiter, input="x"), args.backoff)
+    print(f"{'RateLimiter':<14}{result[0]:>9.2f}{result[1]:>7}{result[2]:>8}{result[3]:>8.2f}")
+    print(f"\n{limiter.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the serial recipe optimize -> evaluate loop in evaluatorOptimizer.py with
+best-of-N rounds (N candidates generated and evaluated concurrently, stopping
+at the first one rated 9 or higher).
+
+The OpenAI client is replaced by a local stub model, so the benchmark runs
+offline. Each generated recipe gets a hidden quality score: the temperature 0.2
+answer is usually mediocre, sampled answers vary more, and every round that
+receives evaluator comments improves on them. The stub evaluator returns that
+score as the rating. Some recipes exceed 500 calories and are rejected by the
+local pre-checks without an evaluator call.
+
+    python benchmarks/recipe_best_of_n_benchmark.py --trials 10 --candidates 3
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+import evaluatorOptimizer
+
+QUALITY = re.compile(r"Quality: (\d+)")
+
+
+class StubModel:
+    def __init__(self, latency, jitter, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _draw(self, fn):
+        with self.lock:
+            return fn(self.rng)
+
+    def create(self, model, messages, temperature=0.2, **kwargs):
+        time.sleep(self.latency + self._draw(lambda r: r.uniform(-self.jitter, self.jitter)))
+        prompt = messages[-1]["content"]
+        if prompt.startswith("You are a recipe evaluator"):
+            quality = int(QUALITY.search(prompt).group(1))
+            text = f"<response><rating>{quality}</rating><comments>Quality {quality}: needs more flavor.</comments></response>"
+        else:
+            previous = QUALITY.search(prompt)
+            base = int(previous.group(1)) + 1 if previous else 6
+            spread = 3 if temperature > 0.5 else 1
+            quality = min(10, max(1, base + self._draw(lambda r: r.randint(-1, spread))))
+            calories = self._draw(lambda r: r.choice([420, 450, 480, 620]))
+            text = (f"<response>\n- Recipe: Lentil pasta (Quality: {quality})\n- Calories: {calories} kcal\n"
+                    f"- Protein: 21g\n</response>")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def run(label, fn, trials):
+    rows = []
+    for _ in range(trials):
+        rows.append(fn())
+    # Let abandoned in-flight stub calls finish before the next mode starts
+    time.sleep(0.5)
+    n = len(rows)
+    print(f"{label:<16}{sum(r['passed'] for r in rows) / n:>8.0%}{sum(r['rounds'] for r in rows) / n:>8.2f}"
+          f"{sum(r['llm_calls'] for r in rows) / n:>8.2f}{sum(r['elapsed'] for r in rows) / n:>10.2f}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mean seconds per stub model call")
+    parser.add_argument("--jitter", type=float, default=0.15, help="Uniform +/- jitter of each call's latency")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub_client = SimpleNamespace(chat=SimpleNamespace(
+        completions=StubModel(args.latency, args.jitter, args.seed)))
+    evaluatorOptimizer.get_client = lambda: stub_client
+    evaluatorOptimizer.print = lambda *a, **k: None
+
+    request = evaluatorOptimizer.RECIPE_REQUEST
+    prechecks = evaluatorOptimizer.RECIPE_PRECHECKS
+    print(f"{args.trials} trials, {args.latency}s +/- {args.jitter}s per call\n")
+    print(f"{'mode':<16}{'passed':>8}{'rounds':>8}{'calls':>8}{'seconds':>10}")
+    run("serial", lambda: evaluatorOptimizer.optimize_serial(
+        request["base_dish"], request["constraints"], prechecks=prechecks), args.trials)
+    rows = run(f"best-of-{args.candidates}", lambda: evaluatorOptimizer.optimize_best_of_n(
+        request["base_dish"], request["constraints"], num_candidates=args.candidates, prechecks=prechecks),
+        args.trials)
+
+    n = len(rows)
+    print(f"\nbest-of-{args.candidates} per run: {sum(r['skipped_calls'] for r in rows) / n:.2f} calls skipped, "
+          f"{sum(r['abandoned_calls'] for r in rows) / n:.2f} in-flight calls abandoned, "
+          f"{sum(r['serial_seconds'] - r['elapsed'] for r in rows) / n:.2f}s saved vs. the same calls run serially")
+    print(prechecks.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Requests against a provider with heavy-tailed latency and transient errors,
+through lib/resilience.py with no retries, with retries, and with retries plus
+hedging.
+
+Most requests take ``--latency`` seconds, a few (``--straggler-rate``) take ten
+times longer, and ``--error-rate`` of them fail with a 503. Retries turn the 503s
+into successes; hedging sends a duplicate once a call is slower than the
+observed p95 and cuts the stragglers out of the tail.
+
+    python benchmarks/resilience_benchmark.py --requests 400 --callers 16
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.resilience import Resilient, RetryPolicy
+
+
+class ServiceUnavailable(Exception):
+    def __init__(self):
+        super().__init__("503 Service Unavailable")
+        self.status_code = 503
+
+
+class StubProvider:
+    def __init__(self, latency, straggler_rate, error_rate, seed):
+        self.latency = latency
+        self.straggler_rate = straggler_rate
+        self.error_rate = error_rate
+        self.sent = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def create(self, **payload):
+        with self.lock:
+            self.sent += 1
+            roll, jitter = self.random.random(), self.random.lognormvariate(0, 0.25)
+        if roll < self.error_rate:
+            time.sleep(self.latency * 0.2)
+            raise ServiceUnavailable()
+        straggler = roll > 1 - self.straggler_rate
+        time.sleep(self.latency * jitter * (10 if straggler else 1))
+        return "ok"
+
+
+def run(resilient, provider, requests, callers):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            resilient.call("stub", provider.create, input="x")
+            return time.perf_counter() - start
+        except ServiceUnavailable:
+            return None
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        results = list(executor.map(one, range(requests)))
+    latencies = np.array([r for r in results if r is not None])
+    return len(latencies) / requests, np.percentile(latencies, [50, 95, 99]), provider.sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--callers", type=int, default=16, help="Threads sending requests at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="Typical seconds per request")
+    parser.add_argument("--straggler-rate", type=float, default=0.03, help="Share of requests 10x slower")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of requests failing with a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{args.requests} requests from {args.callers} callers, {args.straggler_rate:.0%} stragglers, "
+          f"{args.error_rate:.0%} transient errors\n")
+    print(f"{'mode':<16}{'success':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'sent':>7}")
+    modes = [
+        ("no retries", Resilient(retry=RetryPolicy(max_attempts=1))),
+        ("retries", Resilient(retry=RetryPolicy(base_delay=args.latency))),
+        ("retries+hedge", Resilient(retry=RetryPolicy(base_delay=args.latency), hedge=True)),
+    ]
+    for name, resilient in modes:
+        provider = StubProvider(args.latency, args.straggler_rate, args.error_rate, args.seed)
+        success, (p50, p95, p99), sent = run(resilient, provider, args.requests, args.callers)
+        print(f"{name:<16}{success:>9.1%}{p50:>8.3f}{p95:>8.3f}{p99:>8.3f}{sent:>7}")
+    print(f"\n{resilient.report()}")
+
+
+if __name__ == "__main__":
+    main()
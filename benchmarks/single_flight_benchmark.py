@@ -0,0 +1,143 @@
+"""
+Burst of sessions asking a few popular questions at the same moment, with and
+without single-flight coalescing (lib/single_flight.py).
+
+Half the sessions are threads and half are asyncio tasks, all embedding their
+question through Embedder against a stub endpoint whose latency grows with the
+number of requests in flight (a shared, rate-limited provider). Without
+coalescing every session sends its own request; with it, sessions asking the
+same question while it is in flight share one.
+
+    python benchmarks/single_flight_benchmark.py --sessions 64 --questions 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.embeddings import Embedder
+from lib.rate_limit import RateLimiter, set_rate_limiter
+from lib.single_flight import SingleFlight, set_single_flight
+
+
+class StubProvider:
+    """Latency of ``latency`` plus ``load_latency`` per request already in flight"""
+
+    def __init__(self, latency, load_latency):
+        self.latency = latency
+        self.load_latency = load_latency
+        self.sent = 0
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def _enter(self):
+        with self.lock:
+            self.sent += 1
+            self.active += 1
+            return self.latency + self.load_latency * (self.active - 1)
+
+    def _exit(self):
+        with self.lock:
+            self.active -= 1
+
+    @staticmethod
+    def _response(payload):
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(payload["input"])],
+            usage=None)
+
+    def create(self, **payload):
+        delay = self._enter()
+        try:
+            time.sleep(delay)
+            return self._response(payload)
+        finally:
+            self._exit()
+
+    async def acreate(self, **payload):
+        delay = self._enter()
+        try:
+            await asyncio.sleep(delay)
+            return self._response(payload)
+        finally:
+            self._exit()
+
+
+class _AsyncEmbeddings:
+    def __init__(self, provider):
+        self.create = provider.acreate
+
+
+class _NoCoalescing(SingleFlight):
+    """Every caller sends its own request"""
+
+    def do(self, key, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def ado(self, key, fn, *args, **kwargs):
+        return await fn(*args, **kwargs)
+
+
+def run(questions, coalesce, latency, load_latency):
+    """Returns (seconds, upstream requests, p95 session latency)"""
+    set_single_flight(SingleFlight() if coalesce else _NoCoalescing())
+    set_rate_limiter(RateLimiter(max_concurrency=len(questions)))
+    provider = StubProvider(latency, load_latency)
+    embedder = Embedder(api_key="stub")
+    embedder._client = SimpleNamespace(embeddings=provider)
+    embedder._async_client = SimpleNamespace(embeddings=_AsyncEmbeddings(provider))
+    latencies = []
+
+    def thread_session(question):
+        start = time.perf_counter()
+        embedder.embed(question)
+        latencies.append(time.perf_counter() - start)
+
+    async def task_session(question):
+        start = time.perf_counter()
+        await embedder.aembed_many([question])
+        latencies.append(time.perf_counter() - start)
+
+    async def burst():
+        half = len(questions) // 2
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=max(half, 1)) as executor:
+            threads = [loop.run_in_executor(executor, thread_session, q) for q in questions[:half]]
+            tasks = [task_session(q) for q in questions[half:]]
+            await asyncio.gather(*threads, *tasks)
+
+    start = time.perf_counter()
+    asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, provider.sent, latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--questions", type=int, default=4, help="Distinct questions the sessions ask")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request on an idle provider")
+    parser.add_argument("--load-latency", type=float, default=0.01, help="Extra seconds per request in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    popular = [f"How do I reset my password? ({i})" for i in range(args.questions)]
+    questions = [random.choice(popular) for _ in range(args.sessions)]
+
+    print(f"{args.sessions} sessions (threads and asyncio tasks), {args.questions} distinct questions\n")
+    print(f"{'mode':<16}{'seconds':>9}{'requests':>10}{'p95 s':>8}")
+    for name, coalesce in (("no coalescing", False), ("single-flight", True)):
+        elapsed, sent, p95 = run(questions, coalesce, args.latency, args.load_latency)
+        print(f"{name:<16}{elapsed:>9.2f}{sent:>10}{p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare the shared incremental tag parser (lib/xml_tags.py) with the regex and
+line-slicing helpers it replaced, on large synthetic planner outputs:
+
+    python benchmarks/xml_tags_benchmark.py --tasks 5000 --chunk-size 16
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.xml_tags import TASK_TAGS, TagParser, parse
+
+
+# --- Previous helpers, copied from the agent scripts for comparison ---
+
+def legacy_extract_xml(text, tag):
+    match = re.search(rf"<{tag}>(.*?)</{tag}>", text, re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+
+def legacy_parse_tasks(xml):
+    tasks, current_task = [], {}
+    for line in xml.splitlines():
+        line = line.strip()
+        if line.startswith("<task>"):
+            current_task = {}
+        elif line.startswith("<type>"):
+            current_task["type"] = line[6:-7].strip()
+        elif line.startswith("<description>"):
+            current_task["description"] = line[12:-13].strip()
+        elif line.startswith("</task>"):
+            if "description" in current_task:
+                current_task.setdefault("type", "default")
+                tasks.append(current_task)
+    return tasks
+
+
+def legacy_streaming(chunks):
+    """Accumulate the stream and rescan it for completed <task> blocks, as the first streaming mode did."""
+    text, scan_from, tasks = "", 0, []
+    for chunk in chunks:
+        text += chunk
+        while True:
+            start = text.find("<task>", scan_from)
+            end = text.find("</task>", start) if start != -1 else -1
+            if end == -1:
+                break
+            tasks.extend(legacy_parse_tasks(text[start:end + 7]))
+            scan_from = end + 7
+    return legacy_extract_xml(text, "analysis"), tasks
+
+
+# --- Synthetic planner output ---
+
+def planner_output(num_tasks, inline):
+    types = ["hematology", "renal", "liver", "lipid", "thyroid"]
+    tasks = []
+    for i in range(num_tasks):
+        kind = types[i % len(types)]
+        description = f"Analyze panel {i} ({kind}), flag values outside the reference range and explain them."
+        if inline:
+            tasks.append(f"<task><type>{kind}</type><description>{description}</description></task>")
+        else:
+            tasks.append(f"<task>\n  <type>{kind}</type>\n  <description>{description}</description>\n</task>")
+    analysis = "The report contains many panels. " * 20
+    return f"<analysis>\n{analysis}\n</analysis>\n\n<tasks>\n" + "\n".join(tasks) + "\n</tasks>\n"
+
+
+def timed(fn, repeats):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    tags = ("analysis",) + TASK_TAGS
+
+    def new_whole(text):
+        plan = parse(text, tags)
+        return plan.first_text("analysis"), plan.tasks()
+
+    def new_streaming(chunks):
+        plan = TagParser(tags)
+        for chunk in chunks:
+            plan.feed(chunk)
+        plan.close()
+        return plan.first_text("analysis"), plan.tasks()
+
+    print(f"{'layout':<8}{'mode':<11}{'parser':<9}{'MB':>6}{'seconds':>10}{'tasks':>8}  first description")
+    for inline in (False, True):
+        text = planner_output(args.tasks, inline)
+        chunks = [text[i:i + args.chunk_size] for i in range(0, len(text), args.chunk_size)]
+        runs = [
+            ("whole", "legacy", lambda: (legacy_extract_xml(text, "analysis"),
+                                         legacy_parse_tasks(legacy_extract_xml(text, "tasks")))),
+            ("whole", "shared", lambda: new_whole(text)),
+            ("streamed", "legacy", lambda: legacy_streaming(chunks)),
+            ("streamed", "shared", lambda: new_streaming(chunks)),
+        ]
+        for mode, name, fn in runs:
+            seconds, (_, tasks) = timed(fn, args.repeats)
+            first = tasks[0]["description"][:30] if tasks else "-"
+            print(f"{'inline' if inline else 'lines':<8}{mode:<11}{name:<9}{len(text) / 1e6:>6.2f}"
+                  f"{seconds:>10.4f}{len(tasks):>8}  {first!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+One entry point for the agent scripts: python cli.py <command> [arguments].
+
+Each command runs the main() of one script, and that script is imported only
+when its command is chosen, so "--help" and every command start without
+loading the SDKs (openai, pandas, langchain, ...) that the other scripts need.
+Arguments after the command go to the script's own parser; the demo scripts
+take none.
+
+    python cli.py --help
+    python cli.py action-plan --backend litellm --stream "One morning I wanted to make fried eggs"
+    python cli.py evaluate-batch dataset.jsonl --concurrency 8
+    python cli.py ingest docs/ --batch-dir batches/
+"""
+import argparse
+import importlib
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# command -> (module, help, whether the script parses its own arguments);
+# a module is imported only when its command runs
+COMMANDS: Dict[str, Tuple[str, str, bool]] = {
+    "action-plan": ("action_planning_agent", "Extract the steps for a request with any chat backend", True),
+    "augmented": ("augmented_prompt_agent", "Augmented prompt agent demo", False),
+    "persona": ("persona_agent", "Persona agent demo", False),
+    "route": ("routing_agent", "Route prompts to the closest agent by embedding similarity", False),
+    "rag": ("rag_knowledge_prompt_agent", "Answer from a chunked and embedded knowledge text", False),
+    "ingest": ("rag_ingest", "Ingest a directory of text files into a RAG index", True),
+    "evaluate": ("evaluation_agent", "Worker -> judge evaluation loop demo", False),
+    "evaluate-batch": ("evaluation_batch", "Evaluate a JSONL dataset of prompts", True),
+    "recipes": ("evaluatorOptimizer", "Optimize a recipe against its constraints", False),
+    "contract": ("parallelExecutionAgents", "Analyze the sample contract with parallel expert agents", False),
+    "contract-batch": ("contract_batch", "Analyze a batch of contracts to JSONL", True),
+    "orchestrate": ("orchestrator-agent", "Plan and run worker agents over a lab report", False),
+    "memory": ("agent_with_memory", "Tool-using agent with short-term memory", False),
+    "nondeterministic": ("NonDetreministic", "Compare hardcoded and LLM program management answers", False),
+    "pm-kb": ("program_management_kb", "Print sample program management knowledge base answers", False),
+    "langgraph": ("langgraph_example", "LangGraph arithmetic agent example", False),
+    "langsmith": ("langsmith_example", "LangChain agent example traced with LangSmith", False),
+}
+
+
+def run(command: str, args: List[str]):
+    """Import the command's module and run its main() with ``args`` as its command line"""
+    module = importlib.import_module(COMMANDS[command][0])
+    sys.argv = [f"{sys.argv[0]} {command}", *args]
+    module.main()
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, help, own_parser) in COMMANDS.items():
+        subparsers.add_parser(name, help=help, description=help, add_help=not own_parser)
+    # Only the command is parsed here; a script with its own parser gets everything after it
+    # (--help included), while the demos take no arguments and are checked here
+    command = parser.parse_args(argv[:1]).command
+    if not COMMANDS[command][2]:
+        parser.parse_args(argv)
+    run(command, argv[1:])
+
+
+if __name__ == "__main__":
+    main()
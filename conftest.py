@@ -0,0 +1 @@
+# Lets pytest import the top-level scripts and lib/ from tests/, as running a script from the repository root does
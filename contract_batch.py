@@ -0,0 +1,219 @@
+"""
+Analyze a batch of contracts and stream the results to JSONL.
+
+Input is either a directory of text files (the id is the path relative to the
+directory) or a JSONL file with one {"id": ..., "text": ...} object per line:
+
+    python contract_batch.py ./contracts --output analyses.jsonl --concurrency 32
+    python contract_batch.py contracts.jsonl --output analyses.jsonl
+
+Each result line is written and flushed as soon as its contract finishes. Rerunning
+with the same --output skips contracts that already have a result, so an interrupted
+run resumes where it stopped (add --retry-failed to redo contracts that were not ok).
+A retried contract gets a second line; readers keep the last line per id (read_results).
+All agent calls of all contracts share one bounded executor, so --concurrency is the
+global limit on requests in flight.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Set, Tuple
+
+import numpy as np
+
+import parallelExecutionAgents as contract_agents
+
+
+def iter_contracts(source: str, pattern: str = ".txt", id_field: str = "id",
+                   text_field: str = "text") -> Iterator[Tuple[str, str]]:
+    """Yield (contract_id, text) pairs from a directory or a JSONL file, lazily."""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.endswith(pattern):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        yield os.path.relpath(path, source), f.read()
+        return
+
+    with open(source, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get(id_field, line_number)), record[text_field]
+
+
+def read_results(output_path: str) -> Dict[str, dict]:
+    """The latest record per contract id in an output file.
+
+    Results are only ever appended, so a contract redone with --retry-failed has
+    several lines and the last one wins. A line cut short by an interruption is
+    ignored, so that contract counts as not analyzed.
+    """
+    records = {}
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["id"]] = record
+    return records
+
+
+def completed_ids(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """Ids already present in an earlier run's output (only those whose latest result is ok with ``retry_failed``)."""
+    return {contract_id for contract_id, record in read_results(output_path).items()
+            if record.get("status") == "ok" or not retry_failed}
+
+
+def output_totals(output_path: str) -> Dict[str, int]:
+    """Contracts in an output file by the status of their latest result, counting each id once"""
+    totals = {"contracts": 0, "ok": 0, "partial": 0, "error": 0}
+    for record in read_results(output_path).values():
+        totals["contracts"] += 1
+        totals[record["status"]] += 1
+    return totals
+
+
+def analyze_one(contract_id: str, text: str, timeout: float, shard_max_chars: int) -> dict:
+    """Analyze one contract and return its output record; never raises."""
+    start = time.perf_counter()
+    try:
+        analysis = contract_agents.analyze_contract_detailed(text, timeout=timeout, shard_max_chars=shard_max_chars)
+    except Exception as e:
+        return {"id": contract_id, "status": "error", "error": f"{type(e).__name__}: {e}",
+                "elapsed": round(time.perf_counter() - start, 3)}
+
+    errors = {name: r.error for name, r in analysis.results.items() if not r.ok}
+    return {
+        "id": contract_id,
+        "status": "partial" if errors else "ok",
+        "summary": analysis.summary,
+        "findings": {name: r.output for name, r in analysis.results.items() if r.ok},
+        "errors": errors,
+        "shards": analysis.shards,
+        "chars": len(text),
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(source, output_path, concurrency=contract_agents.MAX_CONCURRENT_AGENT_CALLS, contracts_in_flight=None,
+              timeout=contract_agents.AGENT_TIMEOUT, shard_max_chars=contract_agents.SHARD_MAX_CHARS,
+              retry_failed=False, pattern=".txt", id_field="id", text_field="text") -> dict:
+    """Analyze every contract in ``source`` not yet in ``output_path``.
+
+    Args:
+        concurrency: Agent LLM calls in flight across all contracts
+        contracts_in_flight: Contracts being analyzed at once (defaults to ``concurrency``).
+            Input is read lazily, so only these contracts are held in memory.
+
+    Returns:
+        Run statistics (see format_stats)
+    """
+    contract_agents.set_concurrency_limit(concurrency)
+    contract_agents.verbose = False
+    contracts_in_flight = contracts_in_flight or concurrency
+    skip = completed_ids(output_path, retry_failed)
+
+    stats = {"done": 0, "ok": 0, "partial": 0, "error": 0, "skipped": 0, "repeated": 0, "latencies": []}
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=contracts_in_flight, thread_name_prefix="contract")
+    pending, submitted = set(), set()
+
+    def drain(return_when):
+        nonlocal pending
+        finished, pending = wait(pending, return_when=return_when)
+        for future in finished:
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            stats["done"] += 1
+            stats[record["status"]] += 1
+            stats["latencies"].append(record["elapsed"])
+            print(f"[{stats['done']}] {record['id']}: {record['status']} in {record['elapsed']:.1f}s")
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            for contract_id, text in iter_contracts(source, pattern, id_field, text_field):
+                if contract_id in skip:
+                    stats["skipped"] += 1
+                    continue
+                if contract_id in submitted:
+                    # An id repeated in the input is analyzed once
+                    stats["repeated"] += 1
+                    continue
+                submitted.add(contract_id)
+                if len(pending) >= contracts_in_flight:
+                    drain(FIRST_COMPLETED)
+                pending.add(executor.submit(analyze_one, contract_id, text, timeout, shard_max_chars))
+            while pending:
+                drain(FIRST_COMPLETED)
+    finally:
+        # On Ctrl-C, drop queued contracts; everything written so far is kept for resuming
+        executor.shutdown(wait=False, cancel_futures=True)
+        stats["seconds"] = time.perf_counter() - start
+        stats["output"] = output_totals(output_path)
+
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    latencies = np.array(stats["latencies"]) if stats["latencies"] else np.zeros(1)
+    minutes = stats["seconds"] / 60
+    rate = stats["done"] / minutes if minutes else 0.0
+    output = stats["output"]
+    return "\n".join([
+        f"Contracts analyzed: {stats['done']} (ok={stats['ok']}, partial={stats['partial']}, "
+        f"error={stats['error']}), skipped from earlier runs: {stats['skipped']}, "
+        f"repeated ids: {stats['repeated']}",
+        f"Output file, one result per contract: {output['contracts']} contracts (ok={output['ok']}, "
+        f"partial={output['partial']}, error={output['error']})",
+        f"Wall clock: {stats['seconds']:.1f}s  Throughput: {rate:.1f} contracts/min",
+        f"Latency per contract: p50={np.percentile(latencies, 50):.2f}s  p95={np.percentile(latencies, 95):.2f}s  "
+        f"max={latencies.max():.2f}s",
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of contract files or a JSONL file")
+    parser.add_argument("--output", default="contract_analyses.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=contract_agents.MAX_CONCURRENT_AGENT_CALLS,
+                        help="Agent LLM calls in flight across all contracts")
+    parser.add_argument("--contracts-in-flight", type=int, default=None,
+                        help="Contracts analyzed at once (default: same as --concurrency)")
+    parser.add_argument("--timeout", type=float, default=contract_agents.AGENT_TIMEOUT, help="Per-agent timeout in seconds")
+    parser.add_argument("--shard-max-chars", type=int, default=contract_agents.SHARD_MAX_CHARS)
+    parser.add_argument("--retry-failed", action="store_true", help="Also redo contracts whose earlier result was not ok")
+    parser.add_argument("--pattern", default=".txt", help="File name suffix when reading a directory")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the contract id")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the contract text")
+    args = parser.parse_args()
+
+    stats = run_batch(
+        args.source,
+        args.output,
+        concurrency=args.concurrency,
+        contracts_in_flight=args.contracts_in_flight,
+        timeout=args.timeout,
+        shard_max_chars=args.shard_max_chars,
+        retry_failed=args.retry_failed,
+        pattern=args.pattern,
+        id_field=args.id_field,
+        text_field=args.text_field,
+    )
+    print()
+    print(format_stats(stats))
+    totals = contract_agents.usage_tracker.totals()
+    print(f"Agent calls: {totals['calls']}  prompt tokens: {totals['prompt_tokens']} "
+          f"({totals['cache_hit_ratio']:.0%} cached)  completion tokens: {totals['completion_tokens']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,106 +1,236 @@
+import functools
 import os
+import inspect
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from lib.judge import Verdict, judge, judge_batch
+from lib.llm import LLM
+from lib.prechecks import PreChecks, RegexCheck, WordCountCheck
+from lib.rate_limit import limited_create
+from lib.resilience import get_resilience
+from lib.semantic_cache import SemanticCache
+from lib.single_flight import get_single_flight, request_key
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Load environment variables
 load_dotenv()
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
+# Set EVALUATION_AGENT_VERBOSE=0 (or evaluation_agent.verbose = False) to hide the per-interaction trace
+verbose = os.getenv("EVALUATION_AGENT_VERBOSE", "1") != "0"
+
+
+def log(*args):
+    if verbose:
+        print(*args)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(api_key) -> "OpenAI":
+    """The OpenAI client for ``api_key``, created (and the SDK imported) on first use rather than at import.
+
+    SDK retries are off: lib.resilience retries and hedges the calls instead.
+    """
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, max_retries=0)
+
 
 class KnowledgeAugmentedPromptAgent:
     """Agent that uses both persona and knowledge to respond to prompts."""
     
-    def __init__(self, openai_api_key, persona, knowledge):
-        """Initialize the agent with given attributes."""
+    def __init__(self, openai_api_key, persona, knowledge, cache=None, usage=None):
+        """Initialize the agent with given attributes.
+
+        An optional SemanticCache answers paraphrases of earlier questions without calling the model.
+        An optional UsageTracker records the token usage of each call as "worker".
+        """
         self.openai_api_key = openai_api_key
         self.persona = persona
         self.knowledge = knowledge
+        self.cache = cache
+        self.cache_namespace = SemanticCache.fingerprint(persona, knowledge)
+        self.usage = usage
     
-    def respond(self, input_text):
-        """Generate a response using OpenAI API with knowledge augmentation."""
-        client = OpenAI(api_key=self.openai_api_key)
-        
-        system_prompt = f"""You are a helpful assistant. You are {self.persona}. 
+    def respond(self, input_text, temperature=None):
+        """Generate a response, reusing a cached answer when available.
+
+        Sampling with a non-zero ``temperature`` (used for alternative candidates)
+        bypasses the cache.
+        """
+        if self.cache is not None and not temperature:
+            return self.cache.get_or_compute(self.cache_namespace, input_text, lambda: self._generate(input_text))
+        return self._generate(input_text, temperature)
+
+    def system_prompt(self):
+        """The system prompt carrying the persona and knowledge"""
+        return f"""You are a helpful assistant. You are {self.persona}. 
 You are explicitly forgetting previous context. 
 This is your knowledge: {self.knowledge}
 Use only this knowledge to answer questions."""
+
+    def _generate(self, input_text, temperature=None):
+        """Generate a response using OpenAI API with knowledge augmentation."""
+        client = get_client(self.openai_api_key)
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
+        payload = {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": self.system_prompt()},
                 {"role": "user", "content": input_text}
             ],
-            temperature=0
-        )
+            "temperature": temperature or 0,
+        }
+
+        def send():
+            response = get_resilience().call(f"llm:{payload['model']}", limited_create, client.chat.completions, **payload)
+            if self.usage is not None:
+                self.usage.record("worker", response.usage)
+            return response
+
+        if temperature:
+            response = send()
+        else:
+            # Sessions asking the same question at once share one request
+            response = get_single_flight().do(request_key(f"chat:{client.base_url}", payload), send)
         
         return response.choices[0].message.content.strip()
 
 
 class EvaluationAgent:
     
-    def __init__(self, openai_api_key, persona, evaluation_criteria, worker_agent, max_interactions):
+    def __init__(self, openai_api_key, persona, evaluation_criteria, worker_agent, max_interactions, prechecks=None,
+                 verdict_cache=None, usage=None):
         # Initialize the EvaluationAgent with given attributes.
+        # prechecks: optional lib.prechecks.PreChecks deciding responses locally before the LLM judge
+        # verdict_cache: optional lib.verdict_cache.VerdictCache reusing verdicts of responses judged before
+        # usage: optional lib.usage.UsageTracker recording judge token usage as "judge"
         # TODO: 1 - Declare class attributes here
         self.openai_api_key = openai_api_key
         self.persona = persona
         self.evaluation_criteria = evaluation_criteria
         self.worker_agent = worker_agent
         self.max_interactions = max_interactions
+        self.prechecks = prechecks
+        self.verdict_cache = verdict_cache
+        self.usage = usage
+        self.llm_calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _count_call(self):
+        with self._calls_lock:
+            self.llm_calls += 1
+
+    def _worker_respond(self, prompt, temperature=None):
+        self._count_call()
+        if temperature and "temperature" in inspect.signature(self.worker_agent.respond).parameters:
+            return self.worker_agent.respond(prompt, temperature=temperature)
+        return self.worker_agent.respond(prompt)
+
+    def judge(self, llm, response_from_worker) -> Verdict:
+        """Ask the evaluator whether a response meets the criteria, why, and how to fix it (one call).
+
+        Responses the local pre-checks can decide, or that were judged before, never reach the LLM.
+        """
+        if self.prechecks is not None:
+            verdict = self.prechecks.verdict(response_from_worker)
+            if verdict is not None:
+                return verdict
+        if self.verdict_cache is not None:
+            key = self.verdict_cache.key(response_from_worker, self.evaluation_criteria, self.persona)
+            verdict = self.verdict_cache.get(key)
+            if verdict is not None:
+                return verdict
+        self._count_call()
+        verdict = judge(llm, self.persona, response_from_worker, self.evaluation_criteria)
+        if self.verdict_cache is not None:
+            self.verdict_cache.put(key, verdict)
+        return verdict
+
+    def _new_llm(self):
+        return LLM(api_key=self.openai_api_key, usage=self.usage, usage_label="judge")
+
+    def judge_many(self, llm, responses, max_items=8, max_tokens=6000):
+        """Judge many responses against the criteria, packing up to ``max_items`` into one call.
+
+        Responses the local pre-checks decide or the verdict cache knows are not sent; the rest are judged
+        with lib.judge.judge_batch, which splits batches over the token budget.
+        Returns one Verdict per response, in order.
+        """
+        verdicts = [self.prechecks.verdict(r) if self.prechecks is not None else None for r in responses]
+        if self.verdict_cache is not None:
+            keys = [self.verdict_cache.key(r, self.evaluation_criteria, self.persona) for r in responses]
+            verdicts = [v or self.verdict_cache.get(k) for v, k in zip(verdicts, keys)]
+        undecided = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        if undecided:
+            calls_before = llm.calls
+            judged = judge_batch(llm, self.persona, [(responses[i], self.evaluation_criteria) for i in undecided],
+                                 max_items=max_items, max_tokens=max_tokens)
+            for i, verdict in zip(undecided, judged):
+                verdicts[i] = verdict
+                if self.verdict_cache is not None:
+                    self.verdict_cache.put(keys[i], verdict)
+            with self._calls_lock:
+                self.llm_calls += llm.calls - calls_before
+        return verdicts
+
+    @staticmethod
+    def is_accepted(verdict: Verdict):
+        return verdict.passed
 
     def evaluate(self, initial_prompt):
         # This method manages interactions between agents to achieve a solution.
-        client = OpenAI(api_key=self.openai_api_key)
+        start = time.perf_counter()
+        self.llm_calls = 0
+        llm = self._new_llm()
+        result = self._correction_loop(llm, initial_prompt)
+        result.update(llm_calls=self.llm_calls, elapsed=time.perf_counter() - start)
+        return result
+
+    def _correction_loop(self, llm, initial_prompt, first_round=None):
+        """Generate -> judge -> correct rounds until the evaluator accepts a response.
+
+        Each round is one worker call and one structured judge call; the verdict
+        carries the correction instructions. ``first_round`` is an already judged
+        (response, verdict) pair used as interaction 1.
+        """
         prompt_to_evaluate = initial_prompt
 
         for i in range(self.max_interactions): 
-            print(f"\n--- Interaction {i+1} ---")
-
-            print(" Step 1: Worker agent generates a response to the prompt")
-            print(f"Prompt:\n{prompt_to_evaluate}")
-            response_from_worker = self.worker_agent.respond(prompt_to_evaluate) 
-            
-            print(f"Worker Agent Response:\n{response_from_worker}")
-
-            print(" Step 2: Evaluator agent judges the response")
-            eval_prompt = (
-                f"Does the following answer: {response_from_worker}\n"
-                f"Meet this criteria: {self.evaluation_criteria}" 
-                f"Respond Yes or No, and the reason why it does or doesn't meet the criteria."
-            )
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": f"You are an evaluation agent. You are {self.persona}. You are evaluating a response to a prompt. You are explicitly forgetting previous context."},
-                    {"role": "user", "content": eval_prompt}
-                ],
-                temperature=0
-            )
-            evaluation = response.choices[0].message.content.strip()
-            print(f"Evaluator Agent Evaluation:\n{evaluation}")
-
-            print(" Step 3: Check if evaluation is positive")
-            if evaluation.lower().startswith("yes"):
-                print("✅ Final solution accepted.")
+            log(f"\n--- Interaction {i+1} ---")
+
+            if i == 0 and first_round is not None:
+                response_from_worker, verdict = first_round
+                log(f"Best speculative candidate:\n{response_from_worker}")
+                log(f"Evaluator Agent Evaluation:\n{verdict.reasons}")
+            else:
+                log(" Step 1: Worker agent generates a response to the prompt")
+                log(f"Prompt:\n{prompt_to_evaluate}")
+                response_from_worker = self._worker_respond(prompt_to_evaluate)
+
+                log(f"Worker Agent Response:\n{response_from_worker}")
+
+                log(" Step 2: Evaluator agent judges the response")
+                verdict = self.judge(llm, response_from_worker)
+                log(f"Evaluator Agent Evaluation:\n{'Yes' if verdict.passed else 'No'}. {verdict.reasons}")
+
+            log(" Step 3: Check if evaluation is positive")
+            if self.is_accepted(verdict):
+                log("✅ Final solution accepted.")
                 break
             else:
-                print(" Step 4: Generate instructions to correct the response")
-                instruction_prompt = (
-                    f"Provide instructions to fix an answer based on these reasons why it is incorrect: {evaluation}"
-                )
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": f"You are an evaluation agent. You are {self.persona}. You are evaluating a response to a prompt. You are explicitly forgetting previous context."},
-                        {"role": "user", "content": instruction_prompt}
-                    ],
-                    temperature=0
-                )
-                instructions = response.choices[0].message.content.strip()
-                print(f"Instructions to fix:\n{instructions}")
+                log(" Step 4: Use the correction instructions from the verdict")
+                instructions = verdict.correction_instructions()
+                log(f"Instructions to fix:\n{instructions}")
 
-                print(" Step 5: Send feedback to worker agent for refinement")
+                log(" Step 5: Send feedback to worker agent for refinement")
                 prompt_to_evaluate = (
                     f"The original prompt was: {initial_prompt}\n"
                     f"The response to that prompt was: {response_from_worker}\n"
@@ -109,22 +239,94 @@ class EvaluationAgent:
                 )
         return {
             "final_response": response_from_worker,
-            "evaluation": evaluation,
+            "evaluation": verdict.model_dump(),
             "number_of_iterations": i+1
         }   
 
-prompt = "What is the capital of France?"
+    def evaluate_speculative(self, initial_prompt, num_candidates=3, temperature=0.9):
+        """Generate and judge ``num_candidates`` responses concurrently; return the first that passes.
+
+        Candidate 0 is the worker's usual (temperature 0) answer, the others are
+        sampled at ``temperature``. If none passes, the correction loop continues
+        from candidate 0 as its first interaction. Once a candidate passes, the
+        others are not judged; requests already in flight are abandoned.
+        """
+        start = time.perf_counter()
+        self.llm_calls = 0
+        llm = self._new_llm()
+
+        accepted = threading.Event()
+
+        def generate_and_judge(index):
+            response = self._worker_respond(initial_prompt, temperature=temperature if index else None)
+            if accepted.is_set():
+                return index, response, None
+            return index, response, self.judge(llm, response)
+
+        log(f"\n--- Speculative round: {num_candidates} candidates ---")
+        executor = ThreadPoolExecutor(max_workers=num_candidates, thread_name_prefix="eval-candidate")
+        pending = {executor.submit(generate_and_judge, i) for i in range(num_candidates)}
+        judged = {}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        index, response, verdict = future.result()
+                    except Exception as e:
+                        log(f"Candidate failed: {e}")
+                        continue
+                    judged[index] = (response, verdict)
+                    log(f"Candidate {index}: {response!r}\nEvaluation: {verdict.reasons}")
+                    if self.is_accepted(verdict):
+                        accepted.set()
+                        log(f"✅ Candidate {index} accepted.")
+                        return {
+                            "final_response": response,
+                            "evaluation": verdict.model_dump(),
+                            "number_of_iterations": 1,
+                            "llm_calls": self.llm_calls,
+                            "elapsed": time.perf_counter() - start,
+                        }
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        log("No candidate passed; falling back to the correction loop.")
+        first_round = judged[min(judged)] if judged else None
+        result = self._correction_loop(llm, initial_prompt, first_round)
+        result.update(llm_calls=self.llm_calls, elapsed=time.perf_counter() - start)
+        return result
+
+
+def main():
+    prompt = "What is the capital of France?"
+
+    # Parameters for the Knowledge Agent
+    persona = "You are a college professor, your answer always starts with: Dear students,"
+    knowledge = "The capitol of France is London, not Paris"
+    knowledge_agent = KnowledgeAugmentedPromptAgent(openai_api_key=openai_api_key, persona=persona, knowledge=knowledge)
+
+    # Parameters for the Evaluation Agent
+    persona = "You are an evaluation agent that checks the answers of other worker agents"
+    evaluation_criteria = "The answer should be solely the name of a city, not a sentence."
+    # The checks reject answers that are not a short name; whether it is a city is left to the judge
+    city_only = "Answer with only the name of the city: no greeting, no sentence, no punctuation."
+    prechecks = PreChecks([
+        WordCountCheck(min_words=1, max_words=3, instructions=city_only),
+        RegexCheck(r"[A-Z][A-Za-z'\-]*(?: [A-Z][A-Za-z'\-]*)*", full=True, instructions=city_only, name="city_name"),
+    ])
+    evaluation_agent = EvaluationAgent(openai_api_key=openai_api_key, persona=persona, evaluation_criteria=evaluation_criteria, worker_agent=knowledge_agent, max_interactions=10, prechecks=prechecks)
 
-# Parameters for the Knowledge Agent
-persona = "You are a college professor, your answer always starts with: Dear students,"
-knowledge = "The capitol of France is London, not Paris"
-knowledge_agent = KnowledgeAugmentedPromptAgent(openai_api_key=openai_api_key, persona=persona, knowledge=knowledge)
+    # Evaluate the prompt and print the response from the EvaluationAgent
+    # (EVALUATION_CANDIDATES=3 generates and judges three candidates concurrently first)
+    num_candidates = int(os.getenv("EVALUATION_CANDIDATES", "1"))
+    if num_candidates > 1:
+        evaluation_result = evaluation_agent.evaluate_speculative(prompt, num_candidates=num_candidates)
+    else:
+        evaluation_result = evaluation_agent.evaluate(prompt)
+    print(evaluation_result)
+    print(prechecks.report())
 
-# Parameters for the Evaluation Agent
-persona = "You are an evaluation agent that checks the answers of other worker agents"
-evaluation_criteria = "The answer should be solely the name of a city, not a sentence."
-evaluation_agent = EvaluationAgent(openai_api_key=openai_api_key, persona=persona, evaluation_criteria=evaluation_criteria, worker_agent=knowledge_agent, max_interactions=10)
 
-# Evaluate the prompt and print the response from the EvaluationAgent
-evaluation_result = evaluation_agent.evaluate(prompt)
-print(evaluation_result)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Evaluate a dataset of prompts with EvaluationAgent and write the results to JSONL.
+
+Each line of the dataset is one item:
+
+    {"id": "capital-fr", "prompt": "What is the capital of France?",
+     "criteria": "The answer should be solely the name of a city, not a sentence.",
+     "persona": "...", "knowledge": "..."}
+
+"criteria", "persona" and "knowledge" are optional and default to the command
+line options. Every item runs the worker -> judge loop of EvaluationAgent (up to
+--max-interactions rounds); --concurrency items run at once, and since each item
+makes its calls one after another that is also the limit on requests in flight.
+
+    python evaluation_batch.py dataset.jsonl --output eval_results.jsonl --concurrency 8
+
+Judge verdicts are cached by (response hash, criteria hash) in --verdict-cache, so
+re-running the same dataset only pays for responses that were not judged before.
+A summary (pass rate, latency percentiles, token totals) is printed and written
+to --summary.
+
+A nightly run that can wait for the provider's batch endpoint (cheaper, results
+within 24h) passes --batch-dir. It then runs a single round: all worker answers
+go out as one offline batch, then the verdicts on them as another. Failed answers
+are reported, not corrected, so --max-interactions does not apply.
+
+    python evaluation_batch.py dataset.jsonl --batch-dir ./batches
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator
+
+import numpy as np
+from dotenv import load_dotenv
+
+import evaluation_agent
+from lib.batch import Batch, LocalBatchBackend, OpenAIBatchBackend
+from lib.judge import Verdict, judge_batched
+from lib.usage import UsageTracker
+from lib.verdict_cache import VerdictCache
+
+load_dotenv()
+
+DEFAULT_PERSONA = "You are a helpful assistant"
+DEFAULT_JUDGE_PERSONA = "You are an evaluation agent that checks the answers of other worker agents"
+
+
+def iter_dataset(path: str) -> Iterator[dict]:
+    """Yield dataset items lazily; an item without an "id" gets its line number."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_number))
+            yield item
+
+
+def evaluate_one(item: dict, args, verdict_cache: VerdictCache, usage: UsageTracker) -> dict:
+    """Run one dataset item through the worker -> judge loop; never raises."""
+    start = time.perf_counter()
+    criteria = item.get("criteria", args.criteria)
+    try:
+        if not criteria:
+            raise ValueError("item has no criteria and no --criteria default was given")
+        worker = evaluation_agent.KnowledgeAugmentedPromptAgent(
+            openai_api_key=args.api_key,
+            persona=item.get("persona", args.persona),
+            knowledge=item.get("knowledge", args.knowledge),
+            usage=usage,
+        )
+        agent = evaluation_agent.EvaluationAgent(
+            openai_api_key=args.api_key,
+            persona=args.judge_persona,
+            evaluation_criteria=criteria,
+            worker_agent=worker,
+            max_interactions=args.max_interactions,
+            verdict_cache=verdict_cache,
+            usage=usage,
+        )
+        result = agent.evaluate(item["prompt"])
+    except Exception as e:
+        return {"id": item["id"], "status": "error", "error": f"{type(e).__name__}: {e}",
+                "elapsed": round(time.perf_counter() - start, 3)}
+
+    return {
+        "id": item["id"],
+        "status": "ok",
+        "passed": result["evaluation"]["passed"],
+        "final_response": result["final_response"],
+        "evaluation": result["evaluation"],
+        "iterations": result["number_of_iterations"],
+        "llm_calls": result["llm_calls"],
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_evaluation(args, verdict_cache: VerdictCache, usage: UsageTracker) -> dict:
+    """Evaluate every item of ``args.dataset``, writing one result line per item to ``args.output``.
+
+    Returns:
+        Run statistics (see summarize)
+    """
+    evaluation_agent.verbose = False
+    records = []
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="eval-item")
+    pending = set()
+
+    def drain(return_when):
+        nonlocal pending
+        finished, pending = wait(pending, return_when=return_when)
+        for future in finished:
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            records.append(record)
+            outcome = record["status"] if record["status"] == "error" else ("pass" if record["passed"] else "fail")
+            print(f"[{len(records)}] {record['id']}: {outcome} in {record['elapsed']:.1f}s")
+
+    try:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for item in iter_dataset(args.dataset):
+                if len(pending) >= args.concurrency:
+                    drain(FIRST_COMPLETED)
+                pending.add(executor.submit(evaluate_one, item, args, verdict_cache, usage))
+            while pending:
+                drain(FIRST_COMPLETED)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return summarize(records, time.perf_counter() - start, verdict_cache, usage)
+
+
+def run_evaluation_batched(args, verdict_cache: VerdictCache, usage: UsageTracker, batch: Batch) -> dict:
+    """Evaluate every item of ``args.dataset`` in one round of two offline batches: answers, then verdicts.
+
+    Every item's elapsed time is the whole run, since results only arrive with their batch.
+
+    Returns:
+        Run statistics (see summarize)
+    """
+    from lib.llm import LLM
+    from lib.messages import SystemMessage, UserMessage
+
+    start = time.perf_counter()
+    worker_llm = LLM(api_key=args.api_key, usage=usage, usage_label="worker")
+    judge_llm = LLM(api_key=args.api_key, usage=usage, usage_label="judge")
+    items = list(iter_dataset(args.dataset))
+    records = {item["id"]: {"id": item["id"], "status": "ok", "iterations": 1, "llm_calls": 0} for item in items}
+
+    answers = {}
+    for item in items:
+        if not item.get("criteria", args.criteria):
+            records[item["id"]].update(status="error",
+                                       error="ValueError: item has no criteria and no --criteria default was given")
+            continue
+        worker = evaluation_agent.KnowledgeAugmentedPromptAgent(
+            openai_api_key=args.api_key,
+            persona=item.get("persona", args.persona),
+            knowledge=item.get("knowledge", args.knowledge),
+        )
+        messages = [SystemMessage(content=worker.system_prompt()), UserMessage(content=item["prompt"])]
+        answers[item["id"]] = worker_llm.invoke_batched(messages, batch)
+    batch.run()
+
+    verdicts = {}
+    for item in items:
+        if item["id"] not in answers:
+            continue
+        record, criteria = records[item["id"]], item.get("criteria", args.criteria)
+        try:
+            record["final_response"] = answers[item["id"]].result().content.strip()
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+            continue
+        record["llm_calls"] += 1
+        key = verdict_cache.key(record["final_response"], criteria, args.judge_persona)
+        verdicts[item["id"]] = (key, verdict_cache.get(key)
+                                or judge_batched(judge_llm, args.judge_persona, record["final_response"], criteria, batch))
+    batch.run()
+
+    seconds = time.perf_counter() - start
+    with open(args.output, "w", encoding="utf-8") as out:
+        for item in items:
+            record = records[item["id"]]
+            if item["id"] in verdicts:
+                key, verdict = verdicts[item["id"]]
+                try:
+                    if not isinstance(verdict, Verdict):
+                        verdict = verdict.result()
+                        record["llm_calls"] += 1
+                        verdict_cache.put(key, verdict)
+                    record.update(passed=verdict.passed, evaluation=verdict.model_dump())
+                except Exception as e:
+                    record.update(status="error", error=f"{type(e).__name__}: {e}")
+            record["elapsed"] = round(seconds, 3)
+            out.write(json.dumps(record) + "\n")
+    print(batch.report())
+    return summarize(list(records.values()), seconds, verdict_cache, usage)
+
+
+def summarize(records, seconds: float, verdict_cache: VerdictCache, usage: UsageTracker) -> dict:
+    ok = [r for r in records if r["status"] == "ok"]
+    latencies = np.array([r["elapsed"] for r in records]) if records else np.zeros(1)
+    tokens = {label: usage.totals(label) for label in ("worker", "judge")}
+    return {
+        "items": len(records),
+        "errors": len(records) - len(ok),
+        "passed": sum(r["passed"] for r in ok),
+        "pass_rate": sum(r["passed"] for r in ok) / len(ok) if ok else 0.0,
+        "avg_iterations": sum(r["iterations"] for r in ok) / len(ok) if ok else 0.0,
+        "seconds": round(seconds, 3),
+        "latency_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95": round(float(np.percentile(latencies, 95)), 3),
+        "latency_max": round(float(latencies.max()), 3),
+        "verdict_cache_hits": verdict_cache.stats.hits,
+        "verdict_cache_misses": verdict_cache.stats.misses,
+        "tokens": {
+            label: {k: totals[k] for k in ("calls", "prompt_tokens", "completion_tokens")}
+            for label, totals in tokens.items()
+        },
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        f"Items: {summary['items']} (errors={summary['errors']})  passed: {summary['passed']} "
+        f"({summary['pass_rate']:.1%})  avg iterations: {summary['avg_iterations']:.2f}",
+        f"Wall clock: {summary['seconds']:.1f}s  Latency per item: p50={summary['latency_p50']:.2f}s  "
+        f"p95={summary['latency_p95']:.2f}s  max={summary['latency_max']:.2f}s",
+        f"Verdict cache: {summary['verdict_cache_hits']} hits, {summary['verdict_cache_misses']} misses",
+    ]
+    for label, t in summary["tokens"].items():
+        lines.append(f"{label:<7} calls: {t['calls']}  prompt tokens: {t['prompt_tokens']}  "
+                     f"completion tokens: {t['completion_tokens']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", help="JSONL file with one {id, prompt, criteria, persona, knowledge} item per line")
+    parser.add_argument("--output", default="eval_results.jsonl", help="JSONL file for per-item results")
+    parser.add_argument("--summary", default=None, help="JSON file for the aggregate summary (default: <output>.summary.json)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Items evaluated at once")
+    parser.add_argument("--max-interactions", type=int, default=3, help="Worker -> judge rounds per item")
+    parser.add_argument("--criteria", default="", help="Evaluation criteria for items without one")
+    parser.add_argument("--persona", default=DEFAULT_PERSONA, help="Worker persona for items without one")
+    parser.add_argument("--knowledge", default="", help="Worker knowledge for items without any")
+    parser.add_argument("--judge-persona", default=DEFAULT_JUDGE_PERSONA)
+    parser.add_argument("--verdict-cache", default="verdict_cache.jsonl",
+                        help="JSONL file of cached judge verdicts ('' keeps them in memory only)")
+    parser.add_argument("--batch-dir", default=None,
+                        help="Evaluate one round through offline batch jobs, writing the batch files here")
+    parser.add_argument("--batch-backend", choices=("openai", "local"), default="openai",
+                        help="'local' answers the batch with offline stub responses (no network)")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch status polls")
+    args = parser.parse_args()
+    args.api_key = os.getenv("OPENAI_API_KEY")
+
+    verdict_cache = VerdictCache(args.verdict_cache or None)
+    usage = UsageTracker()
+    if args.batch_dir:
+        backend = (LocalBatchBackend(os.path.join(args.batch_dir, "jobs")) if args.batch_backend == "local"
+                   else OpenAIBatchBackend(evaluation_agent.get_client(args.api_key)))
+        batch = Batch(backend, directory=args.batch_dir, poll_interval=args.poll_interval)
+        summary = run_evaluation_batched(args, verdict_cache, usage, batch)
+    else:
+        summary = run_evaluation(args, verdict_cache, usage)
+
+    summary_path = args.summary or f"{os.path.splitext(args.output)[0]}.summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print()
+    print(format_summary(summary))
+    print(f"Results: {args.output}  Summary: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,76 @@
+import functools
 import os
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from lib.judge import plan_batches
+from lib.prechecks import NumericThresholdCheck, PreChecks
+from lib.rate_limit import limited_create
+from lib.xml_tags import extract_all, extract_xml, parse
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Load environment variables
 load_dotenv()
-client = OpenAI(
-    #base_url = "https://openai.vocareum.com/v1",
-    api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """The OpenAI client, created (and the SDK imported) on first use rather than at import"""
+    from openai import OpenAI
+
+    return OpenAI(
+        #base_url = "https://openai.vocareum.com/v1",
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
+
 
 MAX_RETRIES = 5
+PASSING_RATING = 9
+
+
+class CallStats:
+    """Thread-safe count and total latency of llm_call invocations"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return self.calls, self.seconds
+
+
+LLM_CALLS = CallStats()
+
 
-def llm_call(prompt: str, model: str = "gpt-4o-mini") -> str:
+def llm_call(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.2) -> str:
     """Basic LLM call wrapper."""
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
-    )
+    start = time.perf_counter()
+    try:
+        response = limited_create(get_client().chat.completions,
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature
+        )
+    finally:
+        LLM_CALLS.record(time.perf_counter() - start)
     return response.choices[0].message.content.strip()
 
-def extract_xml(text: str, tag: str) -> str:
-    """Extract content between XML-style tags."""
-    pattern = rf"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, text, re.DOTALL)
-    return match.group(1).strip() if match else ""
 
 # Recipe Optimizer class
 class RecipeOptimizer:
@@ -35,7 +78,8 @@ class RecipeOptimizer:
         self.base_dish = base_dish
         self.constraints = constraints
 
-    def run(self):
+    def run(self, previous=None, temperature=0.2):
+        """Generate a recipe; ``previous`` is an evaluated attempt ({"recipe", "rating", "comments"}) to improve on."""
         constraints_str = "\n".join([f"- {constraint}" for constraint in self.constraints])
         prompt = f"""You are a recipe optimizer. Your task is to optimize the base dish "{self.base_dish}" based on the following user constraints:
 
@@ -53,7 +97,18 @@ Return your response in the following format:
 - <user-comments>
 </response>
 """
-        raw_output = llm_call(prompt)
+        if previous is not None:
+            prompt += f"""
+A previous attempt was rated {previous['rating']}/10 and did not meet the constraints.
+Previous recipe:
+{previous['recipe']}
+
+Evaluator comments:
+{previous['comments']}
+
+Fix these issues in your new recipe.
+"""
+        raw_output = llm_call(prompt, temperature=temperature)
         print("\n[Raw Recipe Optimizer Output]\n", raw_output)
         result = extract_xml(raw_output, "response")
         return result
@@ -70,13 +125,26 @@ RECIPE_REQUEST = {
         "taste must be rated 9/10 or higher"
     ]
 }
+# Numeric constraints checked locally; taste and the other constraints still need the LLM evaluator
+RECIPE_PRECHECKS = PreChecks([
+    # The constraints are strict ("under 500", "more than 15g"), so the bounds themselves fail
+    NumericThresholdCheck(r"calories|kcal", maximum=500, exclusive=True, name="calories",
+                          instructions="Reduce the calories to under 500 per serving."),
+    NumericThresholdCheck(r"protein", minimum=15, exclusive=True, name="protein",
+                          instructions="Raise the protein to more than 15g per serving."),
+])
+
 # Evaluator Agent class
 class EvaluatorAgent:
-    def __init__(self, recipe, constraints):
+    def __init__(self, recipe, constraints, prechecks=None):
         self.recipe = recipe
         self.constraints = constraints
+        self.prechecks = prechecks
 
     def run(self):
+        rejection = precheck_rejection(self.prechecks, self.recipe)
+        if rejection is not None:
+            return rejection
         constraints_str = "\n".join([f"- {constraint}" for constraint in self.constraints])
         prompt = f"""You are a recipe evaluator. Your task is to evaluate the following recipe to check if it meets the user constraints.
 
@@ -95,40 +163,223 @@ Return your response in the following format:
 """
         raw_output = llm_call(prompt)
         print("\n[Raw Evaluator Agent Output]\n", raw_output)
-        response_text = extract_xml(raw_output, "response")
-        
-        # Extract rating and comments from the response
-        rating_text = extract_xml(response_text, "rating")
-        comments_text = extract_xml(response_text, "comments")
-        
-        # Try to extract numeric rating from the text
-        rating_match = re.search(r'\d+', rating_text)
-        rating = int(rating_match.group()) if rating_match else 0
+        # Extract rating and comments from the response in one pass
+        tags = extract_all(raw_output, ["rating", "comments"])
+        rating_text = tags["rating"][0] if tags["rating"] else ""
+        comments_text = tags["comments"][0] if tags["comments"] else ""
         
         return {
-            "rating": rating,
+            "rating": parse_rating(rating_text),
             "comments": comments_text
         }
 
+    @staticmethod
+    def run_batch(recipes, constraints, prechecks=None, max_items=4, max_tokens=6000):
+        """Rate many recipes against the same constraints, up to ``max_items`` per LLM call.
 
-if __name__ == "__main__":
-    # Continue evaluating the recipe using evaluator agent for 5 tries
-    for i in range(5):
-        recipe_optimizer = RecipeOptimizer(RECIPE_REQUEST["base_dish"], RECIPE_REQUEST["constraints"])
-        result = recipe_optimizer.run()
+        Batches are also kept within an estimated ``max_tokens`` (see
+        lib.judge.plan_batches). Recipes the pre-checks reject are not sent, and
+        recipes missing from a batch answer are rated on their own.
+        Returns one {"rating", "comments"} dict per recipe, in order.
+        """
+        results = [precheck_rejection(prechecks, recipe) for recipe in recipes]
+        pending = [i for i, result in enumerate(results) if result is None]
+        constraints_str = "\n".join([f"- {constraint}" for constraint in constraints])
+
+        for batch in plan_batches([(recipes[i], constraints_str) for i in pending], max_items, max_tokens):
+            indices = [pending[b] for b in batch]
+            recipes_str = "\n\n".join(f"Recipe {n}:\n{recipes[i]}" for n, i in enumerate(indices, start=1))
+            prompt = f"""You are a recipe evaluator. Your task is to evaluate each of the following {len(indices)} recipes independently to check if it meets the user constraints.
+
+{recipes_str}
+
+User Constraints:
+{constraints_str}
+
+Give each recipe a rating between 1 and 10 based on how well it meets these constraints.
+Return your response in the following format, one <item> per recipe:
+<response>
+<item><number>1</number><rating>8</rating><comments>Your comments here</comments></item>
+</response>
+"""
+            raw_output = llm_call(prompt)
+            print("\n[Raw Batch Evaluator Output]\n", raw_output)
+            for item in parse(raw_output, ["item", "number", "rating", "comments"]).find_all("item"):
+                number = parse_rating(item.child_text("number"))
+                if 1 <= number <= len(indices):
+                    results[indices[number - 1]] = {
+                        "rating": parse_rating(item.child_text("rating")),
+                        "comments": item.child_text("comments"),
+                    }
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = EvaluatorAgent(recipes[i], constraints).run()
+        return results
+
+
+def precheck_rejection(prechecks, recipe):
+    """Evaluator result for a recipe the local pre-checks reject (no LLM call), else None"""
+    if prechecks is None:
+        return None
+    verdict = prechecks.verdict(recipe)
+    if verdict is None or verdict.passed:
+        return None
+    print("\n[Evaluator Pre-checks]\n", verdict.reasons)
+    return {
+        "rating": 0,
+        "comments": f"{verdict.reasons}. {verdict.correction_instructions()}",
+    }
+
+
+def parse_rating(rating_text):
+    """Numeric rating from the text (0 if there is none)"""
+    rating_match = re.search(r'\d+', rating_text)
+    return int(rating_match.group()) if rating_match else 0
+
+
+def optimize_best_of_n(base_dish, constraints, num_candidates=3, max_rounds=MAX_RETRIES,
+                       temperature=0.9, prechecks=None):
+    """Generate and evaluate ``num_candidates`` recipes per round concurrently.
+
+    Candidate 0 uses the optimizer's usual temperature, the others are sampled
+    at ``temperature``. As soon as one candidate is rated PASSING_RATING or
+    higher the round stops: queued candidates are cancelled and candidates
+    still generating skip their evaluation (their in-flight request is
+    abandoned). Otherwise the best-rated candidate and its comments are fed
+    into the next round.
+
+    Returns:
+        Dict with the best recipe, its rating and comments, whether it passed,
+        rounds used, llm_calls completed, skipped_calls (never sent),
+        abandoned_calls (in flight when a candidate passed), elapsed seconds
+        and serial_seconds (the completed calls made one after another)
+    """
+    start = time.perf_counter()
+    calls_before, seconds_before = LLM_CALLS.snapshot()
+    skipped = abandoned = 0
+    best = None
+
+    for round_number in range(1, max_rounds + 1):
+        print(f"\n--- Round {round_number}: {num_candidates} candidates ---")
+        accepted = threading.Event()
+        previous = best
+        evaluating = set()
+
+        def generate_and_evaluate(index):
+            recipe = RecipeOptimizer(base_dish, constraints).run(
+                previous=previous, temperature=temperature if index else 0.2)
+            if accepted.is_set():
+                return None
+            evaluating.add(index)
+            evaluation = EvaluatorAgent(recipe, constraints, prechecks=prechecks).run()
+            return {"recipe": recipe, "rating": evaluation["rating"], "comments": evaluation["comments"]}
+
+        executor = ThreadPoolExecutor(max_workers=num_candidates, thread_name_prefix="recipe-candidate")
+        futures = {executor.submit(generate_and_evaluate, i): i for i in range(num_candidates)}
+        pending = set(futures)
+        try:
+            while pending and not accepted.is_set():
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        candidate = future.result()
+                    except Exception as e:
+                        print(f"Candidate failed: {e}")
+                        continue
+                    if candidate is None:
+                        continue
+                    print(f"Candidate rated {candidate['rating']}/10: {candidate['comments']}")
+                    if best is None or candidate["rating"] > best["rating"]:
+                        best = candidate
+                    if candidate["rating"] >= PASSING_RATING:
+                        accepted.set()
+        finally:
+            accepted.set()
+            for future in pending:
+                if future.cancel():
+                    # Never started: saves its optimizer and evaluator calls
+                    skipped += 2
+                else:
+                    # Still running: its request is abandoned, and if it is still
+                    # generating, its evaluation is skipped
+                    abandoned += 1
+                    skipped += futures[future] not in evaluating
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if best is not None and best["rating"] >= PASSING_RATING:
+            print("Recipe meets constraints.")
+            break
+        print(f"No candidate met the constraints. Retrying with the best one's comments... ({round_number}/{max_rounds})")
+
+    calls, seconds = LLM_CALLS.snapshot()
+    return {
+        **(best or {"recipe": "", "rating": 0, "comments": ""}),
+        "passed": best is not None and best["rating"] >= PASSING_RATING,
+        "rounds": round_number,
+        "llm_calls": calls - calls_before,
+        "skipped_calls": skipped,
+        "abandoned_calls": abandoned,
+        "elapsed": time.perf_counter() - start,
+        "serial_seconds": seconds - seconds_before,
+    }
+
+
+def optimize_serial(base_dish, constraints, max_rounds=MAX_RETRIES, prechecks=None):
+    """One optimize -> evaluate round at a time, feeding the comments into the next round."""
+    start = time.perf_counter()
+    calls_before, _ = LLM_CALLS.snapshot()
+    previous = None
+    for i in range(max_rounds):
+        recipe_optimizer = RecipeOptimizer(base_dish, constraints)
+        result = recipe_optimizer.run(previous=previous)
         print("\n[Recipe Optimizer Result]\n", result)
         
-        evaluator_agent = EvaluatorAgent(result, RECIPE_REQUEST["constraints"])
+        evaluator_agent = EvaluatorAgent(result, constraints, prechecks=prechecks)
         evaluator_result = evaluator_agent.run()
         print("\n[Evaluator Agent Result]\n", evaluator_result)
         print(f"Rating: {evaluator_result['rating']}/10")
         print(f"Comments: {evaluator_result['comments']}")
+        previous = {"recipe": result, **evaluator_result}
         
-        if evaluator_result["rating"] >= 9:
+        if evaluator_result["rating"] >= PASSING_RATING:
             print("Recipe meets constraints. Exiting...")
             break
         else:
-            print(f"Recipe did not meet constraints. Retrying... ({i+1}/5)")
+            print(f"Recipe did not meet constraints. Retrying... ({i+1}/{max_rounds})")
+    else:
+        print(f"Failed to meet constraints after {max_rounds} tries. Please try again.")
+    calls, _ = LLM_CALLS.snapshot()
+    return {
+        **previous,
+        "passed": previous["rating"] >= PASSING_RATING,
+        "rounds": i + 1,
+        "llm_calls": calls - calls_before,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def print_summary(result):
+    print(f"\n[Summary] passed={result['passed']} rating={result['rating']}/10 rounds={result['rounds']} "
+          f"llm_calls={result['llm_calls']} elapsed={result['elapsed']:.1f}s")
+    if "serial_seconds" in result:
+        print(f"[Summary] calls skipped by early stop={result['skipped_calls']} "
+              f"in-flight calls abandoned={result['abandoned_calls']} "
+              f"time saved vs. running these calls serially={result['serial_seconds'] - result['elapsed']:.1f}s")
+
+
+def main():
+    # RECIPE_CANDIDATES=3 generates and evaluates three recipes per round concurrently
+    num_candidates = int(os.getenv("RECIPE_CANDIDATES", "1"))
+    if num_candidates > 1:
+        result = optimize_best_of_n(RECIPE_REQUEST["base_dish"], RECIPE_REQUEST["constraints"],
+                                    num_candidates=num_candidates, prechecks=RECIPE_PRECHECKS)
     else:
-        print("Failed to meet constraints after 5 tries. Please try again.")
-   
\ No newline at end of file
+        result = optimize_serial(RECIPE_REQUEST["base_dish"], RECIPE_REQUEST["constraints"],
+                                 prechecks=RECIPE_PRECHECKS)
+    print_summary(result)
+    print(RECIPE_PRECHECKS.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # Step 1: Define tools and model
 
+import functools
 import os
 from dotenv import load_dotenv
 from langchain_core.tools import tool
@@ -8,14 +9,17 @@ from langchain.chat_models import init_chat_model
 # Load environment variables
 load_dotenv()
 
-# Initialize model
-# Note: For Claude models, set ANTHROPIC_API_KEY in your .env file
-# The init_chat_model function automatically reads API keys from environment variables
-# Using Claude Haiku 3 - the cheapest Claude model ($0.25/$1.25 per million input/output tokens)
-model = init_chat_model(
-    "claude-3-haiku-20240307",
-    temperature=0
-)
+
+@functools.lru_cache(maxsize=None)
+def get_model():
+    """The chat model, created on first use rather than at import."""
+    # Note: For Claude models, set ANTHROPIC_API_KEY in your .env file
+    # The init_chat_model function automatically reads API keys from environment variables
+    # Using Claude Haiku 3 - the cheapest Claude model ($0.25/$1.25 per million input/output tokens)
+    return init_chat_model(
+        "claude-3-haiku-20240307",
+        temperature=0
+    )
 
 
 # Define tools
@@ -55,7 +59,13 @@ def divide(a: int, b: int) -> float:
 # Augment the LLM with tools
 tools = [add, multiply, divide]
 tools_by_name = {tool.name: tool for tool in tools}
-model_with_tools = model.bind_tools(tools)
+
+
+@functools.lru_cache(maxsize=None)
+def get_model_with_tools():
+    """The chat model with the tools bound, built once on first use."""
+    return get_model().bind_tools(tools)
+
 
 # Step 2: Define state
 
@@ -77,7 +87,7 @@ def llm_call(state: dict):
 
     return {
         "messages": [
-            model_with_tools.invoke(
+            get_model_with_tools().invoke(
                 [
                     SystemMessage(
                         content="You are a helpful assistant tasked with performing arithmetic on a set of inputs."
@@ -127,33 +137,43 @@ def should_continue(state: MessagesState) -> Literal["tool_node", END]:
 
 # Step 6: Build agent
 
-# Build workflow
-agent_builder = StateGraph(MessagesState)
+@functools.lru_cache(maxsize=None)
+def build_agent():
+    """Builds and compiles the agent graph once, on first use rather than at import."""
+    # Build workflow
+    agent_builder = StateGraph(MessagesState)
+
+    # Add nodes
+    agent_builder.add_node("llm_call", llm_call)
+    agent_builder.add_node("tool_node", tool_node)
+
+    # Add edges to connect nodes
+    agent_builder.add_edge(START, "llm_call")
+    agent_builder.add_conditional_edges(
+        "llm_call",
+        should_continue,
+        ["tool_node", END]
+    )
+    agent_builder.add_edge("tool_node", "llm_call")
+
+    # Compile the agent
+    return agent_builder.compile()
 
-# Add nodes
-agent_builder.add_node("llm_call", llm_call)
-agent_builder.add_node("tool_node", tool_node)
 
-# Add edges to connect nodes
-agent_builder.add_edge(START, "llm_call")
-agent_builder.add_conditional_edges(
-    "llm_call",
-    should_continue,
-    ["tool_node", END]
-)
-agent_builder.add_edge("tool_node", "llm_call")
+def main():
+    agent = build_agent()
 
-# Compile the agent
-agent = agent_builder.compile()
+    # Show the agent (IPython is only needed for the demo)
+    from IPython.display import Image, display
+    display(Image(agent.get_graph(xray=True).draw_mermaid_png()))
 
+    # Invoke
+    from langchain_core.messages import HumanMessage
+    messages = [HumanMessage(content="Add 3 and 4.")]
+    messages = agent.invoke({"messages": messages})
+    for m in messages["messages"]:
+        m.pretty_print()
 
-from IPython.display import Image, display
-# Show the agent
-display(Image(agent.get_graph(xray=True).draw_mermaid_png()))
 
-# Invoke
-from langchain_core.messages import HumanMessage
-messages = [HumanMessage(content="Add 3 and 4.")]
-messages = agent.invoke({"messages": messages})
-for m in messages["messages"]:
-    m.pretty_print()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
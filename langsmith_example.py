@@ -6,13 +6,18 @@ def get_weather(city: str) -> str:
     return f"It's always sunny in {city}!"
 
 
-agent = create_agent(
-    model="openai:gpt-5-mini",
-    tools=[get_weather],
-    system_prompt="You are a helpful assistant",
-)
+def main():
+    agent = create_agent(
+        model="openai:gpt-5-mini",
+        tools=[get_weather],
+        system_prompt="You are a helpful assistant",
+    )
 
-# Run the agent
-agent.invoke(
-    {"messages": [{"role": "user", "content": "What is the crime rate in San Francisco?"}]}
-)
\ No newline at end of file
+    # Run the agent
+    agent.invoke(
+        {"messages": [{"role": "user", "content": "What is the crime rate in San Francisco?"}]}
+    )
+
+
+if __name__ == "__main__":
+    main()
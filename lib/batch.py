@@ -0,0 +1,405 @@
+"""Offline batch submission for jobs that do not need interactive latency.
+
+Nightly work (bulk contract analysis, RAG ingestion, evaluation datasets) can
+go through the provider's batch endpoint, which is cheaper and has separate,
+higher limits, at the price of results arriving minutes to hours later:
+
+    batch = Batch(OpenAIBatchBackend(), directory="./batches")
+    answers = [llm.invoke_batched(prompt, batch) for prompt in prompts]
+    vectors = embedder.embed_many_batched(texts, batch)
+    batch.run()                                   # write, submit, poll, map back
+    print(answers[0].result().content)
+
+Each request gets a ``concurrent.futures.Future`` that ``Batch.run`` resolves
+from the job's output file by ``custom_id``. Requests are grouped into one
+JSONL file (and job) per endpoint, split at the provider's per-job limits on
+requests, file size and (for embeddings) total inputs. If ``run`` times out,
+the unfinished jobs stay on the ``Batch`` and calling ``run`` again resumes
+polling them.
+
+``LocalBatchBackend`` is a file-based stand-in that runs a job in a background
+thread with a local handler and writes the same output format, so batch mode
+can be exercised without network.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+EMBEDDINGS_ENDPOINT = "/v1/embeddings"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Per-job limits of the OpenAI batch API: requests per file, input file size, and
+# inputs across all requests of an embeddings job
+MAX_REQUESTS_PER_JOB = 50000
+MAX_BYTES_PER_JOB = 200 * 1024 * 1024
+MAX_EMBEDDING_INPUTS_PER_JOB = 50000
+
+
+class BatchRequestError(Exception):
+    """A batched request failed or the job ended without its result"""
+
+
+@dataclass
+class BatchJob:
+    id: str
+    endpoint: str
+    status: str
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class BatchBackend:
+    """Where batch files are submitted; subclasses implement submit, poll and results"""
+
+    def submit(self, input_path: str, endpoint: str) -> str:
+        """Submit a JSONL batch file and return the job id"""
+        raise NotImplementedError
+
+    def poll(self, job_id: str) -> BatchJob:
+        raise NotImplementedError
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Output lines of a finished job: {"custom_id", "response": {"status_code", "body"}, "error"}"""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The OpenAI Batch API (files upload + /v1/batches)
+
+    Args:
+        client: OpenAI client (default: one from the environment)
+        completion_window: How long the provider may take, "24h" is the only accepted value
+    """
+
+    def __init__(self, client=None, completion_window: str = "24h"):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self.client = client
+        self.completion_window = completion_window
+        self._files: Dict[str, List[str]] = {}
+
+    def submit(self, input_path: str, endpoint: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        job = self.client.batches.create(
+            input_file_id=uploaded.id, endpoint=endpoint, completion_window=self.completion_window)
+        return job.id
+
+    def poll(self, job_id: str) -> BatchJob:
+        job = self.client.batches.retrieve(job_id)
+        self._files[job_id] = [f for f in (job.output_file_id, job.error_file_id) if f]
+        counts = job.request_counts
+        return BatchJob(job.id, job.endpoint, job.status, total=counts.total if counts else 0,
+                        completed=counts.completed if counts else 0, failed=counts.failed if counts else 0)
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        for file_id in self._files.get(job_id, []):
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _stub_instance(schema: Dict[str, Any]) -> Any:
+    """The emptiest value of a JSON schema (false, 0, "", [] or an object of those)"""
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _stub_instance(field) for name, field in schema.get("properties", {}).items()}
+    return {"boolean": False, "integer": 0, "number": 0, "array": []}.get(kind, "")
+
+
+def stub_handler(endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Offline answer to one request: echoes the last user message, or hashes texts into 8-d vectors.
+
+    A request with a json_schema ``response_format`` gets the emptiest instance of its schema.
+    """
+    if endpoint == EMBEDDINGS_ENDPOINT:
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for index, text in enumerate(texts):
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            data.append({"object": "embedding", "index": index,
+                         "embedding": [b / 255.0 for b in digest[:8]]})
+        return {"object": "list", "model": body.get("model"), "data": data,
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+    user = [m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user"]
+    content = user[-1] if user else ""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        content = json.dumps(_stub_instance(response_format["json_schema"]["schema"]))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for a provider's batch endpoint.
+
+    A job is a directory holding ``input.jsonl``, ``status.json`` and, once
+    finished, ``output.jsonl``; a background thread answers each line with
+    ``handler(endpoint, body) -> response body``.
+
+    Args:
+        directory: Where job directories are created
+        handler: Answers one request; an exception becomes that request's error line
+        delay: Seconds the job stays queued before it runs (to exercise polling)
+    """
+
+    def __init__(self, directory: str = "batches", handler: Callable = stub_handler, delay: float = 0.0):
+        self.directory = directory
+        self.handler = handler
+        self.delay = delay
+
+    def __repr__(self) -> str:
+        return f"LocalBatchBackend(directory={self.directory!r})"
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def _write_status(self, job: BatchJob):
+        tmp = self._path(job.id, "status.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.__dict__, f)
+        os.replace(tmp, self._path(job.id, "status.json"))
+
+    def submit(self, input_path: str, endpoint: str) -> str:
+        job_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.directory, job_id))
+        shutil.copyfile(input_path, self._path(job_id, "input.jsonl"))
+        self._write_status(BatchJob(job_id, endpoint, "validating"))
+        threading.Thread(target=self._run_job, args=(job_id, endpoint), daemon=True).start()
+        return job_id
+
+    def _run_job(self, job_id: str, endpoint: str):
+        time.sleep(self.delay)
+        job = BatchJob(job_id, endpoint, "in_progress")
+        self._write_status(job)
+        with open(self._path(job_id, "input.jsonl"), encoding="utf-8") as src, \
+                open(self._path(job_id, "output.jsonl"), "w", encoding="utf-8") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                job.total += 1
+                try:
+                    body = self.handler(request["url"], request["body"])
+                    record = {"custom_id": request["custom_id"],
+                              "response": {"status_code": 200, "body": body}, "error": None}
+                    job.completed += 1
+                except Exception as e:
+                    record = {"custom_id": request["custom_id"], "response": None,
+                              "error": {"code": type(e).__name__, "message": str(e)}}
+                    job.failed += 1
+                out.write(json.dumps(record) + "\n")
+        job.status = "completed"
+        self._write_status(job)
+
+    def poll(self, job_id: str) -> BatchJob:
+        with open(self._path(job_id, "status.json"), encoding="utf-8") as f:
+            return BatchJob(**json.load(f))
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        path = self._path(job_id, "output.jsonl")
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _json_default(value: Any) -> Any:
+    # Message fields such as tool calls are SDK (pydantic) objects
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _input_count(body: Dict[str, Any]) -> int:
+    """Inputs in an embeddings request body"""
+    return len(body["input"]) if isinstance(body.get("input"), list) else 1
+
+
+@dataclass
+class _Pending:
+    endpoint: str
+    body: Dict[str, Any]
+    future: Future
+    convert: Optional[Callable]
+
+
+class Batch:
+    """Requests collected for one offline run.
+
+    Args:
+        backend: Where the batch files are submitted
+        directory: Where the JSONL batch files are written
+        poll_interval: Seconds between status polls
+        max_requests: Requests per job (larger groups are split)
+        max_bytes: Size of one job's input file
+        max_inputs: Inputs across the requests of one embeddings job
+    """
+
+    def __init__(self, backend: BatchBackend, directory: str = "batches", poll_interval: float = 30.0,
+                 max_requests: int = MAX_REQUESTS_PER_JOB, max_bytes: int = MAX_BYTES_PER_JOB,
+                 max_inputs: int = MAX_EMBEDDING_INPUTS_PER_JOB):
+        self.backend = backend
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_inputs = max_inputs
+        self.jobs: List[BatchJob] = []
+        self._pending: Dict[str, _Pending] = {}
+        # Submitted jobs not finished yet, and their requests by custom_id
+        self._running: Dict[str, List[str]] = {}
+        self._submitted: Dict[str, _Pending] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Batch(pending={len(self._pending)}, running_jobs={len(self._running)}, backend={self.backend!r})"
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> List[str]:
+        """Ids of the submitted jobs run() has not seen finish"""
+        return list(self._running)
+
+    def add(self, endpoint: str, body: Dict[str, Any], convert: Optional[Callable] = None) -> Future:
+        """Queue one request; the future resolves to ``convert(response body)`` after run()"""
+        future = Future()
+        with self._lock:
+            # Unique across runs, since a resumed run still resolves earlier jobs' ids
+            custom_id = f"request-{self._next_id}"
+            self._next_id += 1
+            self._pending[custom_id] = _Pending(endpoint, body, future, convert)
+        return future
+
+    def _write_files(self, pending: Dict[str, _Pending]) -> List[tuple]:
+        """Write the JSONL files, one per endpoint and job-sized part; returns (path, endpoint, custom_ids)
+
+        A part ends before a request that would take it past max_requests, max_bytes
+        or (embeddings) max_inputs. A single request over a limit still gets its own part.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        by_endpoint: Dict[str, List[str]] = {}
+        for custom_id, request in pending.items():
+            by_endpoint.setdefault(request.endpoint, []).append(custom_id)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        files = []
+        for endpoint, ids in by_endpoint.items():
+            name = endpoint.strip("/").replace("/", "-")
+            parts: List[tuple] = []
+            lines, chunk, size, inputs = [], [], 0, 0
+            for custom_id in ids:
+                line = (json.dumps({"custom_id": custom_id, "method": "POST", "url": endpoint,
+                                    "body": pending[custom_id].body}, default=_json_default) + "\n").encode("utf-8")
+                count = _input_count(pending[custom_id].body) if endpoint == EMBEDDINGS_ENDPOINT else 0
+                if chunk and (len(chunk) >= self.max_requests or size + len(line) > self.max_bytes
+                              or inputs + count > self.max_inputs):
+                    parts.append((lines, chunk))
+                    lines, chunk, size, inputs = [], [], 0, 0
+                lines.append(line)
+                chunk.append(custom_id)
+                size += len(line)
+                inputs += count
+            parts.append((lines, chunk))
+            for part, (lines, chunk) in enumerate(parts):
+                path = os.path.join(self.directory, f"{name}-{stamp}-{uuid.uuid4().hex[:6]}-{part}.jsonl")
+                with open(path, "wb") as f:
+                    f.writelines(lines)
+                files.append((path, endpoint, chunk))
+        return files
+
+    def run(self, timeout: Optional[float] = None) -> List[BatchJob]:
+        """Submit every queued request, wait for the jobs and resolve the futures.
+
+        A request whose line reports an error, or that is missing from the job
+        it was submitted in because that job failed or expired, gets a
+        BatchRequestError; requests in the endpoint's other jobs are unaffected.
+
+        If ``timeout`` passes first, TimeoutError is raised and the unfinished
+        jobs (see ``running``) keep their requests: calling run() again resumes
+        polling them, along with submitting anything queued since.
+
+        Returns:
+            The jobs that finished during this call
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            files = self._write_files(pending)
+            self._submitted.update(pending)
+            # The custom_ids submitted in each job, so a failed job only fails its own requests
+            job_ids = []
+            for path, endpoint, ids in files:
+                job_id = self.backend.submit(path, endpoint)
+                self._running[job_id] = ids
+                job_ids.append(job_id)
+            print(f"[Batch] submitted {len(pending)} requests as {len(job_ids)} job(s): {', '.join(job_ids)}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        finished = []
+        while self._running:
+            for job_id in list(self._running):
+                job = self.backend.poll(job_id)
+                if not job.done:
+                    continue
+                print(f"[Batch] {job_id}: {job.status} ({job.completed}/{job.total} ok, {job.failed} failed)")
+                requests = {custom_id: self._submitted.pop(custom_id) for custom_id in self._running.pop(job_id)}
+                self._resolve(job, requests)
+                for custom_id, request in requests.items():
+                    if not request.future.done():
+                        request.future.set_exception(BatchRequestError(f"{custom_id}: no result in the batch output"))
+                self.jobs.append(job)
+                finished.append(job)
+            if self._running:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"batch jobs still running after {timeout}s (call run() again to resume): "
+                                       f"{list(self._running)}")
+                time.sleep(self.poll_interval)
+        return finished
+
+    def _resolve(self, job: BatchJob, pending: Dict[str, _Pending]):
+        """Resolve the futures of ``pending``, the requests submitted in ``job``"""
+        for record in self.backend.results(job.id):
+            request = pending.get(record.get("custom_id"))
+            if request is None or request.future.done():
+                continue
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code", 200) >= 400:
+                error = record.get("error") or response.get("body", {}).get("error")
+                request.future.set_exception(BatchRequestError(f"{record['custom_id']}: {error}"))
+                continue
+            try:
+                body = response["body"]
+                request.future.set_result(request.convert(body) if request.convert else body)
+            except Exception as e:
+                request.future.set_exception(e)
+        if job.status != "completed":
+            for custom_id, request in pending.items():
+                if not request.future.done():
+                    request.future.set_exception(BatchRequestError(f"{custom_id}: batch job {job.id} {job.status}"))
+
+    def report(self) -> str:
+        totals = [sum(getattr(j, field) for j in self.jobs) for field in ("total", "completed", "failed")]
+        return f"[Batch] jobs={len(self.jobs)} requests={totals[0]} completed={totals[1]} failed={totals[2]}"
@@ -0,0 +1,258 @@
+"""Interchangeable chat backends for the agents: OpenAI, Gemini, LiteLLM, LangChain, LlamaIndex.
+
+Every backend answers a (system prompt, user prompt) pair three ways:
+
+    backend.complete(system, prompt)          -> str
+    await backend.acomplete(system, prompt)   -> str
+    for delta in backend.stream(system, prompt): ...
+
+so an agent written against ``ChatBackend`` can be moved from one SDK to
+another, or several SDKs can be compared under the same load. Each SDK is
+imported when its backend is created, so only the SDKs actually used need to
+be installed. All calls go through the shared rate limiter (lib.rate_limit).
+
+    backend = make_backend("litellm", model="moonshotai/Kimi-K2-Instruct",
+                           api_key=key, base_url="https://api.tokenfactory.nebius.com/v1/")
+"""
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from lib.rate_limit import estimate_tokens, get_rate_limiter, limited_acreate, limited_create
+
+
+def _strip_provider(model: str) -> str:
+    # "openai/<model>" selects LiteLLM's provider; the endpoint itself expects the bare name
+    return model[len("openai/"):] if model.startswith("openai/") else model
+
+
+class ChatBackend:
+    """Base class: subclasses implement ``complete`` and, where the SDK supports it, native async and streaming.
+
+    Args:
+        model: Model name as the endpoint expects it
+        api_key: Provider API key (None = the SDK's environment default)
+        base_url: OpenAI-compatible endpoint, for backends that accept one
+        temperature: Sampling temperature of every call
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 temperature: float = 0.2):
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.temperature = temperature
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(model={self.model!r})"
+
+    def _messages(self, system: str, prompt: str):
+        return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+    def _estimate(self, system: str, prompt: str) -> int:
+        return estimate_tokens({"messages": self._messages(system, prompt)})
+
+    def complete(self, system: str, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        """Default: the sync call in a worker thread"""
+        return await asyncio.to_thread(self.complete, system, prompt)
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        """Default: the whole answer as a single chunk"""
+        yield self.complete(system, prompt)
+
+    async def astream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        """Default: the whole answer as a single chunk"""
+        yield await self.acomplete(system, prompt)
+
+
+class OpenAIBackend(ChatBackend):
+    """OpenAI SDK (also any OpenAI-compatible endpoint via ``base_url``)"""
+
+    name = "openai"
+
+    def __init__(self, model: str = "gpt-4o-mini", **kwargs):
+        super().__init__(model, **kwargs)
+        from openai import AsyncOpenAI, OpenAI
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    def _payload(self, system: str, prompt: str) -> Dict:
+        return {"model": self.model, "messages": self._messages(system, prompt), "temperature": self.temperature}
+
+    def complete(self, system: str, prompt: str) -> str:
+        response = limited_create(self.client.chat.completions, **self._payload(system, prompt))
+        return response.choices[0].message.content or ""
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        response = await limited_acreate(self.async_client.chat.completions, **self._payload(system, prompt))
+        return response.choices[0].message.content or ""
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        payload = self._payload(system, prompt)
+        with get_rate_limiter().slot(estimate_tokens(payload)):
+            for chunk in self.client.chat.completions.create(stream=True, **payload):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def astream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        payload = self._payload(system, prompt)
+        async with get_rate_limiter().aslot(estimate_tokens(payload)):
+            async for chunk in await self.async_client.chat.completions.create(stream=True, **payload):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+class LiteLLMBackend(ChatBackend):
+    """LiteLLM; with a ``base_url`` the endpoint is treated as OpenAI-compatible"""
+
+    name = "litellm"
+
+    def __init__(self, model: str = "gpt-4o-mini", **kwargs):
+        super().__init__(model, **kwargs)
+        import litellm
+        self.litellm = litellm
+
+    def _payload(self, system: str, prompt: str) -> Dict:
+        payload = {"model": self.model, "messages": self._messages(system, prompt),
+                   "temperature": self.temperature, "api_key": self.api_key}
+        if self.base_url:
+            payload.update(model=_strip_provider(self.model), api_base=self.base_url, custom_llm_provider="openai")
+        return payload
+
+    def complete(self, system: str, prompt: str) -> str:
+        response = limited_create(self.litellm, "completion", **self._payload(system, prompt))
+        return response.choices[0].message.content or ""
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        response = await limited_acreate(self.litellm, "acompletion", **self._payload(system, prompt))
+        return response.choices[0].message.content or ""
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        payload = self._payload(system, prompt)
+        with get_rate_limiter().slot(estimate_tokens(payload)):
+            for chunk in self.litellm.completion(stream=True, **payload):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+class LangChainBackend(ChatBackend):
+    """LangChain ``ChatOpenAI``"""
+
+    name = "langchain"
+
+    def __init__(self, model: str = "gpt-4o-mini", **kwargs):
+        super().__init__(model, **kwargs)
+        from langchain_core.messages import HumanMessage, SystemMessage
+        from langchain_openai import ChatOpenAI
+        self._message_types = (SystemMessage, HumanMessage)
+        self.llm = ChatOpenAI(model=_strip_provider(self.model), api_key=self.api_key, base_url=self.base_url,
+                              temperature=self.temperature)
+
+    def _lc_messages(self, system: str, prompt: str):
+        system_type, human_type = self._message_types
+        return [system_type(content=system), human_type(content=prompt)]
+
+    def complete(self, system: str, prompt: str) -> str:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            return self.llm.invoke(self._lc_messages(system, prompt)).content
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        async with get_rate_limiter().aslot(self._estimate(system, prompt)):
+            return (await self.llm.ainvoke(self._lc_messages(system, prompt))).content
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            for chunk in self.llm.stream(self._lc_messages(system, prompt)):
+                if chunk.content:
+                    yield chunk.content
+
+
+class LlamaIndexBackend(ChatBackend):
+    """LlamaIndex ``OpenAI`` LLM; system and user prompt are sent as one completion prompt"""
+
+    name = "llamaindex"
+
+    def __init__(self, model: str = "gpt-4o-mini", **kwargs):
+        super().__init__(model, **kwargs)
+        from llama_index.llms.openai import OpenAI
+        self.llm = OpenAI(model=_strip_provider(self.model), api_key=self.api_key, api_base=self.base_url,
+                          temperature=self.temperature)
+
+    @staticmethod
+    def _prompt(system: str, prompt: str) -> str:
+        # complete() avoids the chat role mapping, which differs between LlamaIndex versions
+        return f"{system}\n\nUser prompt: {prompt}"
+
+    def complete(self, system: str, prompt: str) -> str:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            return self.llm.complete(self._prompt(system, prompt)).text
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        async with get_rate_limiter().aslot(self._estimate(system, prompt)):
+            return (await self.llm.acomplete(self._prompt(system, prompt))).text
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            for chunk in self.llm.stream_complete(self._prompt(system, prompt)):
+                if chunk.delta:
+                    yield chunk.delta
+
+
+class GeminiBackend(ChatBackend):
+    """Google Gemini (``google.generativeai``); system and user prompt are sent as one prompt"""
+
+    name = "gemini"
+
+    def __init__(self, model: str = "gemma-3-27b-it", **kwargs):
+        super().__init__(model, **kwargs)
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        self.genai = genai
+        self.llm = genai.GenerativeModel(self.model)
+
+    def list_available_models(self):
+        """Print the models that support generateContent"""
+        print("Available Gemini models:")
+        for model in self.genai.list_models():
+            if "generateContent" in model.supported_generation_methods:
+                print(f"  - {model.name}")
+
+    @staticmethod
+    def _prompt(system: str, prompt: str) -> str:
+        return f"{system}\n\nUser prompt: {prompt}"
+
+    def complete(self, system: str, prompt: str) -> str:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            response = self.llm.generate_content(self._prompt(system, prompt),
+                                                 generation_config={"temperature": self.temperature})
+            return response.text
+
+    async def acomplete(self, system: str, prompt: str) -> str:
+        async with get_rate_limiter().aslot(self._estimate(system, prompt)):
+            response = await self.llm.generate_content_async(self._prompt(system, prompt),
+                                                             generation_config={"temperature": self.temperature})
+            return response.text
+
+    def stream(self, system: str, prompt: str) -> Iterator[str]:
+        with get_rate_limiter().slot(self._estimate(system, prompt)):
+            for chunk in self.llm.generate_content(self._prompt(system, prompt), stream=True,
+                                                   generation_config={"temperature": self.temperature}):
+                if chunk.text:
+                    yield chunk.text
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIBackend, GeminiBackend, LiteLLMBackend, LangChainBackend, LlamaIndexBackend)
+}
+
+
+def make_backend(name: str, **kwargs) -> ChatBackend:
+    """Create the backend called ``name`` (see BACKENDS); raises ImportError if its SDK is not installed"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,134 @@
+"""Clause-aware splitting of long contracts into shards.
+
+Contracts are split on top-level numbered section headings such as
+``1. SERVICES.`` or ``12. GOVERNING LAW``. Whole clauses are then packed
+greedily into shards of at most ``max_chars`` characters; a clause that is
+longer than that on its own is cut at paragraph (or, failing that, line)
+boundaries. Every shard is prefixed with the contract preamble so the parties
+and defined terms stay in view.
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+# "1. SERVICES." / "12. GOVERNING LAW:" / "3. TERM" alone on its line
+CLAUSE_HEADING = re.compile(
+    r"^[ \t]*(\d{1,3})\.[ \t]+([A-Z][A-Z0-9 ,;&/'()\-]*[A-Z0-9)])(?:[.:]|[ \t]*$)",
+    re.MULTILINE,
+)
+
+# Preamble context repeated in every shard is capped so it never dominates
+MAX_PREAMBLE_CHARS = 2000
+
+
+@dataclass
+class Clause:
+    number: str
+    heading: str
+    text: str
+
+
+@dataclass
+class ContractShard:
+    label: str
+    text: str
+    clauses: List[Clause]
+
+
+def split_clauses(contract_text: str):
+    """Split a contract into its preamble and numbered clauses.
+
+    Returns:
+        (preamble, clauses). Text after the last heading stays with the last clause.
+    """
+    matches = list(CLAUSE_HEADING.finditer(contract_text))
+    if not matches:
+        return contract_text.strip(), []
+
+    preamble = contract_text[:matches[0].start()].strip()
+    clauses = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(contract_text)
+        clauses.append(Clause(
+            number=match.group(1),
+            heading=match.group(2).strip(),
+            text=contract_text[match.start():end].strip(),
+        ))
+    return preamble, clauses
+
+
+def _split_oversized(clause: Clause, max_chars: int) -> List[Clause]:
+    """Cut a single long clause into parts no longer than ``max_chars``."""
+    for separator in ("\n\n", "\n", " "):
+        pieces = clause.text.split(separator)
+        if max(len(p) for p in pieces) <= max_chars:
+            break
+    else:
+        pieces = [clause.text[i:i + max_chars] for i in range(0, len(clause.text), max_chars)]
+        separator = ""
+
+    parts, current = [], ""
+    for piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if len(candidate) > max_chars and current:
+            parts.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+
+    return [
+        Clause(clause.number, f"{clause.heading} (part {i}/{len(parts)})", text)
+        for i, text in enumerate(parts, 1)
+    ]
+
+
+def _label(clauses: List[Clause]) -> str:
+    first, last = clauses[0].number, clauses[-1].number
+    return f"Section {first}" if first == last else f"Sections {first}-{last}"
+
+
+def shard_contract(contract_text: str, max_chars: int) -> List[ContractShard]:
+    """Split a contract into shards of whole clauses.
+
+    Contracts no longer than ``max_chars`` come back as a single shard holding
+    the full text. Contracts without numbered headings are cut at paragraph
+    boundaries instead.
+    """
+    if len(contract_text) <= max_chars:
+        return [ContractShard("Full contract", contract_text, [])]
+
+    preamble, clauses = split_clauses(contract_text)
+    if not clauses:
+        clauses = [Clause("1", "CONTRACT", contract_text.strip())]
+        preamble = ""
+    preamble = preamble[:MAX_PREAMBLE_CHARS]
+    budget = max(max_chars - len(preamble), max_chars // 2)
+
+    pieces: List[Clause] = []
+    for clause in clauses:
+        pieces.extend(_split_oversized(clause, budget) if len(clause.text) > budget else [clause])
+
+    groups: List[List[Clause]] = [[]]
+    size = 0
+    for piece in pieces:
+        if groups[-1] and size + len(piece.text) > budget:
+            groups.append([])
+            size = 0
+        groups[-1].append(piece)
+        size += len(piece.text) + 2
+
+    shards = []
+    for group in groups:
+        body = "\n\n".join(clause.text for clause in group)
+        text = f"{preamble}\n\n[...]\n\n{body}" if preamble else body
+        shards.append(ContractShard(_label(group), text, group))
+    return shards
+
+
+def contract_outline(contract_text: str) -> str:
+    """Preamble plus the list of clause headings, for prompts that cannot take the full text."""
+    preamble, clauses = split_clauses(contract_text)
+    headings = "\n".join(f"{c.number}. {c.heading}" for c in clauses)
+    return f"{preamble[:MAX_PREAMBLE_CHARS]}\n\nClauses:\n{headings}"
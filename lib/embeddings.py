@@ -0,0 +1,102 @@
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Optional
+
+from lib.batch import EMBEDDINGS_ENDPOINT, Batch
+from lib.rate_limit import limited_acreate, limited_create
+from lib.resilience import get_resilience
+from lib.single_flight import get_single_flight, request_key
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+class Embedder:
+    """Thin wrapper around the OpenAI embeddings endpoint.
+
+    Batches are sent as a single request (the API accepts a list of inputs),
+    and an async variant is available for concurrent callers. Requests go
+    through the shared rate limiter (lib.rate_limit) and are retried or
+    hedged by lib.resilience; identical batches in flight at the same time
+    share one request (lib.single_flight).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        base_url: Optional[str] = None,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self._client: Optional["OpenAI"] = None
+        self._async_client: Optional["AsyncOpenAI"] = None
+
+    def __repr__(self) -> str:
+        return f"Embedder(model={self.model})"
+
+    @property
+    def client(self) -> "OpenAI":
+        # The SDK is imported on first use, keeping it out of the importers' startup
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._async_client
+
+    def _request_key(self, payload) -> str:
+        # The sync and async clients share a key, so a thread and a task embedding
+        # the same texts at once send one request
+        return request_key(f"embeddings:{self.base_url}", payload)
+
+    def embed(self, text: str) -> List[float]:
+        """Embed a single text"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one request, preserving input order"""
+        if not texts:
+            return []
+        payload = {"model": self.model, "input": texts, "encoding_format": "float"}
+        response = get_single_flight().do(
+            self._request_key(payload),
+            get_resilience().call,
+            f"embeddings:{self.model}",
+            limited_create,
+            self.client.embeddings,
+            **payload,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    def embed_many_batched(self, texts: List[str], batch: Batch) -> Future:
+        """Queue the texts in an offline ``batch`` instead of sending them.
+
+        Returns:
+            A future resolving to the embeddings, in input order, once ``batch.run()`` has finished
+        """
+        payload = {"model": self.model, "input": texts, "encoding_format": "float"}
+        return batch.add(EMBEDDINGS_ENDPOINT, payload, lambda body: [
+            item["embedding"] for item in sorted(body["data"], key=lambda d: d["index"])])
+
+    async def aembed_many(self, texts: List[str]) -> List[List[float]]:
+        """Async version of embed_many"""
+        if not texts:
+            return []
+        payload = {"model": self.model, "input": texts, "encoding_format": "float"}
+        response = await get_single_flight().ado(
+            self._request_key(payload),
+            get_resilience().acall,
+            f"embeddings:{self.model}",
+            limited_acreate,
+            self.async_client.embeddings,
+            **payload,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
@@ -0,0 +1,426 @@
+"""Staged ingestion pipeline for the RAG knowledge index.
+
+    read files -> parse + chunk (process pool) -> batch embed (asyncio) -> write index
+
+Stages run concurrently and are connected by bounded queues, so a slow stage
+applies backpressure upstream instead of letting memory grow. Each stage
+records how long it was busy, how long it waited for input (starved) and how
+long it waited for room downstream (blocked by backpressure).
+"""
+import asyncio
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lib.batch import Batch
+from lib.embeddings import Embedder
+
+CHUNKS_FILENAME = "chunks.jsonl"
+EMBEDDINGS_FILENAME = "embeddings.npy"
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed"""
+    pass
+
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int, separator: str = "\n") -> List[Dict]:
+    """Split text into overlapping chunks, preferring to break on ``separator``.
+
+    Args:
+        text: Text to split
+        chunk_size: Maximum number of characters per chunk
+        chunk_overlap: Characters shared between consecutive chunks
+        separator: Preferred break point inside a chunk
+
+    Returns:
+        List of chunk dictionaries with id, text, size and character offsets;
+        empty for a blank text (the embeddings API rejects empty input)
+    """
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    if not text:
+        return []
+    if len(text) <= chunk_size:
+        return [{"chunk_id": 0, "text": text, "chunk_size": len(text)}]
+
+    chunks, start, chunk_id = [], 0, 0
+
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if separator in text[start:end]:
+            end = start + text[start:end].rindex(separator) + len(separator)
+
+        if text[start:end].strip():
+            chunks.append({
+                "chunk_id": chunk_id,
+                "text": text[start:end],
+                "chunk_size": end - start,
+                "start_char": start,
+                "end_char": end
+            })
+            chunk_id += 1
+
+        if end == len(text):
+            break
+        # Always move forward, even when the overlap is larger than the chunk
+        start = max(end - chunk_overlap, start + 1)
+
+    return chunks
+
+
+def parse_and_chunk(source: str, raw: bytes, chunk_size: int, chunk_overlap: int) -> List[Dict]:
+    """Decode a document and chunk it. Runs in a worker process."""
+    text = raw.decode("utf-8", errors="replace")
+    chunks = chunk_text(text, chunk_size, chunk_overlap)
+    for chunk in chunks:
+        chunk["source"] = source
+    return chunks
+
+
+@dataclass
+class StageMetrics:
+    """Counters for a single pipeline stage"""
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    items_skipped: int = 0
+    busy_seconds: float = 0.0
+    starved_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Items emitted per second of wall-clock time"""
+        return self.items_out / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "items_skipped": self.items_skipped,
+            "elapsed_s": round(self.elapsed, 3),
+            "busy_s": round(self.busy_seconds, 3),
+            "starved_s": round(self.starved_seconds, 3),
+            "blocked_s": round(self.blocked_seconds, 3),
+            "throughput_per_s": round(self.throughput, 2),
+        }
+
+
+class IngestionPipeline:
+    """Ingest a directory of text files into chunk metadata plus an embedding matrix.
+
+    Args:
+        embedder: Embedder used for the batch-embed stage
+        chunk_size: Maximum characters per chunk
+        chunk_overlap: Characters shared between consecutive chunks
+        batch_size: Chunks per embedding request
+        embed_concurrency: Embedding requests in flight at once
+        parse_workers: Processes used for parsing and chunking
+        queue_size: Capacity of each inter-stage queue
+        batch: Embed through this offline Batch (one job, submitted once all chunks are read)
+            instead of sending requests as chunks arrive
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        chunk_size: int = 2000,
+        chunk_overlap: int = 100,
+        batch_size: int = 64,
+        embed_concurrency: int = 4,
+        parse_workers: Optional[int] = None,
+        queue_size: int = 256,
+        batch: Optional[Batch] = None,
+    ):
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.embed_concurrency = embed_concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch = batch
+        self.metrics: Dict[str, StageMetrics] = {}
+
+    # --- queue helpers -------------------------------------------------
+
+    def _put(self, q: queue.Queue, item, metrics: StageMetrics):
+        start = time.perf_counter()
+        while True:
+            if self._failed.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        metrics.add(blocked_seconds=time.perf_counter() - start)
+
+    def _get(self, q: queue.Queue, metrics: StageMetrics, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        while True:
+            if self._failed.is_set():
+                raise PipelineAborted()
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.perf_counter())
+            try:
+                if wait <= 0:
+                    raise queue.Empty
+                item = q.get(timeout=wait)
+                break
+            except queue.Empty:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    metrics.add(starved_seconds=time.perf_counter() - start)
+                    raise
+        metrics.add(starved_seconds=time.perf_counter() - start)
+        return item
+
+    def _run_stage(self, metrics: StageMetrics, target, *args):
+        metrics.started_at = time.perf_counter()
+        try:
+            target(metrics, *args)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._failed.set()
+        finally:
+            metrics.finished_at = time.perf_counter()
+
+    # --- stages --------------------------------------------------------
+
+    def _read_stage(self, metrics: StageMetrics, paths: List[str], out_q: queue.Queue):
+        for path in paths:
+            start = time.perf_counter()
+            with open(path, "rb") as f:
+                raw = f.read()
+            metrics.add(items_in=1, busy_seconds=time.perf_counter() - start)
+            self._put(out_q, (path, raw), metrics)
+            metrics.add(items_out=1)
+        self._put(out_q, _DONE, metrics)
+
+    def _chunk_stage(self, metrics: StageMetrics, in_q: queue.Queue, out_q: queue.Queue):
+        max_inflight = self.parse_workers * 2
+        pending = deque()
+
+        def emit_oldest():
+            future = pending.popleft()
+            start = time.perf_counter()
+            chunks = future.result()
+            metrics.add(busy_seconds=time.perf_counter() - start)
+            if not chunks:
+                # Empty or whitespace-only document: nothing to embed
+                metrics.add(items_skipped=1)
+            for chunk in chunks:
+                self._put(out_q, chunk, metrics)
+            metrics.add(items_out=len(chunks))
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            while True:
+                item = self._get(in_q, metrics)
+                if item is _DONE:
+                    break
+                path, raw = item
+                metrics.add(items_in=1)
+                pending.append(pool.submit(parse_and_chunk, path, raw, self.chunk_size, self.chunk_overlap))
+                if len(pending) >= max_inflight:
+                    emit_oldest()
+            while pending:
+                emit_oldest()
+        self._put(out_q, _DONE, metrics)
+
+    def _next_batch(self, in_q: queue.Queue, metrics: StageMetrics) -> Optional[List[Dict]]:
+        """Block for the first chunk, then take whatever else arrives shortly after"""
+        if self._input_exhausted:
+            return None
+        first = self._get(in_q, metrics)
+        if first is _DONE:
+            self._input_exhausted = True
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._get(in_q, metrics, timeout=0.05)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self._input_exhausted = True
+                break
+            batch.append(item)
+        metrics.add(items_in=len(batch))
+        return batch
+
+    def _embed_stage(self, metrics: StageMetrics, in_q: queue.Queue, out_q: queue.Queue):
+        self._input_exhausted = False
+        asyncio.run(self._embed_loop(metrics, in_q, out_q))
+        self._put(out_q, _DONE, metrics)
+
+    async def _embed_loop(self, metrics: StageMetrics, in_q: queue.Queue, out_q: queue.Queue):
+        loop = asyncio.get_running_loop()
+        if self.batch is not None:
+            await self._embed_offline(loop, metrics, in_q, out_q)
+            return
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        tasks = set()
+
+        async def embed_batch(batch: List[Dict]):
+            try:
+                start = time.perf_counter()
+                vectors = await self.embedder.aembed_many([chunk["text"] for chunk in batch])
+                metrics.add(busy_seconds=time.perf_counter() - start)
+                await loop.run_in_executor(None, self._put, out_q, (batch, vectors), metrics)
+                metrics.add(items_out=len(batch))
+            finally:
+                semaphore.release()
+
+        def reap_finished():
+            for task in [t for t in tasks if t.done()]:
+                tasks.discard(task)
+                if not task.cancelled() and task.exception():
+                    raise task.exception()
+
+        try:
+            while True:
+                await semaphore.acquire()
+                reap_finished()
+                batch = await loop.run_in_executor(None, self._next_batch, in_q, metrics)
+                if batch is None:
+                    semaphore.release()
+                    break
+                tasks.add(asyncio.create_task(embed_batch(batch)))
+            if tasks:
+                await asyncio.wait(tasks)
+            reap_finished()
+        except BaseException:
+            # Unblock the helper threads still waiting on the queues
+            self._failed.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _embed_offline(self, loop, metrics: StageMetrics, in_q: queue.Queue, out_q: queue.Queue):
+        """Queue every batch of chunks in self.batch, run the job, then pass the results on in order"""
+        queued = []
+        while True:
+            batch = await loop.run_in_executor(None, self._next_batch, in_q, metrics)
+            if batch is None:
+                break
+            queued.append((batch, self.embedder.embed_many_batched([chunk["text"] for chunk in batch], self.batch)))
+        start = time.perf_counter()
+        await loop.run_in_executor(None, self.batch.run)
+        metrics.add(busy_seconds=time.perf_counter() - start)
+        for batch, future in queued:
+            await loop.run_in_executor(None, self._put, out_q, (batch, future.result()), metrics)
+            metrics.add(items_out=len(batch))
+
+    def _write_stage(self, metrics: StageMetrics, in_q: queue.Queue, output_dir: str):
+        vectors: List[List[float]] = []
+        with open(os.path.join(output_dir, CHUNKS_FILENAME), "w", encoding="utf-8") as f:
+            while True:
+                item = self._get(in_q, metrics)
+                if item is _DONE:
+                    break
+                batch, batch_vectors = item
+                start = time.perf_counter()
+                for chunk in batch:
+                    f.write(json.dumps(chunk) + "\n")
+                vectors.extend(batch_vectors)
+                metrics.add(items_in=len(batch), items_out=len(batch),
+                            busy_seconds=time.perf_counter() - start)
+        start = time.perf_counter()
+        np.save(os.path.join(output_dir, EMBEDDINGS_FILENAME), np.array(vectors, dtype=np.float32))
+        metrics.add(busy_seconds=time.perf_counter() - start)
+
+    # --- entry point ---------------------------------------------------
+
+    def run(self, input_dir: str, output_dir: str, pattern: str = ".txt") -> Dict[str, StageMetrics]:
+        """Ingest every file under ``input_dir`` ending with ``pattern``.
+
+        Writes ``chunks.jsonl`` and ``embeddings.npy`` (same row order) to ``output_dir``.
+
+        Returns:
+            Metrics for each stage, keyed by stage name
+
+        Raises:
+            The first exception raised by any stage
+        """
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(input_dir)
+            for name in names if name.endswith(pattern)
+        )
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._failed = threading.Event()
+        self._errors: List[BaseException] = []
+        read_q, chunk_q, write_q = (queue.Queue(maxsize=self.queue_size) for _ in range(3))
+        self.metrics = {name: StageMetrics(name) for name in ("read", "chunk", "embed", "write")}
+
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self.metrics["read"], self._read_stage, paths, read_q)),
+            threading.Thread(target=self._run_stage, args=(self.metrics["chunk"], self._chunk_stage, read_q, chunk_q)),
+            threading.Thread(target=self._run_stage, args=(self.metrics["embed"], self._embed_stage, chunk_q, write_q)),
+            threading.Thread(target=self._run_stage, args=(self.metrics["write"], self._write_stage, write_q, output_dir)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.metrics
+
+    def report(self) -> str:
+        """Format stage metrics as a table"""
+        header = f"{'stage':<8}{'in':>8}{'out':>8}{'skipped':>9}{'elapsed s':>11}{'busy s':>9}{'starved s':>11}{'blocked s':>11}{'items/s':>10}"
+        rows = [header]
+        for m in self.metrics.values():
+            rows.append(
+                f"{m.name:<8}{m.items_in:>8}{m.items_out:>8}{m.items_skipped:>9}{m.elapsed:>11.2f}{m.busy_seconds:>9.2f}"
+                f"{m.starved_seconds:>11.2f}{m.blocked_seconds:>11.2f}{m.throughput:>10.1f}"
+            )
+        return "\n".join(rows)
+
+
+def load_ingested(output_dir: str, mmap: bool = False):
+    """Load the chunk metadata and embedding matrix written by IngestionPipeline.run
+
+    Args:
+        mmap: Memory-map the embeddings read-only instead of reading them into RAM
+
+    Returns:
+        (chunks, embeddings) with one embedding row per chunk
+    """
+    with open(os.path.join(output_dir, CHUNKS_FILENAME), encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
+    embeddings = np.load(os.path.join(output_dir, EMBEDDINGS_FILENAME), mmap_mode="r" if mmap else None)
+    return chunks, embeddings
@@ -0,0 +1,188 @@
+"""Structured LLM-as-judge verdicts.
+
+One call returns whether a response meets the criteria, why, and how to fix it,
+using the ``response_format`` support in ``LLM.invoke``. This replaces asking
+for a free-text "Yes/No" verdict and then making a second call to turn the
+reasons into correction instructions.
+
+``judge_batch`` packs several (response, criteria) items into one call that
+returns a verdict per item, so a dataset pays the system prompt and
+instructions once per batch instead of once per response. Batches are split
+to stay within a token budget, and a batch whose answer is cut off or
+malformed is split in half and retried.
+
+``judge_batched`` queues a single judge call in an offline ``lib.batch.Batch``
+for datasets that can wait for the provider's batch endpoint.
+"""
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+from lib.rate_limit import CHARS_PER_TOKEN
+
+# The messages (and through them the openai SDK) are imported by the judge calls,
+# so Verdict and plan_batches stay cheap to import for the pre-checks and caches
+if TYPE_CHECKING:
+    from lib.batch import Batch
+    from lib.llm import LLM
+
+
+class Verdict(BaseModel):
+    passed: bool = Field(description="True only if the answer fully meets the criteria")
+    reasons: str = Field(description="Why the answer does or does not meet the criteria")
+    instructions: str = Field(
+        default="",
+        description="Concrete instructions to fix the answer so it meets the criteria; empty if it passed",
+    )
+
+    def correction_instructions(self) -> str:
+        """Instructions to send back to the worker (the reasons, if the judge gave none)"""
+        return self.instructions.strip() or self.reasons
+
+
+def judge_system_prompt(persona: str) -> str:
+    return (f"You are an evaluation agent. You are {persona}. You are evaluating a response to a prompt. "
+            f"You are explicitly forgetting previous context.")
+
+
+def judge_prompt(response: str, criteria: str) -> str:
+    return (
+        f"Does the following answer: {response}\n"
+        f"Meet this criteria: {criteria}\n"
+        f"Decide whether it passes, give the reasons, and if it fails give instructions to fix it."
+    )
+
+
+def _judge_messages(persona: str, response: str, criteria: str) -> list:
+    from lib.messages import SystemMessage, UserMessage
+
+    return [SystemMessage(content=judge_system_prompt(persona)), UserMessage(content=judge_prompt(response, criteria))]
+
+
+def judge(llm: "LLM", persona: str, response: str, criteria: str) -> Verdict:
+    """Judge one response against ``criteria`` in a single structured call"""
+    from lib.parsers import PydanticOutputParser
+
+    message = llm.invoke(_judge_messages(persona, response, criteria), response_format=Verdict)
+    return PydanticOutputParser(model_class=Verdict).parse(message)
+
+
+def judge_batched(llm: "LLM", persona: str, response: str, criteria: str, batch: "Batch") -> Future:
+    """Queue the judge call of ``judge`` in an offline ``batch`` instead of sending it.
+
+    Returns:
+        A future resolving to the Verdict once ``batch.run()`` has finished
+    """
+    verdict = Future()
+
+    def parse(message):
+        try:
+            verdict.set_result(Verdict.model_validate_json(message.result().content))
+        except Exception as e:
+            verdict.set_exception(e)
+
+    llm.invoke_batched(_judge_messages(persona, response, criteria), batch, response_format=Verdict) \
+        .add_done_callback(parse)
+    return verdict
+
+
+# Expected completion tokens of one verdict in a batch answer
+VERDICT_TOKENS = 120
+
+
+class ItemVerdict(Verdict):
+    item: int = Field(description="Number of the item this verdict is for")
+
+
+class BatchVerdicts(BaseModel):
+    verdicts: List[ItemVerdict] = Field(description="One verdict per item, in item order")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def batch_judge_prompt(items: Sequence[Tuple[str, str]]) -> str:
+    """Numbered items, each listing its response and the criteria it is judged against.
+
+    Criteria shared by several items are written once and referred to by id.
+    """
+    criteria_ids = {}
+    for _, criteria in items:
+        criteria_ids.setdefault(criteria, f"C{len(criteria_ids) + 1}")
+    lines = ["Criteria:"]
+    lines += [f"[{cid}] {criteria}" for criteria, cid in criteria_ids.items()]
+    lines.append("")
+    for number, (response, criteria) in enumerate(items, start=1):
+        lines.append(f"Item {number} (criteria [{criteria_ids[criteria]}]):\n{response}\n")
+    lines.append(
+        f"Judge each of the {len(items)} items independently against its criteria. Return exactly one verdict "
+        f"per item with its item number: whether it passes, the reasons, and if it fails instructions to fix it."
+    )
+    return "\n".join(lines)
+
+
+def plan_batches(items: Sequence[Tuple[str, str]], max_items: int, max_tokens: int) -> List[List[int]]:
+    """Group item indices into batches of at most ``max_items`` within ``max_tokens``.
+
+    The budget covers the items' prompt text plus VERDICT_TOKENS of answer per
+    item. An item over the budget on its own gets a batch to itself.
+    """
+    batches, current, used = [], [], 0
+    for index, (response, criteria) in enumerate(items):
+        cost = estimate_tokens(response) + estimate_tokens(criteria) + VERDICT_TOKENS
+        if current and (len(current) >= max_items or used + cost > max_tokens):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _judge_one_batch(llm: "LLM", persona: str, items: Sequence[Tuple[str, str]]) -> List[Verdict]:
+    import openai
+    from lib.messages import SystemMessage, UserMessage
+    from lib.parsers import PydanticOutputParser
+
+    if len(items) == 1:
+        return [judge(llm, persona, *items[0])]
+    try:
+        message = llm.invoke(
+            [SystemMessage(content=judge_system_prompt(persona)), UserMessage(content=batch_judge_prompt(items))],
+            response_format=BatchVerdicts,
+        )
+        answer = PydanticOutputParser(model_class=BatchVerdicts).parse(message)
+    except (openai.LengthFinishReasonError, openai.BadRequestError, ValidationError) as e:
+        # Answer cut off, prompt too long for the model, or malformed: retry as two smaller batches
+        print(f"[judge_batch] Splitting batch of {len(items)} items: {type(e).__name__}")
+        half = len(items) // 2
+        return _judge_one_batch(llm, persona, items[:half]) + _judge_one_batch(llm, persona, items[half:])
+
+    by_item = {v.item: Verdict(passed=v.passed, reasons=v.reasons, instructions=v.instructions)
+               for v in answer.verdicts}
+    # Items the model skipped are judged on their own
+    return [by_item.get(number) or judge(llm, persona, *item) for number, item in enumerate(items, start=1)]
+
+
+def judge_batch(llm: "LLM", persona: str, items: Sequence[Tuple[str, str]],
+                max_items: int = 8, max_tokens: int = 6000) -> List[Verdict]:
+    """Judge many (response, criteria) items with as few calls as the budget allows.
+
+    Args:
+        llm: Model used for judging
+        persona: Persona of the evaluator
+        items: (response, criteria) pairs
+        max_items: Maximum number of items per call
+        max_tokens: Estimated token budget per call for the items and their verdicts
+
+    Returns:
+        One Verdict per item, in the order of ``items``
+    """
+    verdicts: List[Verdict] = [None] * len(items)
+    for batch in plan_batches(items, max_items, max_tokens):
+        for index, verdict in zip(batch, _judge_one_batch(llm, persona, [items[i] for i in batch])):
+            verdicts[index] = verdict
+    return verdicts
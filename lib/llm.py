@@ -1,13 +1,80 @@
-from typing import List, Optional, Dict, Any
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Type
 from pydantic import BaseModel
-from openai import OpenAI
 from lib.messages import (
     AnyMessage,
     AIMessage,
     BaseMessage,
     UserMessage,
 )
+from lib.batch import CHAT_ENDPOINT, Batch
+from lib.rate_limit import limited_create
+from lib.resilience import get_resilience
+from lib.single_flight import get_single_flight, request_key
 from lib.tooling import Tool
+from lib.usage import UsageTracker
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def strict_json_schema(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Make a pydantic JSON schema valid for ``strict`` structured outputs (in place).
+
+    Strict mode needs every object closed (``additionalProperties: false``) with
+    all its properties required, no ``None`` defaults, and no ``$ref`` with
+    sibling keys (those refs are inlined).
+    """
+    root = schema if root is None else root
+    for definition in schema.get("$defs", {}).values():
+        strict_json_schema(definition, root)
+    if schema.get("type") == "object":
+        schema.setdefault("additionalProperties", False)
+    if isinstance(schema.get("properties"), dict):
+        schema["required"] = list(schema["properties"])
+        for value in schema["properties"].values():
+            strict_json_schema(value, root)
+    if isinstance(schema.get("items"), dict):
+        strict_json_schema(schema["items"], root)
+    for variant in schema.get("anyOf", []):
+        strict_json_schema(variant, root)
+    if len(schema.get("allOf", [])) == 1:
+        schema.update(strict_json_schema(schema.pop("allOf")[0], root))
+    else:
+        for entry in schema.get("allOf", []):
+            strict_json_schema(entry, root)
+    if "default" in schema and schema["default"] is None:
+        del schema["default"]
+    if "$ref" in schema and len(schema) > 1:
+        resolved = root
+        for key in schema.pop("$ref")[2:].split("/"):
+            resolved = resolved[key]
+        # Keys next to the $ref take priority over the referenced schema's
+        for key, value in resolved.items():
+            schema.setdefault(key, value)
+        return strict_json_schema(schema, root)
+    return schema
+
+
+def response_format_param(model: Type[BaseModel]) -> Dict[str, Any]:
+    """The chat completions ``response_format`` for answers parsed into ``model``"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": strict_json_schema(model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+def new_client(api_key: Optional[str] = None) -> "OpenAI":
+    """An OpenAI client, importing the SDK on first use rather than at import"""
+    from openai import OpenAI
+
+    # Retries are handled by lib.resilience (with backoff and hedging), not by the SDK
+    return OpenAI(api_key=api_key, max_retries=0) if api_key else OpenAI(max_retries=0)
 
 
 class LLM:
@@ -16,14 +83,22 @@ class LLM:
         model: str = "gpt-4o-mini",
         temperature: float = 0.0,
         tools: Optional[List[Tool]] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        usage: Optional[UsageTracker] = None,
+        usage_label: str = "llm",
     ):
         self.model = model
         self.temperature = temperature
-        self.client = OpenAI(api_key=api_key) if api_key else OpenAI()
+        self.client = new_client(api_key)
         self.tools: Dict[str, Tool] = {
             tool.name: tool for tool in (tools or [])
         }
+        # Token usage of every request is recorded here, if given
+        self.usage = usage
+        self.usage_label = usage_label
+        # Number of completed invoke() requests
+        self.calls = 0
+        self._calls_lock = threading.Lock()
 
     def register_tool(self, tool: Tool):
         self.tools[tool.name] = tool
@@ -51,6 +126,45 @@ class LLM:
         else:
             raise ValueError(f"Invalid input type {type(input)}.")
 
+    def _send(self, payload: Dict[str, Any]):
+        """One upstream request; calls and usage count requests actually sent"""
+        if "response_format" in payload:
+            response = get_resilience().call(f"llm:{self.model}", limited_create,
+                                             self.client.beta.chat.completions, "parse", **payload)
+        else:
+            response = get_resilience().call(f"llm:{self.model}", limited_create,
+                                             self.client.chat.completions, **payload)
+        with self._calls_lock:
+            self.calls += 1
+        if self.usage is not None:
+            self.usage.record(self.usage_label, getattr(response, "usage", None))
+        return response
+
+    def invoke_batched(self,
+                       input: str | BaseMessage | List[BaseMessage],
+                       batch: Batch,
+                       response_format: BaseModel = None) -> Future:
+        """Queue the request in an offline ``batch`` instead of sending it.
+
+        Returns:
+            A future resolving to the AIMessage once ``batch.run()`` has finished
+        """
+        payload = self._build_payload(self._convert_input(input))
+        if response_format:
+            payload["response_format"] = response_format_param(response_format)
+        return batch.add(CHAT_ENDPOINT, payload, self._from_batch_body)
+
+    def _from_batch_body(self, body: Dict[str, Any]) -> AIMessage:
+        from openai.types import CompletionUsage
+
+        with self._calls_lock:
+            self.calls += 1
+        if self.usage is not None:
+            self.usage.record(self.usage_label, CompletionUsage.model_validate(body["usage"])
+                              if body.get("usage") else None)
+        message = body["choices"][0]["message"]
+        return AIMessage(content=message.get("content"), tool_calls=message.get("tool_calls"))
+
     def invoke(self, 
                input: str | BaseMessage | List[BaseMessage],
                response_format: BaseModel = None,) -> AIMessage:
@@ -58,9 +172,12 @@ class LLM:
         payload = self._build_payload(messages)
         if response_format:
             payload.update({"response_format": response_format})
-            response = self.client.beta.chat.completions.parse(**payload)
+        if self.temperature == 0:
+            # Deterministic requests: concurrent identical payloads share one upstream call
+            key = request_key(f"chat:{self.client.base_url}", payload)
+            response = get_single_flight().do(key, self._send, payload)
         else:
-            response = self.client.chat.completions.create(**payload)
+            response = self._send(payload)
         choice = response.choices[0]
         message = choice.message
 
@@ -0,0 +1,103 @@
+"""Cache of orchestrator plans keyed by the structure of the input.
+
+Lab reports of the same kind differ only in their values, and the plan (which
+panels to interpret, by which worker) depends only on the structure. The
+fingerprint therefore masks every number, so "WBC: 11.5 x10^9/L" and
+"WBC: 7.2 x10^9/L" map to the same plan while a report with an extra panel or
+analyte does not. Anything else that changes, such as a patient name, simply
+causes a miss.
+"""
+import copy
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def structure_fingerprint(text: str, *extra: str) -> str:
+    """Hash of ``text`` with numbers masked and whitespace/case normalized.
+
+    ``extra`` parts (e.g. the planning prompt template) are hashed verbatim.
+    """
+    digest = hashlib.sha256()
+    for line in text.lower().splitlines():
+        line = " ".join(_NUMBER.sub("#", line).split())
+        if line:
+            digest.update(line.encode("utf-8"))
+            digest.update(b"\n")
+    for part in extra:
+        digest.update(b"\0")
+        digest.update(str(part).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class PlanEntry:
+    plan: Any
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class PlanCacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    forced: int = 0
+
+
+class PlanCache:
+    """Fingerprint -> plan store with a TTL.
+
+    Args:
+        ttl_seconds: Age after which a plan is planned again (None = never expires)
+        max_entries: Maximum number of plans kept; the oldest are evicted first
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = 24 * 3600, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = PlanCacheStats()
+        self._entries: Dict[str, PlanEntry] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"PlanCache(entries={len(self._entries)}, ttl={self.ttl_seconds})"
+
+    def get(self, key: str) -> Optional[Any]:
+        """A copy of the cached plan for ``key``, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.time() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats.expired += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return copy.deepcopy(entry.plan)
+
+    def put(self, key: str, plan: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = PlanEntry(copy.deepcopy(plan))
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def record_forced(self):
+        """Count a lookup skipped because re-planning was forced"""
+        with self._lock:
+            self.stats.forced += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"[PlanCache] hits={s.hits} misses={s.misses} expired={s.expired} "
+                f"forced_replans={s.forced} entries={len(self._entries)}")
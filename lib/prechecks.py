@@ -0,0 +1,346 @@
+"""Deterministic checks that run before the LLM judge.
+
+Many criteria can be decided without a model call: "solely the name of a city"
+is a word count and a pattern, "under 500 calories" is a number in the response.
+A ``PreChecks`` suite runs its checks in order and
+
+* rejects the response as soon as one check fails (no judge call; the verdict
+  carries the failed checks' correction instructions),
+* accepts it if every check passes and ``accept_on_pass`` is set, because the
+  checks cover the whole criteria,
+* otherwise returns None and the LLM judge decides.
+
+A check that cannot apply to a response (e.g. no calorie figure found) is
+undecided rather than failed, so it defers to the judge.
+"""
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lib.judge import Verdict
+
+PASS = "pass"
+FAIL = "fail"
+UNDECIDED = "undecided"
+
+
+@dataclass
+class CheckResult:
+    name: str
+    status: str
+    reason: str = ""
+    instructions: str = ""
+
+
+class Check:
+    """Base class: ``run(response)`` returns a CheckResult with PASS, FAIL or UNDECIDED"""
+
+    name = "check"
+
+    def run(self, response: str) -> CheckResult:
+        raise NotImplementedError
+
+    def _result(self, status: str, reason: str = "", instructions: str = "") -> CheckResult:
+        return CheckResult(self.name, status, reason, instructions)
+
+
+class RegexCheck(Check):
+    """Response must (or, with ``must_match=False``, must not) match ``pattern``.
+
+    Args:
+        pattern: Regular expression, searched anywhere unless ``full=True``
+        must_match: Whether a match passes (True) or fails (False)
+        full: Match the whole stripped response instead of searching in it
+        instructions: Correction instructions used when the check fails
+    """
+
+    def __init__(self, pattern: str, must_match: bool = True, full: bool = False, flags: int = 0,
+                 instructions: str = "", name: str = "regex"):
+        self.pattern = re.compile(pattern, flags)
+        self.must_match = must_match
+        self.full = full
+        self.instructions = instructions
+        self.name = name
+
+    def run(self, response: str) -> CheckResult:
+        text = response.strip()
+        matched = (self.pattern.fullmatch(text) if self.full else self.pattern.search(text)) is not None
+        if matched == self.must_match:
+            return self._result(PASS)
+        expectation = "does not match" if self.must_match else "must not match"
+        return self._result(FAIL, f"Response {expectation} /{self.pattern.pattern}/", self.instructions)
+
+
+class LengthCheck(Check):
+    """Number of characters of the stripped response within [min_chars, max_chars]"""
+
+    def __init__(self, min_chars: Optional[int] = None, max_chars: Optional[int] = None,
+                 instructions: str = "", name: str = "length"):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.instructions = instructions
+        self.name = name
+
+    def run(self, response: str) -> CheckResult:
+        return _check_range(self, len(response.strip()), self.min_chars, self.max_chars, "characters")
+
+
+class WordCountCheck(Check):
+    """Number of words of the response within [min_words, max_words]"""
+
+    def __init__(self, min_words: Optional[int] = None, max_words: Optional[int] = None,
+                 instructions: str = "", name: str = "word_count"):
+        self.min_words = min_words
+        self.max_words = max_words
+        self.instructions = instructions
+        self.name = name
+
+    def run(self, response: str) -> CheckResult:
+        return _check_range(self, len(response.split()), self.min_words, self.max_words, "words")
+
+
+class NumericThresholdCheck(Check):
+    """A labelled number in the response within [minimum, maximum].
+
+    Each mention of ``label`` is read with the number directly before it
+    ("38g protein") or after it ("Calories: about 450 kcal"). A number followed
+    by a non-nutrition unit ("Protein: 1 lb chicken") is not read, and the gap
+    after the label may not cross a word like "serves" or a unit. "1,200" is
+    read as 1200. If a line gives values per serving (a nutrition line), only
+    such lines are read.
+
+    The check fails a response on its own, so whenever the reading is in doubt
+    it is undecided and the judge decides: no value, mentions that disagree, a
+    mention with a number on both sides ("25g of protein and 430 calories"), or
+    a value given for the whole dish ("1800 in total, 450 per serving").
+
+    Args:
+        label: Regular expression for the quantity's name, e.g. r"calories?"
+        minimum: Smallest passing value
+        maximum: Largest passing value
+        exclusive: Whether the bounds themselves fail ("under 500"), rather than pass ("at most 500")
+        max_gap: Characters allowed between the label and a following number
+    """
+
+    # "1,200" is a thousands separator; a comma in any other number ("4,5") makes it unreadable
+    _number = r"(?<![\d.,])(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)(?!,?\d)"
+    # Units that measure ingredients or time rather than a nutrition value
+    _other_units = (r"lbs?|pounds?|oz|ounces?|cups?|tbsp|tsp|tablespoons?|teaspoons?|ml|l|liters?|litres?|kg|"
+                    r"cans?|cloves?|slices?|pieces?|minutes?|mins?|hours?|hrs?|inch(?:es)?")
+    _per_serving = re.compile(r"per serving|per portion|each serving|nutrition", re.IGNORECASE)
+    _total = re.compile(r"\b(?:total(?!\s+(?:fat|carb))|whole|entire|altogether|in all|"
+                        r"per (?:recipe|batch|dish|pan|tray))\b", re.IGNORECASE)
+
+    def __init__(self, label: str, minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 exclusive: bool = False, max_gap: int = 40, instructions: str = "", name: str = ""):
+        self.label = re.compile(rf"\b(?:{label})", re.IGNORECASE)
+        self.after = re.compile(rf"([^\d\n]{{0,{max_gap}}}?){self._number}\s*([a-z]*)", re.IGNORECASE)
+        self.before = re.compile(rf"{self._number}\s*([a-z]{{0,5}})\s*(?:of\s+)?$", re.IGNORECASE)
+        self.other_unit = re.compile(rf"(?:{self._other_units}|servings?|people|persons?)", re.IGNORECASE)
+        self.gap_stop = re.compile(rf"\b(?:serves|servings|makes|yields?|{self._other_units})\b", re.IGNORECASE)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.exclusive = exclusive
+        self.instructions = instructions
+        self.name = name or re.sub(r"[^a-z ]", "", label.lower()).strip() or "value"
+
+    def _line_values(self, line: str) -> Optional[List[float]]:
+        """The number read for each mention of the label in ``line``, or None if a mention has two"""
+        values = []
+        for mention in self.label.finditer(line):
+            candidates = []
+            before = self.before.search(line[:mention.start()])
+            if before and not self.other_unit.fullmatch(before.group(2)):
+                candidates.append(before.group(1))
+            after = self.after.match(line, mention.end())
+            if after and not self.gap_stop.search(after.group(1)) and not self.other_unit.fullmatch(after.group(3)):
+                candidates.append(after.group(2))
+            if len(candidates) > 1:
+                return None
+            values.extend(float(c.replace(",", "")) for c in candidates)
+        return values
+
+    def read(self, response: str) -> Tuple[List[float], str]:
+        """The values read for the label, and why they cannot decide the check (empty if they can)"""
+        found = []
+        for line in response.splitlines():
+            values = self._line_values(line)
+            if values is None:
+                return [], f"More than one number could be the {self.name}: {line.strip()}"
+            if values:
+                found.append((line, values))
+        if any(self._total.search(line) for line, _ in found):
+            return [], f"A {self.name} value for the whole dish is given: " + next(
+                line.strip() for line, _ in found if self._total.search(line))
+        per_serving = [v for line, values in found if self._per_serving.search(line) for v in values]
+        values = per_serving or [v for _, values in found for v in values]
+        if not values:
+            return [], "No value found"
+        if len(set(values)) > 1:
+            return [], f"Conflicting values: {', '.join(f'{v:g}' for v in sorted(set(values)))}"
+        return values, ""
+
+    def values(self, response: str) -> List[float]:
+        """Every value read for the label, empty when the reading is in doubt"""
+        return self.read(response)[0]
+
+    def value(self, response: str) -> Optional[float]:
+        """The labelled value, or None if there is none or the reading is in doubt"""
+        values = self.values(response)
+        return values[0] if values else None
+
+    def run(self, response: str) -> CheckResult:
+        values, doubt = self.read(response)
+        if doubt:
+            return self._result(UNDECIDED, doubt)
+        return _check_range(self, values[0], self.minimum, self.maximum, "", self.exclusive)
+
+
+class JsonSchemaCheck(Check):
+    """Response must be JSON valid against ``schema``.
+
+    Supports the commonly used subset of JSON Schema: type, properties,
+    required, additionalProperties (boolean), items, enum, minimum, maximum,
+    minLength, maxLength, minItems and maxItems. A ```json fenced block is
+    accepted.
+    """
+
+    def __init__(self, schema: Dict[str, Any], instructions: str = "", name: str = "json_schema"):
+        self.schema = schema
+        self.instructions = instructions
+        self.name = name
+
+    def run(self, response: str) -> CheckResult:
+        text = response.strip()
+        fenced = re.fullmatch(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL)
+        if fenced:
+            text = fenced.group(1)
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            return self._result(FAIL, f"Response is not valid JSON: {e}",
+                                self.instructions or "Answer with valid JSON only.")
+        errors = schema_errors(data, self.schema)
+        if errors:
+            return self._result(FAIL, "; ".join(errors),
+                                self.instructions or f"Fix the JSON so that: {'; '.join(errors)}")
+        return self._result(PASS)
+
+
+def _check_range(check: Check, value: float, low: Optional[float], high: Optional[float], unit: str,
+                 exclusive: bool = False) -> CheckResult:
+    shown = f"{value:g} {unit}".strip()
+    if low is not None and (value <= low if exclusive else value < low):
+        bound = "more than" if exclusive else "at least"
+        return check._result(FAIL, f"{check.name} is {shown}, not {bound} {low:g}",
+                             check.instructions or f"Increase {check.name} to {bound} {low:g} {unit}".strip() + ".")
+    if high is not None and (value >= high if exclusive else value > high):
+        bound = "under" if exclusive else "at most"
+        return check._result(FAIL, f"{check.name} is {shown}, not {bound} {high:g}",
+                             check.instructions or f"Reduce {check.name} to {bound} {high:g} {unit}".strip() + ".")
+    return check._result(PASS)
+
+
+_JSON_TYPES = {
+    "object": dict, "array": list, "string": str, "boolean": bool,
+    "integer": int, "number": (int, float), "null": type(None),
+}
+
+
+def schema_errors(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Violations of ``schema`` by ``data`` (empty if valid)"""
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        # bool is an int subclass, but not a JSON number
+        if not any(isinstance(data, _JSON_TYPES[t]) and not (isinstance(data, bool) and t in ("integer", "number"))
+                   for t in types):
+            return [f"{path} should be {' or '.join(types)}"]
+
+    errors = []
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path} should be one of {schema['enum']}")
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path} should be >= {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path} should be <= {schema['maximum']}")
+    if isinstance(data, str):
+        if "minLength" in schema and len(data) < schema["minLength"]:
+            errors.append(f"{path} should have at least {schema['minLength']} characters")
+        if "maxLength" in schema and len(data) > schema["maxLength"]:
+            errors.append(f"{path} should have at most {schema['maxLength']} characters")
+    if isinstance(data, list):
+        if "minItems" in schema and len(data) < schema["minItems"]:
+            errors.append(f"{path} should have at least {schema['minItems']} items")
+        if "maxItems" in schema and len(data) > schema["maxItems"]:
+            errors.append(f"{path} should have at most {schema['maxItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(data):
+                errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    if isinstance(data, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key} is required")
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(schema_errors(value, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{key} is not allowed")
+    return errors
+
+
+@dataclass
+class PreCheckStats:
+    accepted: int = 0
+    rejected: int = 0
+    deferred: int = 0
+
+
+class PreChecks:
+    """Ordered suite of checks deciding a response locally where it can.
+
+    Args:
+        checks: Checks to run, cheapest first
+        accept_on_pass: Accept without the judge when every check passes; only
+            set this when the checks cover the whole evaluation criteria
+    """
+
+    def __init__(self, checks: Sequence[Check], accept_on_pass: bool = False):
+        self.checks = list(checks)
+        self.accept_on_pass = accept_on_pass
+        self.stats = PreCheckStats()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"PreChecks(checks={[c.name for c in self.checks]}, accept_on_pass={self.accept_on_pass})"
+
+    def run(self, response: str) -> List[CheckResult]:
+        return [check.run(response) for check in self.checks]
+
+    def verdict(self, response: str) -> Optional[Verdict]:
+        """Local verdict on ``response``, or None if the LLM judge has to decide"""
+        results = self.run(response)
+        failed = [r for r in results if r.status == FAIL]
+        if failed:
+            verdict = Verdict(
+                passed=False,
+                reasons="Failed local checks: " + "; ".join(r.reason for r in failed),
+                instructions=" ".join(dict.fromkeys(r.instructions for r in failed if r.instructions)),
+            )
+            outcome = "rejected"
+        elif self.accept_on_pass and all(r.status == PASS for r in results):
+            verdict = Verdict(passed=True, reasons="Passed local checks: " + ", ".join(r.name for r in results))
+            outcome = "accepted"
+        else:
+            verdict, outcome = None, "deferred"
+        with self._lock:
+            setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+        return verdict
+
+    def report(self) -> str:
+        s = self.stats
+        return f"[PreChecks] accepted={s.accepted} rejected={s.rejected} deferred_to_judge={s.deferred}"
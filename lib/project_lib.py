@@ -212,6 +212,9 @@ def do_chat_completion(messages: list[dict[str, str]], model=None, client=None,
         >>> response
         "I'm good, thanks!"
     """
+    # Imported here so the module's other helpers stay importable as a top-level "project_lib"
+    from lib.rate_limit import limited_create
+
     if client is None:
         raise ValueError("A valid OpenAI client must be provided.")
     
@@ -219,13 +222,16 @@ def do_chat_completion(messages: list[dict[str, str]], model=None, client=None,
         raise ValueError("A valid model must be provided.")
 
     if "response_format" not in kwargs:
-        response = client.chat.completions.create(  # type: ignore
+        response = limited_create(
+            client.chat.completions,
             model=model,
             messages=messages,  # type: ignore
             **kwargs,  # type: ignore
         )
     else:
-        response = client.beta.chat.completions.parse(  # type: ignore
+        response = limited_create(
+            client.beta.chat.completions,
+            "parse",
             model=model,
             messages=messages,  # type: ignore
             **kwargs,  # type: ignore
@@ -0,0 +1,213 @@
+"""Compact in-memory storage for embedding vectors.
+
+A 1536-dim float32 embedding costs 6 KB. Two quantized layouts are offered:
+
+- ``int8``: symmetric scalar quantization with one float scale per vector
+  (1536 + 4 bytes, ~4x smaller).
+- ``binary``: one sign bit per dimension packed into bytes (192 bytes,
+  32x smaller), searched with XOR + popcount (Hamming distance).
+
+Quantized search returns a shortlist that is re-ranked with the float query.
+If the original float vectors are kept on disk, re-ranking is exact; otherwise
+the float query is scored against the quantized codes. The floats are either
+appended to a file owned by the index (``float_store``) or memory-mapped from a
+.npy the vectors already live in (``map_float_file``, e.g. an ingestion run's
+embeddings.npy). Either way they cost disk rather than RAM.
+
+Binary codes keep too little to order near neighbours: without float
+vectors on disk, recall@10 stays around 0.3 however long the shortlist
+(int8: ~0.98). With one, the default shortlist of 40 x k brings binary to
+~0.99, at 5k and 50k vectors (benchmarks/quantization_benchmark.py).
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ("float", "int8", "binary")
+BLOCK_ROWS = 4096
+# Sign bits discard more information than int8, so binary needs a much longer shortlist
+# (10 x k only reached recall@10 ~0.7 with float re-ranking)
+DEFAULT_OVERSAMPLE = {"float": 1, "int8": 4, "binary": 40}
+
+# Popcount lookup for numpy versions without np.bitwise_count (< 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so that dot products are cosine similarities."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize rows to int8 with a per-row symmetric scale.
+
+    Returns:
+        (codes, scales) where ``vectors ~= codes * scales[:, None]``
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    max_abs = np.abs(vectors).max(axis=1)
+    max_abs[max_abs == 0] = 1.0
+    scales = (max_abs / 127.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Keep the sign of each dimension, packed 8 dimensions per byte."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return np.packbits(vectors > 0, axis=1)
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a packed uint8 matrix."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(packed).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT_TABLE[packed].sum(axis=1, dtype=np.int32)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance between each packed row in ``codes`` and ``query_code``."""
+    return popcount(np.bitwise_xor(codes, query_code))
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class QuantizedIndex:
+    """Cosine-similarity index over embeddings stored as float, int8 or binary.
+
+    Args:
+        mode: One of "float", "int8" or "binary"
+        oversample: Shortlist size multiplier for the quantized first pass
+            (defaults to ``DEFAULT_OVERSAMPLE[mode]``)
+        float_store: Optional path of a file the float vectors are appended to
+            as raw float32 rows (created empty with the index). It is
+            memory-mapped read-only and enables exact re-ranking of the
+            shortlist. Binary mode needs it, or ``map_float_file``, for usable
+            recall.
+    """
+
+    def __init__(self, mode: str = "float", oversample: Optional[int] = None,
+                 float_store: Optional[str] = None):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'. Expected one of {QUANTIZATION_MODES}")
+        self.mode = mode
+        self.oversample = max(1, oversample or DEFAULT_OVERSAMPLE[mode])
+        self.float_store = float_store
+        self.dim: Optional[int] = None
+        self.size = 0
+        self._vectors: Optional[np.ndarray] = None  # float mode
+        self._codes: Optional[np.ndarray] = None    # int8 or packed bits
+        self._scales: Optional[np.ndarray] = None   # int8 mode
+        self._float_map: Optional[np.ndarray] = None
+        if float_store and mode != "float":
+            open(float_store, "wb").close()
+
+    def __repr__(self) -> str:
+        return f"QuantizedIndex(mode={self.mode}, size={self.size}, dim={self.dim}, nbytes={self.nbytes})"
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in RAM by the index (memory-mapped floats excluded)."""
+        arrays = [self._vectors, self._codes, self._scales]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def add(self, vectors: np.ndarray):
+        """Normalize, quantize and append vectors to the index."""
+        if self._float_map is not None and not self.float_store:
+            raise ValueError("Cannot add vectors to an index re-ranked from a mapped float file")
+        vectors = normalize(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        if self.mode == "float":
+            self._vectors = self._append(self._vectors, vectors)
+        elif self.mode == "int8":
+            codes, scales = quantize_int8(vectors)
+            self._codes = self._append(self._codes, codes)
+            self._scales = self._append(self._scales, scales)
+        else:
+            self._codes = self._append(self._codes, quantize_binary(vectors))
+
+        self.size += len(vectors)
+        if self.float_store and self.mode != "float":
+            self._append_float_store(vectors)
+
+    @staticmethod
+    def _append(existing: Optional[np.ndarray], new: np.ndarray) -> np.ndarray:
+        return new if existing is None else np.concatenate([existing, new])
+
+    def _append_float_store(self, vectors: np.ndarray):
+        """Append only the new rows to the store and re-map it; earlier rows are never read back"""
+        with open(self.float_store, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._float_map = np.memmap(self.float_store, dtype=np.float32, mode="r", shape=(self.size, self.dim))
+
+    def map_float_file(self, path: str):
+        """Re-rank against float vectors already on disk instead of a ``float_store``.
+
+        Args:
+            path: .npy file with one row per indexed vector, in the order they were
+                added. Rows need not be normalized; shortlisted rows are normalized
+                when read. The file is memory-mapped read-only.
+        """
+        floats = np.load(path, mmap_mode="r")
+        if floats.shape != (self.size, self.dim):
+            raise ValueError(f"Expected {self.size} rows of dimension {self.dim} in {path}, got {floats.shape}")
+        self.float_store = None
+        self._float_map = floats
+
+    def _rescore(self, query: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Score shortlisted ids against the float query."""
+        if self._float_map is not None:
+            return normalize(self._float_map[ids]) @ query
+        if self.mode == "int8":
+            return (self._codes[ids].astype(np.float32) @ query) * self._scales[ids]
+        signs = np.unpackbits(self._codes[ids], axis=1, count=self.dim).astype(np.float32) * 2 - 1
+        return (signs @ query) / np.sqrt(self.dim)
+
+    def _first_pass(self, query: np.ndarray) -> np.ndarray:
+        """Approximate scores for every vector, computed in blocks so the
+        temporary float copy never exceeds ``BLOCK_ROWS`` rows."""
+        scores = np.empty(self.size, dtype=np.float32)
+        query_code = quantize_binary(query)[0] if self.mode == "binary" else None
+        for start in range(0, self.size, BLOCK_ROWS):
+            block = self._codes[start:start + BLOCK_ROWS]
+            if self.mode == "int8":
+                block_scores = (block.astype(np.float32) @ query) * self._scales[start:start + BLOCK_ROWS]
+            else:
+                block_scores = -hamming_distances(block, query_code)
+            scores[start:start + BLOCK_ROWS] = block_scores
+        return scores
+
+    def search(self, query: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` most similar vectors to ``query``.
+
+        Returns:
+            (ids, scores) ordered by decreasing similarity
+        """
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(query)[0]
+
+        if self.mode == "float":
+            scores = self._vectors @ query
+            ids = _top_k(scores, k)
+            return ids, scores[ids]
+
+        shortlist = _top_k(self._first_pass(query), k * self.oversample)
+
+        scores = self._rescore(query, shortlist)
+        order = _top_k(scores, k)
+        return shortlist[order], scores[order]
@@ -0,0 +1,360 @@
+"""Account-wide rate limiting for model and embedding calls.
+
+All call sites share one RateLimiter (``get_rate_limiter()``), so bursts from
+parallel agents, batch runs and ingestion are spread out before the provider
+starts answering 429. Before a request is sent the limiter waits for:
+
+* a requests-per-minute token bucket (``OPENAI_RPM``),
+* a tokens-per-minute bucket charged with the request's estimated tokens
+  (``OPENAI_TPM``; corrected with the actual usage once the answer arrives),
+* a free concurrency slot; the number of slots adapts AIMD-style between
+  ``min_concurrency`` and ``OPENAI_MAX_CONCURRENCY``: +1/limit per success,
+  halved on a 429 (once per burst: 429s of requests sent before the last cut
+  are not counted again), after which new requests also wait out ``retry-after``.
+
+``x-ratelimit-remaining-*`` headers, when a response exposes them, pull the
+buckets down to what the provider reports, so other processes sharing the
+account are accounted for. Threads block on a condition variable; asyncio
+callers use the ``a``-prefixed variants, which sleep without blocking the loop.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping, Optional
+
+
+# Rough token estimate used for budgets (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+# Completion tokens charged up front when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+# How often a request waiting for a concurrency slot re-checks (threads are also woken on release)
+ASYNC_POLL_SECONDS = 0.05
+
+
+class TokenBucket:
+    """Bucket refilled continuously at ``per_minute`` / 60 per second, holding at most one minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 if it is now); amounts above capacity wait for a full bucket"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        # May go negative: a request larger than the estimate is paid back by waiting longer
+        self.level -= amount
+
+    def cap(self, remaining: float):
+        self.level = min(self.level, remaining)
+
+
+@dataclass
+class RateLimitStats:
+    requests: int = 0
+    rate_limited: int = 0
+    waits: int = 0
+    wait_seconds: float = 0.0
+    min_concurrency_seen: float = 0.0
+
+
+class Slot:
+    """One admitted request; set ``used_tokens``/``headers`` (or call observe) before it is released"""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.admitted_at = time.monotonic()
+        self.used_tokens: Optional[int] = None
+        self.headers: Optional[Mapping[str, str]] = None
+
+    def observe(self, response: Any = None, headers: Optional[Mapping[str, str]] = None):
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None) if usage is not None else None
+        if isinstance(total, int):
+            self.used_tokens = total
+        if headers is not None:
+            self.headers = headers
+
+
+def parse_duration(text: str) -> Optional[float]:
+    """"6m0s" / "1.5s" / "20ms" / "2" (seconds) -> seconds"""
+    if text is None:
+        return None
+    text = str(text).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", text)
+    if not parts:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(value) * scale[unit] for value, unit in parts)
+
+
+def rate_limit_error(error: BaseException):
+    """(is_429, response headers) for an exception raised by an SDK call"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    return status == 429, headers
+
+
+class RateLimiter:
+    """Shared RPM/TPM token buckets plus an adaptive (AIMD) concurrency limit.
+
+    Args:
+        rpm: Requests per minute (None or 0 = unlimited)
+        tpm: Estimated tokens per minute (None or 0 = unlimited)
+        max_concurrency: Upper bound of the adaptive number of requests in flight
+        min_concurrency: Lower bound the limit is never cut below
+        backoff: Factor applied to the concurrency limit on a 429
+        default_retry_after: Pause for new requests after a 429 without a retry-after header
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: int = 32,
+                 min_concurrency: int = 1, backoff: float = 0.5, default_retry_after: float = 1.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.backoff = backoff
+        self.default_retry_after = default_retry_after
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = RateLimitStats(min_concurrency_seen=self.limit)
+        self._cond = threading.Condition()
+
+    def __repr__(self) -> str:
+        rpm = self.requests.capacity if self.requests else None
+        tpm = self.tokens.capacity if self.tokens else None
+        return f"RateLimiter(rpm={rpm}, tpm={tpm}, limit={int(self.limit)}/{self.max_concurrency})"
+
+    def _try_acquire(self, tokens: int) -> Optional[float]:
+        """Admit the request (returns None) or return how long to wait before trying again. Caller holds the lock."""
+        now = time.monotonic()
+        waits = [self.paused_until - now]
+        if self.in_flight >= int(self.limit):
+            waits.append(ASYNC_POLL_SECONDS)
+        if self.requests is not None:
+            waits.append(self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            waits.append(self.tokens.wait_time(tokens, now))
+        wait = max(waits)
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self.in_flight += 1
+        self.stats.requests += 1
+        return None
+
+    def acquire(self, tokens: int = 0):
+        """Block the calling thread until the request may be sent"""
+        started = None
+        with self._cond:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait is None:
+                    break
+                started = started or time.monotonic()
+                self._cond.wait(timeout=wait)
+            self._record_wait(started)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait without blocking the event loop until the request may be sent"""
+        started = None
+        while True:
+            with self._cond:
+                wait = self._try_acquire(tokens)
+                if wait is None:
+                    self._record_wait(started)
+                    return
+            started = started or time.monotonic()
+            await asyncio.sleep(wait)
+
+    def _record_wait(self, started: Optional[float]):
+        if started is not None:
+            self.stats.waits += 1
+            self.stats.wait_seconds += time.monotonic() - started
+
+    def release(self, slot: Slot, ok: bool = True, rate_limited: bool = False):
+        """Return the slot and adapt: additive increase on success, multiplicative decrease on a 429"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self.stats.rate_limited += 1
+                # A burst of 429s is one congestion signal: requests sent before the last cut don't cut again
+                if slot.admitted_at >= self.last_decrease:
+                    self.limit = max(float(self.min_concurrency), self.limit * self.backoff)
+                    self.last_decrease = now
+                    self.stats.min_concurrency_seen = min(self.stats.min_concurrency_seen, self.limit)
+                retry_after = self._retry_after(slot.headers)
+                self.paused_until = max(self.paused_until, now + (retry_after or self.default_retry_after))
+            elif ok:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            if self.tokens is not None and slot.used_tokens is not None:
+                self.tokens.take(slot.used_tokens - slot.estimated_tokens)
+            if slot.headers is not None:
+                self._apply_headers(slot.headers)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+        if not headers:
+            return None
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000.0
+        return parse_duration(headers.get("retry-after"))
+
+    def _apply_headers(self, headers: Mapping[str, str]):
+        for bucket, name in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{name}")
+            if bucket is not None and remaining is not None:
+                try:
+                    bucket.cap(float(remaining))
+                except ValueError:
+                    pass
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0):
+        """Hold a request slot for the duration of the block (e.g. while a response streams)"""
+        self.acquire(estimated_tokens)
+        slot = Slot(estimated_tokens)
+        try:
+            yield slot
+        except BaseException as e:
+            limited, headers = rate_limit_error(e)
+            slot.observe(headers=headers)
+            self.release(slot, ok=False, rate_limited=limited)
+            raise
+        self.release(slot)
+
+    @asynccontextmanager
+    async def aslot(self, estimated_tokens: int = 0):
+        await self.acquire_async(estimated_tokens)
+        slot = Slot(estimated_tokens)
+        try:
+            yield slot
+        except BaseException as e:
+            limited, headers = rate_limit_error(e)
+            slot.observe(headers=headers)
+            self.release(slot, ok=False, rate_limited=limited)
+            raise
+        self.release(slot)
+
+    def call(self, fn: Callable, *args, estimated_tokens: int = 0, **kwargs):
+        """Run a blocking SDK call through the limiter"""
+        with self.slot(estimated_tokens) as slot:
+            response = fn(*args, **kwargs)
+            slot.observe(response)
+            return response
+
+    async def acall(self, fn: Callable, *args, estimated_tokens: int = 0, **kwargs):
+        """Await an async SDK call through the limiter"""
+        async with self.aslot(estimated_tokens) as slot:
+            response = await fn(*args, **kwargs)
+            slot.observe(response)
+            return response
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"[RateLimiter] requests={s.requests} 429s={s.rate_limited} waits={s.waits} "
+                f"waited={s.wait_seconds:.1f}s concurrency={int(self.limit)}/{self.max_concurrency} "
+                f"(lowest {int(s.min_concurrency_seen)})")
+
+
+def estimate_tokens(payload: Mapping[str, Any]) -> int:
+    """Tokens a chat or embedding request will use: prompt characters / 4 plus the completion allowance"""
+    chars = 0
+    for message in payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, Mapping) else getattr(message, "content", None)
+        chars += len(str(content or ""))
+    inputs = payload.get("input")
+    if inputs is not None:
+        chars += sum(len(str(x)) for x in inputs) if isinstance(inputs, (list, tuple)) else len(str(inputs))
+    completion = 0
+    if "messages" in payload:
+        completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return chars // CHARS_PER_TOKEN + completion
+
+
+def _is_openai_resource(resource: Any) -> bool:
+    # Only the real SDK resources are asked for raw responses (stubs and mocks are called as-is)
+    return type(resource).__module__.startswith("openai.") and hasattr(resource, "with_raw_response")
+
+
+def limited_create(resource: Any, method: str = "create", limiter: Optional[RateLimiter] = None, **payload):
+    """Call ``resource.<method>(**payload)`` through the shared limiter.
+
+    ``resource`` is an OpenAI SDK resource such as ``client.chat.completions``,
+    ``client.beta.chat.completions`` (method "parse") or ``client.embeddings``.
+    The rate-limit headers of the response are read via ``with_raw_response``.
+    """
+    limiter = limiter or get_rate_limiter()
+    with limiter.slot(estimate_tokens(payload)) as slot:
+        if _is_openai_resource(resource):
+            raw = getattr(resource.with_raw_response, method)(**payload)
+            response = raw.parse()
+            slot.observe(response, raw.headers)
+        else:
+            response = getattr(resource, method)(**payload)
+            slot.observe(response)
+        return response
+
+
+async def limited_acreate(resource: Any, method: str = "create", limiter: Optional[RateLimiter] = None, **payload):
+    """Async version of limited_create for AsyncOpenAI resources"""
+    limiter = limiter or get_rate_limiter()
+    async with limiter.aslot(estimate_tokens(payload)) as slot:
+        if _is_openai_resource(resource):
+            raw = await getattr(resource.with_raw_response, method)(**payload)
+            response = raw.parse()
+            slot.observe(response, raw.headers)
+        else:
+            response = await getattr(resource, method)(**payload)
+            slot.observe(response)
+        return response
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide limiter, configured from OPENAI_RPM, OPENAI_TPM and OPENAI_MAX_CONCURRENCY"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                rpm=float(os.getenv("OPENAI_RPM", "500")),
+                tpm=float(os.getenv("OPENAI_TPM", "200000")),
+                max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+            )
+        return _default_limiter
+
+
+def set_rate_limiter(limiter: RateLimiter):
+    """Replace the process-wide limiter (e.g. with the account's real limits)"""
+    global _default_limiter
+    with _default_lock:
+        _default_limiter = limiter
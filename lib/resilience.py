@@ -0,0 +1,336 @@
+"""Retries with jittered exponential backoff, and hedged requests for tail latency.
+
+``Resilient.call(key, fn, ...)`` runs an SDK call (usually a
+``limited_create`` through the rate limiter) and
+
+* retries transient failures (429, 408, 5xx, timeouts, connection errors)
+  after a full-jitter exponential backoff, honouring ``retry-after``; client
+  errors such as 400/401/404 or a malformed structured answer are raised at
+  once. Calls marked ``idempotent=False`` are only retried when the request
+  cannot have been processed (429, connection errors),
+* optionally hedges: once ``key`` has enough latency samples, a call still
+  running after the observed p95 gets a duplicate request; whichever finishes
+  first wins and the other is cancelled (asyncio) or abandoned (threads,
+  whose blocking HTTP call cannot be interrupted).
+
+Latencies are tracked per ``key`` (e.g. "llm:gpt-4o-mini"), since models and
+endpoints have very different latency profiles.
+
+A call can carry a deadline (``time.monotonic()`` value), passed as ``deadline=``
+or set for a block with ``deadline_scope``: once it has passed, or a backoff
+would end after it, the call stops retrying and hedging and raises. A caller
+that gives up waiting on a worker thread thereby also stops that thread from
+holding its executor slot and rate-limiter budget with further attempts.
+"""
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from lib.rate_limit import parse_duration, rate_limit_error
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_call_deadline: ContextVar[Optional[float]] = ContextVar("call_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Resilient calls made in this block (thread or task) stop retrying and hedging at ``deadline``.
+
+    Args:
+        deadline: ``time.monotonic()`` value, or None for no deadline
+    """
+    token = _call_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+def queue_wait(num_calls: int, max_concurrency: int, timeout: Optional[float]) -> Optional[float]:
+    """Seconds to wait for ``num_calls`` calls of up to ``timeout`` each on a pool of ``max_concurrency`` threads.
+
+    Calls queued behind the pool get their own full ``timeout``: one per wave, plus one wave of slack.
+    """
+    if timeout is None:
+        return None
+    return timeout * (math.ceil(num_calls / max_concurrency) + 1)
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """The ``time.monotonic()`` deadline ``seconds`` from now, or None for no deadline"""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """Whether ``error`` is transient; non-idempotent calls only retry when the request was not processed"""
+    import openai  # only once a call has failed, so importing lib.resilience stays cheap
+
+    limited, _ = rate_limit_error(error)
+    if limited or isinstance(error, openai.APIConnectionError) and not isinstance(error, openai.APITimeoutError):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Full-jitter backoff before retry number ``attempt`` (1-based), at least the server's retry-after"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        _, headers = rate_limit_error(error) if error is not None else (False, None)
+        if headers:
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per key"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, key: str, q: float, min_samples: int) -> Optional[float]:
+        """The ``q`` quantile of ``key``'s latencies, or None with fewer than ``min_samples`` samples"""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < min_samples:
+            return None
+        return float(np.quantile(samples, q))
+
+
+@dataclass
+class ResilienceStats:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    hedges_fired: int = 0
+    hedges_won: int = 0
+    latency_saved: float = 0.0
+    deadline_stops: int = 0
+
+
+class Resilient:
+    """Retry and hedging policy shared by all calls of a process.
+
+    Args:
+        retry: Backoff policy; ``max_attempts=1`` disables retries
+        hedge: Send a duplicate request when a call is slower than the ``hedge_quantile`` latency
+        hedge_quantile: Latency quantile after which the duplicate is sent
+        min_samples: Latency samples per key before hedging starts
+        min_hedge_delay: Never hedge earlier than this (seconds)
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy] = None, hedge: bool = False, hedge_quantile: float = 0.95,
+                 min_samples: int = 20, min_hedge_delay: float = 0.05):
+        self.retry = retry or RetryPolicy()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = LatencyTracker()
+        self.stats = ResilienceStats()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __repr__(self) -> str:
+        return f"Resilient(max_attempts={self.retry.max_attempts}, hedge={self.hedge})"
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def _hedge_delay(self, key: str, idempotent: bool, deadline: Optional[float]) -> Optional[float]:
+        if not (self.hedge and idempotent):
+            return None
+        quantile = self.latencies.quantile(key, self.hedge_quantile, self.min_samples)
+        if quantile is None:
+            return None
+        delay = max(quantile, self.min_hedge_delay)
+        # A duplicate that would only start after the deadline is not sent
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _check_deadline(self, key: str, deadline: Optional[float], attempt: int):
+        if deadline is not None and time.monotonic() >= deadline:
+            self._count(failures=1, deadline_stops=1)
+            raise TimeoutError(f"{key}: deadline passed before attempt {attempt}")
+
+    def _retry_delay(self, key: str, error: Exception, attempt: int, idempotent: bool,
+                     deadline: Optional[float]) -> Optional[float]:
+        """Backoff before the next attempt, or None if ``error`` is to be raised"""
+        if attempt == self.retry.max_attempts or not is_retryable(error, idempotent):
+            self._count(failures=1)
+            return None
+        delay = self.retry.delay(attempt, error)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            print(f"[Resilient] {key}: {type(error).__name__}, no retry: the deadline passes first")
+            self._count(failures=1, deadline_stops=1)
+            return None
+        print(f"[Resilient] {key}: {type(error).__name__}, retry {attempt} in {delay:.2f}s")
+        self._count(retries=1)
+        return delay
+
+    def call(self, key: str, fn: Callable, *args, idempotent: bool = True, deadline: Optional[float] = None,
+             **kwargs):
+        """Run ``fn(*args, **kwargs)`` with retries (and hedging, if enabled).
+
+        ``deadline`` (``time.monotonic()``) defaults to the one set by ``deadline_scope``.
+        """
+        deadline = deadline if deadline is not None else _call_deadline.get()
+        self._count(calls=1)
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self._check_deadline(key, deadline, attempt)
+            try:
+                return self._attempt(key, fn, args, kwargs, idempotent, deadline)
+            except Exception as e:
+                delay = self._retry_delay(key, e, attempt, idempotent, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _attempt(self, key, fn, args, kwargs, idempotent, deadline):
+        delay = self._hedge_delay(key, idempotent, deadline)
+        start = time.perf_counter()
+        if delay is None:
+            result = fn(*args, **kwargs)
+            self.latencies.record(key, time.perf_counter() - start)
+            return result
+
+        executor = self._hedge_executor()
+        primary = executor.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            result = primary.result()
+            self.latencies.record(key, time.perf_counter() - start)
+            return result
+
+        self._count(hedges_fired=1)
+        hedge = executor.submit(fn, *args, **kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                finished = time.perf_counter()
+                self.latencies.record(key, finished - start)
+                if future is hedge:
+                    self._count(hedges_won=1)
+                    primary.add_done_callback(
+                        lambda _: self._count(latency_saved=time.perf_counter() - finished))
+                for other in pending:
+                    other.cancel()
+                return future.result()
+        raise error
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedged-call")
+            return self._executor
+
+    async def acall(self, key: str, fn: Callable, *args, idempotent: bool = True, deadline: Optional[float] = None,
+                    **kwargs):
+        """Async version of call; ``fn`` returns an awaitable"""
+        deadline = deadline if deadline is not None else _call_deadline.get()
+        self._count(calls=1)
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self._check_deadline(key, deadline, attempt)
+            try:
+                return await self._aattempt(key, fn, args, kwargs, idempotent, deadline)
+            except Exception as e:
+                delay = self._retry_delay(key, e, attempt, idempotent, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _aattempt(self, key, fn, args, kwargs, idempotent, deadline):
+        delay = self._hedge_delay(key, idempotent, deadline)
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(fn(*args, **kwargs))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            result = primary.result()
+            self.latencies.record(key, time.perf_counter() - start)
+            return result
+
+        self._count(hedges_fired=1)
+        hedge = asyncio.ensure_future(fn(*args, **kwargs))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self.latencies.record(key, time.perf_counter() - start)
+                    if task is hedge:
+                        # The primary is cancelled, so the time saved is not measured here
+                        self._count(hedges_won=1)
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"[Resilient] calls={s.calls} retries={s.retries} failures={s.failures} "
+                f"hedges_fired={s.hedges_fired} hedges_won={s.hedges_won} latency_saved={s.latency_saved:.2f}s "
+                f"deadline_stops={s.deadline_stops}")
+
+
+_default: Optional[Resilient] = None
+_default_lock = threading.Lock()
+
+
+def get_resilience() -> Resilient:
+    """The process-wide policy, configured from OPENAI_MAX_ATTEMPTS, OPENAI_HEDGE and OPENAI_HEDGE_QUANTILE"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Resilient(
+                retry=RetryPolicy(max_attempts=int(os.getenv("OPENAI_MAX_ATTEMPTS", "4"))),
+                hedge=os.getenv("OPENAI_HEDGE", "0") == "1",
+                hedge_quantile=float(os.getenv("OPENAI_HEDGE_QUANTILE", "0.95")),
+            )
+        return _default
+
+
+def set_resilience(resilient: Resilient):
+    global _default
+    with _default_lock:
+        _default = resilient
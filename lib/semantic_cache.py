@@ -0,0 +1,161 @@
+"""Semantic answer cache for knowledge agents.
+
+Answers are stored per namespace (a fingerprint of the agent's persona and
+knowledge, so different agents never share answers) together with the
+embedding of the question that produced them. A new question reuses a stored
+answer when its cosine similarity to a cached question is at least
+``threshold`` and the entry is younger than ``ttl_seconds``. Exact repeats are
+served without calling the embedding model at all.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    embedding: np.ndarray
+    answer: str
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    exact_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+class SemanticCache:
+    """Embedding-similarity cache of question -> answer.
+
+    Args:
+        embed_fn: Function returning the embedding vector of a text
+        threshold: Minimum cosine similarity for a cached answer to be reused
+        ttl_seconds: Age after which an entry is no longer served (None = never expires)
+        max_entries: Maximum entries kept per namespace; the oldest are evicted first
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = 0.92,
+        ttl_seconds: Optional[float] = 3600,
+        max_entries: int = 1000,
+    ):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: Dict[str, List[CacheEntry]] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"SemanticCache(threshold={self.threshold}, ttl={self.ttl_seconds}, hit_rate={self.stats.hit_rate:.2f})"
+
+    @staticmethod
+    def fingerprint(*parts: str) -> str:
+        """Stable namespace key for an agent configuration (e.g. persona + knowledge)"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def _live_entries(self, namespace: str) -> List[CacheEntry]:
+        """Drop expired entries and return the rest. Caller must hold the lock."""
+        entries = self._entries.get(namespace, [])
+        if self.ttl_seconds is not None:
+            cutoff = time.time() - self.ttl_seconds
+            live = [e for e in entries if e.created_at >= cutoff]
+            self.stats.expired += len(entries) - len(live)
+            self._entries[namespace] = entries = live
+        return entries
+
+    def _find_exact(self, namespace: str, question: str) -> Optional[CacheEntry]:
+        key = _normalize_question(question)
+        with self._lock:
+            for entry in reversed(self._live_entries(namespace)):
+                if _normalize_question(entry.question) == key:
+                    return entry
+        return None
+
+    def lookup(self, namespace: str, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Find a cached answer for ``question``.
+
+        Returns:
+            (answer, embedding). ``answer`` is None on a miss; ``embedding`` is the
+            question embedding when one was computed, so it can be passed to store().
+        """
+        exact = self._find_exact(namespace, question)
+        if exact is not None:
+            with self._lock:
+                self.stats.hits += 1
+                self.stats.exact_hits += 1
+            return exact.answer, exact.embedding
+
+        embedding = np.asarray(self.embed_fn(question), dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+
+        with self._lock:
+            entries = self._live_entries(namespace)
+            if entries:
+                similarities = np.stack([e.embedding for e in entries]) @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.stats.hits += 1
+                    return entries[best].answer, embedding
+            self.stats.misses += 1
+        return None, embedding
+
+    def store(self, namespace: str, question: str, answer: str, embedding: Optional[np.ndarray] = None):
+        """Cache ``answer`` for ``question`` in ``namespace``"""
+        if embedding is None:
+            embedding = np.asarray(self.embed_fn(question), dtype=np.float32)
+            embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        with self._lock:
+            entries = self._live_entries(namespace)
+            entries.append(CacheEntry(question=question, embedding=embedding, answer=answer))
+            if len(entries) > self.max_entries:
+                del entries[:len(entries) - self.max_entries]
+
+    def get_or_compute(self, namespace: str, question: str, compute: Callable[[], str]) -> str:
+        """Return a cached answer, or call ``compute()`` and cache its result"""
+        answer, embedding = self.lookup(namespace, question)
+        if answer is not None:
+            return answer
+        answer = compute()
+        self.store(namespace, question, answer, embedding)
+        return answer
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove cached answers for one namespace, or for all of them"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(namespace, None)
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"[SemanticCache] lookups={s.lookups} hits={s.hits} (exact={s.exact_hits}) "
+                f"misses={s.misses} expired={s.expired} hit_rate={s.hit_rate:.1%}")
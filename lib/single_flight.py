@@ -0,0 +1,133 @@
+"""Single-flight coalescing of identical in-flight requests.
+
+When several sessions send the same payload at the same moment (two users
+routed to the same knowledge agent with the same question, the router
+embedding the same prompt), only the first caller - the leader - sends the
+request; callers arriving while it is in flight wait for the leader's result
+instead of sending their own. Nothing is kept once the request finishes, so
+this is not a cache: a later identical request goes upstream again.
+
+The in-flight request is a ``concurrent.futures.Future``, so waiters can be
+threads (``do``) or asyncio tasks (``ado``, via ``asyncio.wrap_future``), and a
+thread can wait on a request led by a coroutine and vice versa. An exception
+raised by the leader is raised in every waiter.
+
+Only coalesce requests whose answer does not depend on who asked: sampled
+chat completions (temperature > 0) are independent draws and must stay
+separate requests.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+def _jsonable(value: Any) -> Any:
+    # Pydantic response formats are classes; their schema identifies them
+    if isinstance(value, type):
+        schema = value.model_json_schema() if hasattr(value, "model_json_schema") else None
+        return {"type": f"{value.__module__}.{value.__qualname__}", "schema": schema}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return repr(value)
+
+
+def request_key(namespace: str, payload: Dict[str, Any]) -> str:
+    """Key of a request: ``namespace`` (endpoint, model) plus a hash of the canonical payload"""
+    canonical = json.dumps(payload, sort_keys=True, default=_jsonable, ensure_ascii=False)
+    return f"{namespace}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+@dataclass
+class SingleFlightStats:
+    requests: int = 0
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """Process-wide table of in-flight requests"""
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"SingleFlight(in_flight={len(self._in_flight)})"
+
+    def _join(self, key: str):
+        """The in-flight future for ``key`` and whether the caller leads it"""
+        with self._lock:
+            self.stats.requests += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, sharing the call with concurrent callers of the same ``key``"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, fn: Callable, *args, **kwargs):
+        """Async version of do; ``fn`` returns an awaitable.
+
+        The leader's request runs as its own task, so cancelling the leader
+        does not cancel the request the other waiters are sharing.
+        """
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda t: self._finish_task(key, future, t))
+        # shield: a cancelled waiter must not cancel the future the others are waiting on
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _finish_task(self, key: str, future: Future, task: "asyncio.Future"):
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        self._finish(key, future, None if error is not None else task.result(), error)
+
+    def report(self) -> str:
+        s = self.stats
+        return f"[SingleFlight] requests={s.requests} coalesced={s.coalesced} upstream={s.requests - s.coalesced}"
+
+
+_default: Optional[SingleFlight] = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SingleFlight()
+        return _default
+
+
+def set_single_flight(single_flight: SingleFlight):
+    global _default
+    with _default_lock:
+        _default = single_flight
@@ -0,0 +1,92 @@
+"""Dependency graph for planned tasks.
+
+Plans may mark a task with ``<depends_on>`` listing the ids (or types) of the
+tasks whose results it needs. The graph is split into waves: every task in a
+wave depends only on tasks in earlier waves, so each wave can run concurrently.
+"""
+import re
+from typing import Dict, List, Set, Tuple
+
+
+def assign_task_ids(tasks: List[Dict]) -> List[str]:
+    """Give every task an ``id`` (its own <id>, else its type, made unique with a suffix), in place"""
+    taken: Set[str] = set()
+    ids = []
+    for task in tasks:
+        base = (task.get("id") or task["type"]).strip().lower()
+        task_id, n = base, 2
+        while task_id in taken:
+            task_id, n = f"{base}_{n}", n + 1
+        taken.add(task_id)
+        task["id"] = task_id
+        ids.append(task_id)
+    return ids
+
+
+def parse_depends_on(text: str) -> List[str]:
+    """"hematology, renal" / "hematology and renal" -> ["hematology", "renal"]"""
+    parts = re.split(r"[,;\n]|\band\b", text.lower())
+    return [p.strip() for p in parts if p.strip() and p.strip() not in ("none", "-")]
+
+
+def build_task_graph(tasks: List[Dict]) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Map each task id to the ids it depends on.
+
+    Tasks must already have ids (see assign_task_ids). A dependency may name a
+    task id or, if unambiguous, a task type.
+
+    Returns:
+        (graph, unknown) where ``unknown`` lists references that matched no task
+    """
+    by_id = {t["id"]: t for t in tasks}
+    types: Dict[str, List[str]] = {}
+    for t in tasks:
+        types.setdefault(t["type"].strip().lower(), []).append(t["id"])
+
+    graph, unknown = {}, []
+    for t in tasks:
+        deps = []
+        for ref in t.get("depends_on", []):
+            if ref in by_id:
+                target = ref
+            elif len(types.get(ref, [])) == 1:
+                target = types[ref][0]
+            else:
+                unknown.append(f"{t['id']} -> {ref}")
+                continue
+            if target not in deps:
+                deps.append(target)
+        graph[t["id"]] = deps
+    return graph, unknown
+
+
+def find_cycle(graph: Dict[str, List[str]], nodes: Set[str]) -> List[str]:
+    """One dependency cycle among ``nodes`` as a path (first node repeated at the end)"""
+    start = next(iter(sorted(nodes)))
+    path, seen = [start], {start: 0}
+    while True:
+        node = next(d for d in graph[path[-1]] if d in nodes)
+        if node in seen:
+            return path[seen[node]:] + [node]
+        seen[node] = len(path)
+        path.append(node)
+
+
+def task_waves(graph: Dict[str, List[str]]) -> Tuple[List[List[str]], Set[str]]:
+    """Topological levels of the graph (Kahn's algorithm), keeping plan order within a wave.
+
+    Returns:
+        (waves, blocked) where ``blocked`` holds tasks on a cycle or downstream of one
+    """
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    done: Set[str] = set()
+    waves = []
+    while remaining:
+        wave = [node for node, deps in remaining.items() if deps <= done]
+        if not wave:
+            break
+        waves.append(wave)
+        done.update(wave)
+        for node in wave:
+            del remaining[node]
+    return waves, set(remaining)
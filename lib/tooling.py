@@ -2,15 +2,32 @@ import inspect
 import datetime
 from typing import (
     Any, Callable, 
-    Literal, Optional, Union, TypeAlias,
+    Literal, Optional, Union,
     get_type_hints, get_origin, get_args,
 )
 from functools import wraps
-from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from pydantic import BaseModel, ConfigDict
 
 
-# Type alias for OpenAI's tool call implementation
-ToolCall: TypeAlias = ChatCompletionMessageToolCall
+class ToolCallFunction(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    arguments: str
+
+
+class ToolCall(BaseModel):
+    """A tool call requested by the model.
+
+    Mirrors the OpenAI SDK's ChatCompletionMessageToolCall and validates from
+    it (or from the plain dict of a batch result), so the message models do
+    not need the SDK imported.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    type: Literal["function"]
+    function: ToolCallFunction
 
 class Tool:
     def __init__(
@@ -0,0 +1,79 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class CallUsage:
+    """Token usage of a single completion call"""
+    label: str
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def uncached_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens
+
+    @classmethod
+    def from_response_usage(cls, label: str, usage: Any) -> "CallUsage":
+        """Build from the ``usage`` field of an OpenAI chat completion response"""
+        if usage is None:
+            return cls(label)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return cls(
+            label=label,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            cached_tokens=(getattr(details, "cached_tokens", 0) or 0) if details else 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+
+class UsageTracker:
+    """Thread-safe log of token usage, with cached vs. uncached prompt token totals"""
+
+    def __init__(self):
+        self.calls: List[CallUsage] = []
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"UsageTracker(calls={len(self.calls)})"
+
+    def record(self, label: str, usage: Any) -> CallUsage:
+        """Record the ``usage`` field of a completion response under ``label``"""
+        call = CallUsage.from_response_usage(label, usage)
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+
+    def totals(self, label: Optional[str] = None) -> Dict[str, float]:
+        """Aggregate token counts, optionally for a single label"""
+        with self._lock:
+            calls = [c for c in self.calls if label is None or c.label == label]
+        prompt = sum(c.prompt_tokens for c in calls)
+        cached = sum(c.cached_tokens for c in calls)
+        return {
+            "calls": len(calls),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "uncached_tokens": prompt - cached,
+            "completion_tokens": sum(c.completion_tokens for c in calls),
+            "cache_hit_ratio": cached / prompt if prompt else 0.0,
+        }
+
+    def report(self) -> str:
+        """Per-call table followed by totals"""
+        with self._lock:
+            calls = list(self.calls)
+        rows = [f"{'call':<20}{'prompt':>9}{'cached':>9}{'uncached':>10}{'completion':>12}"]
+        for c in calls:
+            rows.append(f"{c.label:<20}{c.prompt_tokens:>9}{c.cached_tokens:>9}{c.uncached_tokens:>10}{c.completion_tokens:>12}")
+        t = self.totals()
+        rows.append(f"{'TOTAL':<20}{t['prompt_tokens']:>9}{t['cached_tokens']:>9}{t['uncached_tokens']:>10}"
+                    f"{t['completion_tokens']:>12}")
+        rows.append(f"Prompt cache hit ratio: {t['cache_hit_ratio']:.1%}")
+        return "\n".join(rows)
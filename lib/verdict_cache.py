@@ -0,0 +1,79 @@
+"""Cache of judge verdicts keyed by (response hash, criteria hash).
+
+Re-running an evaluation over the same dataset mostly produces responses that
+were already judged (the worker answers at temperature 0), so their verdicts
+are reused instead of paying for another judge call. The criteria hash also
+covers the judge persona, which is part of the judge prompt. With a ``path``
+the cache is kept in a JSONL file and reloaded by the next run.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from lib.judge import Verdict
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class VerdictCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class VerdictCache:
+    """(response, criteria) -> Verdict store, optionally persisted to JSONL.
+
+    Args:
+        path: JSONL file to load verdicts from and append new ones to (None = memory only)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.stats = VerdictCacheStats()
+        self._verdicts: Dict[str, Verdict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __repr__(self) -> str:
+        return f"VerdictCache(entries={len(self._verdicts)}, path={self.path!r})"
+
+    def _load(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._verdicts[record["key"]] = Verdict(**record["verdict"])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    # Line cut short by an interrupted run
+                    continue
+
+    @staticmethod
+    def key(response: str, criteria: str, persona: str = "") -> str:
+        return f"{_digest(response.strip())}:{_digest(persona + chr(0) + criteria)}"
+
+    def get(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return verdict.model_copy()
+
+    def put(self, key: str, verdict: Verdict):
+        with self._lock:
+            self._verdicts[key] = verdict.model_copy()
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "verdict": verdict.model_dump()}) + "\n")
+
+    def report(self) -> str:
+        s = self.stats
+        return f"[VerdictCache] hits={s.hits} misses={s.misses} entries={len(self._verdicts)}"
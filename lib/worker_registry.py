@@ -0,0 +1,191 @@
+"""Registry mapping task types from a plan to long-lived worker instances.
+
+Planner output is free text, so task types arrive as "hematology",
+"Hematology Panel", "CBC" or "kidney_function". Lookup goes from cheapest to
+most expensive:
+
+1. exact match of the normalized type against worker names and aliases (dict lookup)
+2. match of any word or word pair of the type against the aliases
+3. embedding similarity between the type (plus the task description, if given)
+   and each worker's name, aliases and description
+
+Aliases should be specific terms: a generic word such as "blood" also matches
+"Blood Urea Nitrogen". The similarity threshold of the fallback is measured on
+the registry's own names: a query must be more similar to a worker than any
+registered name or alias is to a worker it does not belong to, so unknown
+types are rejected instead of going to the nearest worker.
+
+Whatever a type resolves to is remembered, so each distinct type pays for the
+fallback at most once.
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Used when the threshold cannot be measured (fewer than two workers), and as its lower bound
+DEFAULT_MIN_SIMILARITY = 0.35
+
+
+def normalize_task_type(task_type: str) -> str:
+    """Lowercase, with punctuation and underscores turned into single spaces"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", task_type.lower()).split())
+
+
+@dataclass
+class WorkerStats:
+    calls: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+
+@dataclass
+class RegisteredWorker:
+    name: str
+    worker: Any
+    aliases: List[str]
+    description: str = ""
+
+
+class WorkerRegistry:
+    """Task type -> worker lookup with aliases, an embedding fallback and per-worker stats.
+
+    Args:
+        embed_fn: Function returning the embedding of a text; without it unknown types are not matched
+        min_similarity: Minimum cosine similarity for the embedding fallback to accept a worker
+            (None = measured on the registered names and aliases when the fallback is first used)
+    """
+
+    def __init__(self, embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 min_similarity: Optional[float] = None):
+        self.embed_fn = embed_fn
+        self.min_similarity = min_similarity
+        self._threshold: Optional[float] = min_similarity
+        self.workers: Dict[str, RegisteredWorker] = {}
+        self.stats: Dict[str, WorkerStats] = {}
+        self._lookup: Dict[str, str] = {}
+        self._embeddings: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"WorkerRegistry(workers={list(self.workers)}, known_types={len(self._lookup)})"
+
+    def register(self, name: str, worker: Any, aliases: Iterable[str] = (), description: str = ""):
+        """Register a worker instance under ``name`` and any number of aliases"""
+        key = normalize_task_type(name)
+        aliases = [normalize_task_type(a) for a in aliases]
+        with self._lock:
+            self.workers[key] = RegisteredWorker(key, worker, aliases, description)
+            self.stats.setdefault(key, WorkerStats())
+            for alias in [key] + aliases:
+                self._lookup[alias] = key
+            self._embeddings = None
+            self._threshold = self.min_similarity
+
+    def _match_words(self, normalized: str) -> Optional[str]:
+        words = normalized.split()
+        candidates = [" ".join(words[i:i + 2]) for i in range(len(words) - 1)] + words
+        for candidate in candidates:
+            if candidate in self._lookup:
+                return self._lookup[candidate]
+        return None
+
+    def _match_embedding(self, query: str) -> Optional[str]:
+        if self.embed_fn is None or not self.workers:
+            return None
+        try:
+            return self._nearest_worker(query)
+        except Exception as e:
+            print(f"[WorkerRegistry] Embedding fallback failed for '{query}': {e}")
+            return None
+
+    def _nearest_worker(self, query: str) -> Optional[str]:
+        names = list(self.workers)
+        if self._embeddings is None or len(self._embeddings) != len(names):
+            texts = [
+                f"{w.name}: {', '.join(w.aliases)}. {w.description}".strip()
+                for w in self.workers.values()
+            ]
+            vectors = np.asarray([self.embed_fn(t) for t in texts], dtype=np.float32)
+            self._embeddings = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        if self._threshold is None:
+            self._threshold = self._measure_threshold(names)
+
+        similarities = self._similarities(query)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self._threshold:
+            print(f"[WorkerRegistry] '{query}' rejected: best similarity {similarities[best]:.2f} "
+                  f"('{names[best]}') is below {self._threshold:.2f}")
+            return None
+        print(f"[WorkerRegistry] '{query}' matched '{names[best]}' by similarity {similarities[best]:.2f}")
+        return names[best]
+
+    def _similarities(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        return self._embeddings @ (vector / (np.linalg.norm(vector) or 1.0))
+
+    def _measure_threshold(self, names: List[str]) -> float:
+        """Highest similarity of a registered name or alias to a worker it does not belong to"""
+        if len(names) < 2:
+            return DEFAULT_MIN_SIMILARITY
+        wrong = []
+        for index, name in enumerate(names):
+            for term in [name] + self.workers[name].aliases:
+                similarities = np.delete(self._similarities(term), index)
+                wrong.append(float(similarities.max()))
+        threshold = max(DEFAULT_MIN_SIMILARITY, max(wrong))
+        print(f"[WorkerRegistry] Similarity threshold {threshold:.2f}, measured on {len(wrong)} names and aliases")
+        return threshold
+
+    def resolve(self, task_type: str, description: str = "") -> Optional[str]:
+        """Name of the worker that handles ``task_type``, or None if nothing matches"""
+        normalized = normalize_task_type(task_type)
+        name = self._lookup.get(normalized)
+        if name is not None:
+            return name
+
+        name = self._match_words(normalized)
+        if name is None:
+            query = f"{task_type}: {description}" if description else task_type
+            name = self._match_embedding(query)
+        if name is not None:
+            with self._lock:
+                self._lookup[normalized] = name
+        return name
+
+    def get(self, task_type: str, description: str = "") -> Any:
+        """Worker instance for ``task_type``.
+
+        Raises:
+            ValueError: If no worker matches, even by embedding similarity
+        """
+        name = self.resolve(task_type, description)
+        if name is None:
+            raise ValueError(f"No worker agent configured for task type: {task_type}")
+        return self.workers[name].worker
+
+    def record(self, task_type: str, latency: float, ok: bool = True):
+        """Add one call of the worker handling ``task_type`` to its stats"""
+        name = self.resolve(task_type)
+        if name is None:
+            return
+        with self._lock:
+            stats = self.stats[name]
+            stats.calls += 1
+            stats.failures += 0 if ok else 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+
+    def report(self) -> str:
+        rows = [f"{'worker':<16}{'calls':>7}{'failures':>10}{'avg s':>8}{'max s':>8}"]
+        with self._lock:
+            for name, s in self.stats.items():
+                rows.append(f"{name:<16}{s.calls:>7}{s.failures:>10}{s.avg_latency:>8.2f}{s.max_latency:>8.2f}")
+        return "\n".join(rows)
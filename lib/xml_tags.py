@@ -0,0 +1,204 @@
+"""Incremental parser for the XML-style tags agents ask LLMs to answer in.
+
+Responses such as ``<analysis>...</analysis><tasks><task>...</task></tasks>`` are
+parsed in a single pass, either all at once or chunk by chunk while they stream
+in. Only the requested tag names are treated as markup; everything else
+(including other tags) is kept verbatim as text of the enclosing element, so
+on well-formed input ``extract_xml(text, "response")`` returns the same inner text
+as the per-script regex helpers it replaces.
+
+Model output is not well-formed XML, so the parser is lenient:
+
+* tags may sit inline or span lines, and may carry attributes (``<task id="1">``)
+* a closing tag closes any elements still open inside it (``<type>x</task>``)
+* opening a tag that is already open closes the earlier one first, so repeated
+  ``<task>`` blocks with a missing ``</task>`` still come out as siblings
+* closing tags that were never opened are ignored
+* elements left open when the stream ends are returned with ``closed=False``
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from lib.task_graph import parse_depends_on
+
+# A "<" with no ">" within this many characters is plain text, not a tag split across chunks
+MAX_TAG_LENGTH = 256
+
+
+@dataclass
+class TagElement:
+    tag: str
+    text: str = ""
+    children: List["TagElement"] = field(default_factory=list)
+    closed: bool = True
+    _pieces: List[str] = field(default_factory=list, repr=False)
+
+    def child(self, tag: str) -> Optional["TagElement"]:
+        """First direct child with the given tag"""
+        return next((c for c in self.children if c.tag == tag), None)
+
+    def child_text(self, tag: str, default: str = "") -> str:
+        found = self.child(tag)
+        return found.text if found is not None else default
+
+
+class TagParser:
+    """Single-pass, chunk-at-a-time parser for a fixed set of tag names.
+
+    Args:
+        tags: Tag names to extract; matching is case-insensitive
+    """
+
+    def __init__(self, tags: Iterable[str]):
+        self.tags = {t.lower() for t in tags}
+        # Only the requested names are matched, so other markup costs nothing to skip
+        names = "|".join(re.escape(t) for t in sorted(self.tags))
+        self._pattern = re.compile(rf"<(/?)({names})(?:\s[^<>]*)?>", re.IGNORECASE)
+        self.elements: List[TagElement] = []
+        self._open: List[TagElement] = []
+        # Names currently open; a name is never open twice, see feed()
+        self._open_tags = set()
+        self._chunks: List[str] = []
+        self._tail = ""
+
+    def __repr__(self) -> str:
+        return f"TagParser(tags={sorted(self.tags)}, elements={len(self.elements)}, open={len(self._open)})"
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    def _append(self, text: str):
+        if text:
+            for element in self._open:
+                element._pieces.append(text)
+
+    def _finish(self, element: TagElement, closed: bool) -> TagElement:
+        element.text = "".join(element._pieces).strip()
+        element._pieces = []
+        element.closed = closed
+        if self._open:
+            self._open[-1].children.append(element)
+        self.elements.append(element)
+        return element
+
+    def _close(self, tag: str, explicit: bool) -> List[TagElement]:
+        """Close the innermost open ``tag`` and everything opened after it"""
+        finished = []
+        while self._open:
+            element = self._open.pop()
+            self._open_tags.discard(element.tag)
+            is_target = element.tag == tag
+            finished.append(self._finish(element, closed=explicit and is_target))
+            if is_target:
+                break
+        return finished
+
+    def feed(self, chunk: str) -> List[TagElement]:
+        """Parse the next chunk of text.
+
+        Returns:
+            Elements completed by this chunk, innermost first
+        """
+        self._chunks.append(chunk)
+        text = self._tail + chunk
+        finished: List[TagElement] = []
+        pos = 0
+        append, open_tags = self._append, self._open_tags
+        for match in self._pattern.finditer(text):
+            start, end = match.span()
+            closing, tag = match.groups()
+            tag = tag.lower()
+            if self._open:
+                append(text[pos:start])
+            pos = end
+            if tag in open_tags:
+                # Closing tag, or a repeated opening tag that implicitly closes the earlier one
+                finished.extend(self._close(tag, explicit=bool(closing)))
+            if self._open:
+                append(text[start:end])
+            if not closing:
+                self._open.append(TagElement(tag))
+                open_tags.add(tag)
+
+        rest = text[pos:]
+        start = rest.rfind("<")
+        if start != -1 and ">" not in rest[start:] and len(rest) - start <= MAX_TAG_LENGTH:
+            # Possibly a tag cut in half by the chunk boundary; wait for the rest of it
+            self._append(rest[:start])
+            self._tail = rest[start:]
+        else:
+            self._append(rest)
+            self._tail = ""
+        return finished
+
+    def close(self) -> List[TagElement]:
+        """End of input: flush pending text and return elements that were never closed"""
+        self._append(self._tail)
+        self._tail = ""
+        finished = []
+        while self._open:
+            finished.append(self._finish(self._open.pop(), closed=False))
+        self._open_tags.clear()
+        return finished
+
+    def find_all(self, tag: str) -> List[TagElement]:
+        return [e for e in self.elements if e.tag == tag.lower()]
+
+    def first(self, tag: str) -> Optional[TagElement]:
+        return next((e for e in self.elements if e.tag == tag.lower()), None)
+
+    def first_text(self, tag: str, default: str = "") -> str:
+        element = self.first(tag)
+        return element.text if element is not None else default
+
+    def tasks(self) -> List[Dict]:
+        """Parsed <task> elements (requires TASK_TAGS among the parser's tags)"""
+        tasks = (task_from_element(e) for e in self.find_all("task"))
+        return [t for t in tasks if t is not None]
+
+
+def parse(text: str, tags: Iterable[str]) -> TagParser:
+    """Parse a complete response"""
+    parser = TagParser(tags)
+    parser.feed(text)
+    parser.close()
+    return parser
+
+
+def extract_xml(text: str, tag: str) -> str:
+    """Extract content between XML-style tags (first occurrence, stripped; "" if absent)."""
+    return parse(text, [tag]).first_text(tag)
+
+
+def extract_all(text: str, tags: Iterable[str]) -> Dict[str, List[str]]:
+    """Texts of every occurrence of each tag, collected in one pass"""
+    tags = list(tags)
+    parser = parse(text, tags)
+    return {tag: [e.text for e in parser.find_all(tag)] for tag in tags}
+
+
+TASK_TAGS = ("task", "type", "description", "id", "depends_on")
+
+
+def task_from_element(element: TagElement) -> Optional[Dict]:
+    """Turn a parsed <task> into {"type", "description"}; tasks without a description are dropped.
+
+    Optional <id> and <depends_on> children are added as "id" and a "depends_on" list.
+    """
+    description = element.child_text("description")
+    if not description:
+        return None
+    task = {"type": element.child_text("type") or "default", "description": description}
+    if element.child("id") is not None:
+        task["id"] = element.child_text("id")
+    if element.child("depends_on") is not None:
+        task["depends_on"] = parse_depends_on(element.child_text("depends_on"))
+    return task
+
+
+def parse_tasks(xml: str) -> List[Dict]:
+    """Parses <task> blocks into dictionaries."""
+    return parse(xml, TASK_TAGS).tasks()
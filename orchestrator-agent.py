@@ -1,55 +1,80 @@
+import functools
 import os
-import re
-from typing import List, Dict, Optional
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional
 from dotenv import load_dotenv
 
+from lib.embeddings import Embedder
+from lib.plan_cache import PlanCache, structure_fingerprint
+from lib.rate_limit import estimate_tokens, get_rate_limiter, limited_create
+from lib.resilience import deadline_after, deadline_scope, get_resilience, queue_wait
+from lib.task_graph import assign_task_ids, build_task_graph, find_cycle, task_waves
+from lib.worker_registry import WorkerRegistry
+from lib.xml_tags import TASK_TAGS, TagParser, extract_xml, task_from_element
+from lib.xml_tags import parse as parse_xml
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 # === Setup ===
 load_dotenv()
-client = OpenAI(
-    #base_url = "https://openai.vocareum.com/v1",
-    api_key=os.getenv("OPENAI_API_KEY"))
-  
+
+
+@functools.lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """The OpenAI client, created (and the SDK imported) on first use rather than at import"""
+    from openai import OpenAI
+
+    return OpenAI(
+        #base_url = "https://openai.vocareum.com/v1",
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # Retries are handled by lib.resilience in llm_call, which stops at the worker's time limit
+        max_retries=0
+    )
+
+
+# Worker agents running at the same time, and the time limit for each of them in seconds
+WORKER_CONCURRENCY = int(os.getenv("ORCHESTRATOR_WORKER_CONCURRENCY", "4"))
+WORKER_TIMEOUT = float(os.getenv("ORCHESTRATOR_WORKER_TIMEOUT", "60"))
 
 # === Utility Functions ===
 
-def llm_call(prompt: str, model: str = "gpt-4o-mini") -> str:
-    """Basic LLM call wrapper."""
-    response = client.chat.completions.create(
+def llm_call(prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None) -> str:
+    """Basic LLM call wrapper; transient failures are retried with backoff (lib.resilience)."""
+    options = {"timeout": timeout} if timeout is not None else {}
+    response = get_resilience().call(f"llm:{model}", limited_create, get_client().chat.completions,
         model=model,
         messages=[
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.2
+        temperature=0.2,
+        **options
     )
     return response.choices[0].message.content.strip()
 
-def extract_xml(text: str, tag: str) -> str:
-    """Extract content between XML-style tags."""
-    pattern = rf"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, text, re.DOTALL)
-    return match.group(1).strip() if match else ""
-
-def parse_tasks(xml: str) -> List[Dict]:
-    """Parses <task> XML blocks into dictionaries."""
-    tasks = []
-    current_task = {}
-
-    for line in xml.splitlines():
-        line = line.strip()
-        if line.startswith("<task>"):
-            current_task = {}
-        elif line.startswith("<type>"):
-            current_task["type"] = line[6:-7].strip()
-        elif line.startswith("<description>"):
-            current_task["description"] = line[12:-13].strip()
-        elif line.startswith("</task>"):
-            if "description" in current_task:
-                if "type" not in current_task:
-                    current_task["type"] = "default"
-                tasks.append(current_task)
-    return tasks
+def llm_stream(prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None) -> Iterator[str]:
+    """Streaming LLM call wrapper; yields the response text as it is generated.
+
+    The rate limiter slot is held until the stream is finished (or abandoned).
+    """
+    options = {"timeout": timeout} if timeout is not None else {}
+    payload = dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        stream=True,
+        **options
+    )
+    with get_rate_limiter().slot(estimate_tokens(payload)):
+        stream = get_client().chat.completions.create(**payload)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 # === Worker Agent Base Class ===
 
@@ -58,14 +83,14 @@ class WorkerAgent:
     def __init__(self, task_type: str):
         self.task_type = task_type
 
-    def run(self, original_task: str, task_description: str) -> str:
+    def run(self, original_task: str, task_description: str, timeout: Optional[float] = None) -> str:
         raise NotImplementedError("The 'run' method must be implemented in a subclass.")
 
 # === Worker Agent Implementations ===
 
 class HematologyAgent(WorkerAgent):
     """Worker that analyzes blood cell counts (Complete Blood Count)."""
-    def run(self, original_task: str, task_description: str) -> str:
+    def run(self, original_task: str, task_description: str, timeout: Optional[float] = None) -> str:
         prompt = f"""
 You are a hematology analysis expert. Your task is to interpret the blood count section of a lab report.
 
@@ -79,13 +104,13 @@ Return your response in the following format:
 </response>
 """
 
-        raw_output = llm_call(prompt)
+        raw_output = llm_call(prompt, timeout=timeout)
         print("\n[Raw Hematology Output]\n", raw_output)
         return extract_xml(raw_output, "response")
 
 class RenalFunctionAgent(WorkerAgent):
     """Worker that analyzes kidney function markers."""
-    def run(self, original_task: str, task_description: str) -> str:
+    def run(self, original_task: str, task_description: str, timeout: Optional[float] = None) -> str:
         prompt = f"""
 You are a renal function analysis expert. Your task is to interpret the kidney-related markers from a lab report.
 
@@ -98,13 +123,13 @@ Return your response in the following format:
 - Briefly note the potential clinical significance of any abnormalities.
 </response>
 """
-        raw_output = llm_call(prompt)
+        raw_output = llm_call(prompt, timeout=timeout)
         print("\n[Raw Renal Function Output]\n", raw_output)
         return extract_xml(raw_output, "response")
 
 class LiverFunctionAgent(WorkerAgent):
     """Worker that analyzes liver enzyme markers."""
-    def run(self, original_task: str, task_description: str) -> str:
+    def run(self, original_task: str, task_description: str, timeout: Optional[float] = None) -> str:
         prompt = f"""
 You are a liver function analysis expert. Your task is to interpret the liver enzyme section of a lab report.
 
@@ -117,15 +142,55 @@ Return your response in the following format:
 - Briefly note the potential clinical significance of any abnormalities.
 </response>
 """
-        raw_output = llm_call(prompt)
+        raw_output = llm_call(prompt, timeout=timeout)
         print("\n[Raw Liver Function Output]\n", raw_output)
         return extract_xml(raw_output, "response")
 
+# === Worker Registry ===
+
+def build_worker_registry(embed_fn=None) -> WorkerRegistry:
+    """One shared instance per worker type; workers keep no per-task state."""
+    if embed_fn is None:
+        embed_fn = Embedder(api_key=os.getenv("OPENAI_API_KEY")).embed
+    registry = WorkerRegistry(embed_fn=embed_fn)
+    registry.register(
+        "hematology", HematologyAgent("hematology"),
+        aliases=["haematology", "cbc", "complete blood count", "blood count"],
+        description=HematologyAgent.__doc__,
+    )
+    registry.register(
+        "renal", RenalFunctionAgent("renal"),
+        aliases=["kidney", "renal function", "kidney function", "nephrology", "bmp"],
+        description=RenalFunctionAgent.__doc__,
+    )
+    registry.register(
+        "liver", LiverFunctionAgent("liver"),
+        aliases=["hepatic", "liver function", "lft", "lfts", "hepatology"],
+        description=LiverFunctionAgent.__doc__,
+    )
+    return registry
+
 # === Orchestrator ===
 
 class Orchestrator:
-    def __init__(self, orchestrator_prompt: str):
+    """Plans subtasks with one LLM call, then runs their workers concurrently.
+
+    Args:
+        orchestrator_prompt: Planning prompt template with a ``{task}`` placeholder
+        max_concurrency: Worker agents running at the same time
+        worker_timeout: Time limit for each worker in seconds (None = no limit)
+        registry: Task type -> worker mapping (defaults to build_worker_registry())
+        plan_cache: Reuse plans for inputs with the same structure (None = always plan)
+    """
+    def __init__(self, orchestrator_prompt: str, max_concurrency: int = WORKER_CONCURRENCY,
+                 worker_timeout: Optional[float] = WORKER_TIMEOUT, registry: Optional[WorkerRegistry] = None,
+                 plan_cache: Optional[PlanCache] = None):
         self.orchestrator_prompt = orchestrator_prompt
+        self.registry = registry or build_worker_registry()
+        self.plan_cache = plan_cache
+        self.max_concurrency = max_concurrency
+        self.worker_timeout = worker_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="orchestrator-worker")
 
     ############################################################################
     ##                                                                        ##
@@ -136,49 +201,235 @@ class Orchestrator:
     ##  instance of the correct specialized worker agent.                     ##
     ##                                                                        ##
     ############################################################################
-    def get_worker(self, task_type: str) -> WorkerAgent:
-        """Inspects the task type and returns the correct specialized agent."""
-        type_lower = task_type.lower()
-        
-        if "hematology" in type_lower:
-            return HematologyAgent(task_type)
-        elif "renal" in type_lower:
-            return RenalFunctionAgent(task_type)
-        elif "liver" in type_lower:
-            return LiverFunctionAgent(task_type)
-
-        # If no match is found, it's good practice to raise an error.
-        raise ValueError(f"No worker agent configured for task type: {task_type}")
-
-    def process(self, task: str) -> Dict:
-        """Runs the full Orchestrator-Workers workflow."""
+    def get_worker(self, task_type: str, task_description: str = "") -> WorkerAgent:
+        """Inspects the task type and returns the correct specialized agent.
+
+        Known types and aliases are a dictionary lookup; unknown ones fall back to
+        embedding similarity with the task description. Raises ValueError if
+        nothing matches.
+        """
+        return self.registry.get(task_type, task_description)
+
+    def process(self, task: str, stream: bool = False, replan: bool = False) -> Dict:
+        """Runs the full Orchestrator-Workers workflow.
+
+        With ``stream=True`` the plan is read as it is generated and every task is
+        dispatched to its worker the moment its closing </task> tag arrives, so
+        workers start while the planner is still writing the remaining tasks.
+
+        With a plan cache, an input with the same structure as an earlier one
+        (same panels and analytes, any values) reuses that plan's task skeleton and
+        skips the planning call; ``replan=True`` plans afresh and replaces the cached
+        plan. The cached plan's analysis was written for another report, so a cache
+        hit returns ``analysis=None`` with ``plan_cached=True``.
+        """
+        plan_key = None
+        if self.plan_cache is not None:
+            plan_key = structure_fingerprint(task, self.orchestrator_prompt)
+            cached = None
+            if replan:
+                self.plan_cache.record_forced()
+            else:
+                cached = self.plan_cache.get(plan_key)
+            if cached is not None:
+                print(f"\n=== CACHED PLAN ({plan_key}) ===")
+                print("Parsed Tasks:", cached["tasks"])
+                results = self.run_workers(task, cached["tasks"])
+                return {"analysis": None, "worker_results": results, "plan_cached": True}
+
+        if stream:
+            return self._process_streaming(task, plan_key)
+
         orchestrator_input = self.orchestrator_prompt.format(task=task)
         response = llm_call(orchestrator_input)
         print("\n[Raw Orchestrator Output]\n", response)
 
-        analysis = extract_xml(response, "analysis")
-        tasks_xml = extract_xml(response, "tasks")
-        tasks = parse_tasks(tasks_xml)
+        plan = parse_xml(response, ("analysis",) + TASK_TAGS)
+        analysis = plan.first_text("analysis")
+        tasks = plan.tasks()
 
         print("\n=== ORCHESTRATOR ANALYSIS & PLAN ===")
         print("Analysis:", analysis)
         print("Parsed Tasks:", tasks)
+        self._cache_plan(plan_key, tasks)
+
+        results = self.run_workers(task, tasks)
+        return {"analysis": analysis, "worker_results": results, "plan_cached": False}
+
+    def _cache_plan(self, plan_key: Optional[str], tasks: List[Dict]):
+        # An empty plan is more likely a bad completion than a real plan, so it is not kept
+        if plan_key is not None and tasks:
+            self.plan_cache.put(plan_key, {"tasks": _plan_skeleton(tasks)})
+
+    def _process_streaming(self, task: str, plan_key: Optional[str] = None) -> Dict:
+        orchestrator_input = self.orchestrator_prompt.format(task=task)
+        parser = TagParser(("analysis",) + TASK_TAGS)
+        tasks, started = [], {}
+        for chunk in llm_stream(orchestrator_input):
+            for element in parser.feed(chunk):
+                task_info = task_from_element(element) if element.tag == "task" else None
+                if not task_info:
+                    continue
+                tasks.append(task_info)
+                # Tasks that need upstream results wait for the full plan
+                if not task_info.get("depends_on"):
+                    print(f"\n[Dispatching {task_info['type']} while planning continues]")
+                    started[len(tasks) - 1] = self.dispatch(task, task_info)
+        parser.close()
+        print("\n[Raw Orchestrator Output]\n", parser.text)
+
+        analysis = parser.first_text("analysis")
+        print("\n=== ORCHESTRATOR ANALYSIS & PLAN ===")
+        print("Analysis:", analysis)
+        print("Parsed Tasks:", tasks)
+        self._cache_plan(plan_key, tasks)
+
+        results = self.run_workers(task, tasks, started)
+        return {"analysis": analysis, "worker_results": results, "plan_cached": False}
+
+    def _run_worker(self, agent: WorkerAgent, task: str, task_info: Dict) -> Dict:
+        start = time.perf_counter()
+        result = _task_result(task_info)
+        # The worker's time limit also covers its retries, so a worker collect() has given up on stops retrying
+        stop_at = deadline_after(self.worker_timeout)
+        try:
+            description = task_info["description"] + task_info.get("upstream_results", "")
+            with deadline_scope(stop_at):
+                result["result"] = agent.run(task, description, timeout=self.worker_timeout)
+        except Exception as e:
+            result["result"] = ""
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["elapsed"] = time.perf_counter() - start
+        self.registry.record(task_info["type"], result["elapsed"], ok="error" not in result)
+        return result
+
+    def dispatch(self, task: str, task_info: Dict):
+        """Start the worker for one planned task; returns (task_info, future), or None if no worker matches."""
+        try:
+            agent = self.get_worker(task_info["type"], task_info["description"])
+        except ValueError as e:
+            print(f"\n--- ERROR --- \n{e}")
+            return None
+        return task_info, self.executor.submit(self._run_worker, agent, task, task_info)
+
+    def collect(self, jobs: List) -> List[Dict]:
+        """Wait for dispatched workers and return their results in plan order.
+
+        A worker that fails, or has no result once its time limit has passed, is
+        returned with an ``error`` instead of its ``result``.
+        """
+        # Workers queued behind the concurrency cap get their own full time limit
+        deadline = queue_wait(len(jobs), self.max_concurrency, self.worker_timeout) if jobs else None
+        wait([future for _, future in jobs], timeout=deadline)
 
         results = []
-        for task_info in tasks:
-            try:
-                agent = self.get_worker(task_info["type"])
-                result = agent.run(task, task_info["description"])
-                print(f"\n=== {task_info['type'].upper()} RESULT ===\n{result}")
-                results.append({
-                    "type": task_info["type"],
-                    "description": task_info["description"],
-                    "result": result
-                })
-            except ValueError as e:
-                print(f"\n--- ERROR --- \n{e}")
-
-        return {"analysis": analysis, "worker_results": results}
+        for task_info, future in jobs:
+            if future.done():
+                result = future.result()
+            else:
+                future.cancel()
+                result = _task_result(task_info, error=f"TimeoutError: no result within {self.worker_timeout}s")
+            if "error" in result:
+                print(f"\n--- ERROR ({result['type']}) --- \n{result['error']}")
+            else:
+                print(f"\n=== {result['type'].upper()} RESULT ===\n{result['result']}")
+            results.append(result)
+        return results
+
+    def run_workers(self, task: str, tasks: List[Dict], started: Optional[Dict[int, tuple]] = None) -> List[Dict]:
+        """Run the planned tasks and return their results in plan order.
+
+        Without dependencies all tasks are dispatched at once. Tasks are skipped
+        when no worker matches them.
+
+        Args:
+            started: Jobs already dispatched (while the plan streamed), by task index
+        """
+        started = started or {}
+        if not any(t.get("depends_on") for t in tasks):
+            jobs = [started[i] if i in started else self.dispatch(task, t) for i, t in enumerate(tasks)]
+            return self.collect([job for job in jobs if job])
+        return self._run_task_graph(task, tasks, started)
+
+    def _run_task_graph(self, task: str, tasks: List[Dict], started: Dict[int, tuple]) -> List[Dict]:
+        """Run tasks in dependency waves, passing upstream results into downstream prompts.
+
+        Tasks on a dependency cycle (or downstream of one) are not run and come
+        back with an ``error`` naming the cycle.
+        """
+        ids = assign_task_ids(tasks)
+        by_id = dict(zip(ids, tasks))
+        started_by_id = {ids[i]: job for i, job in started.items()}
+        graph, unknown = build_task_graph(tasks)
+        for reference in unknown:
+            print(f"\n[Warning] Ignoring unknown dependency {reference}")
+
+        waves, blocked = task_waves(graph)
+        results: Dict[str, Dict] = {}
+        if blocked:
+            cycle = " -> ".join(find_cycle(graph, blocked))
+            print(f"\n--- ERROR --- \nDependency cycle in plan: {cycle}")
+            for task_id in blocked:
+                results[task_id] = _task_result(by_id[task_id], error=f"Dependency cycle: {cycle}")
+        print("Execution waves:", waves)
+
+        for wave in waves:
+            jobs = []
+            for task_id in wave:
+                if task_id in started_by_id:
+                    job = started_by_id[task_id]
+                else:
+                    task_info = dict(by_id[task_id], upstream_results=_upstream_context(graph[task_id], results))
+                    job = self.dispatch(task, task_info)
+                if job:
+                    jobs.append((task_id, job))
+            for (task_id, _), result in zip(jobs, self.collect([job for _, job in jobs])):
+                results[task_id] = result
+
+        return [results[task_id] for task_id in ids if task_id in results]
+
+
+def _plan_skeleton(tasks: List[Dict]) -> List[Dict]:
+    """The tasks without anything specific to the report they were planned for.
+
+    The plan cache matches reports with different values, so a description that
+    quotes a value is replaced by a generic one for its panel type.
+    """
+    skeleton = []
+    for task_info in tasks:
+        entry = {key: task_info[key] for key in ("id", "type", "depends_on") if key in task_info}
+        description = task_info["description"]
+        entry["description"] = (f"Interpret the {task_info['type']} panel of the lab report."
+                                if any(c.isdigit() for c in description) else description)
+        skeleton.append(entry)
+    return skeleton
+
+
+def _task_result(task_info: Dict, error: Optional[str] = None) -> Dict:
+    """Result record for a task, optionally already failed with ``error``"""
+    result = {"type": task_info["type"], "description": task_info["description"]}
+    if "id" in task_info:
+        result["id"] = task_info["id"]
+    if error is not None:
+        result["result"] = ""
+        result["error"] = error
+    return result
+
+
+def _upstream_context(dependencies: List[str], results: Dict[str, Dict]) -> str:
+    """Prompt text with the results of the tasks a task depends on"""
+    if not dependencies:
+        return ""
+    sections = []
+    for task_id in dependencies:
+        upstream = results.get(task_id)
+        if upstream is None:
+            sections.append(f"[{task_id}]\n(not run: no worker available)")
+        elif "error" in upstream:
+            sections.append(f"[{task_id}]\n(failed: {upstream['error']})")
+        else:
+            sections.append(f"[{task_id}]\n{upstream['result']}")
+    return "\n\nResults of the tasks this one depends on:\n" + "\n\n".join(sections)
 
 # === Prompt Template for Orchestrator ===
 
@@ -195,8 +446,10 @@ Provide a high-level summary of the lab panels present and the overall goal of t
 
 <tasks>
 Provide one <task> entry for each major lab panel found in the data. Each task must have a <type> and a <description>.
+Give each task a short <id>. Only if a task genuinely needs the findings of other tasks, list their ids in a <depends_on> element (e.g. <depends_on>cbc</depends_on>, comma-separated for several); tasks without <depends_on> run in parallel.
 Example task format:
 <task>
+  <id>cbc</id>
   <type>hematology</type>
   <description>Analyze the Complete Blood Count (CBC) panel, including RBC, WBC, and platelets.</description>
 </task>
@@ -208,7 +461,7 @@ Task: {task}
 
 # === Main Runner ===
 
-if __name__ == "__main__":
+def main():
     lab_results_data = """
     Patient Lab Report:
     - Panel: Complete Blood Count (CBC)
@@ -225,12 +478,19 @@ if __name__ == "__main__":
     
     user_prompt = f"Please interpret the following lab results and provide a summary: {lab_results_data}"
 
-    orchestrator = Orchestrator(orchestrator_prompt)
-    final_report = orchestrator.process(user_prompt)
+    orchestrator = Orchestrator(orchestrator_prompt, plan_cache=PlanCache(ttl_seconds=24 * 3600))
+    final_report = orchestrator.process(user_prompt, stream=os.getenv("ORCHESTRATOR_STREAM_PLAN") == "1")
 
     print("\n\n=== FINAL INTERPRETATION REPORT ===")
-    print("Overall Analysis:\n", final_report.get("analysis", "N/A"))
+    print("Overall Analysis:\n", final_report.get("analysis") or "N/A (plan reused from the plan cache)")
     for r in final_report.get("worker_results", []):
         print(f"\n--- {r['type'].upper()} PANEL ---")
         print("Task Description:", r["description"])
-        print("Interpretation:\n", r["result"])
\ No newline at end of file
+        print("Interpretation:\n", r["result"])
+
+    print("\n=== WORKER STATS ===")
+    print(orchestrator.registry.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,115 @@
+import functools
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
 import threading
-import re  
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+from dotenv import load_dotenv
+from lib.clauses import ContractShard, contract_outline, shard_contract
+from lib.rate_limit import limited_create
+from lib.resilience import deadline_after, deadline_scope, get_resilience, queue_wait
+from lib.usage import UsageTracker
+from lib.xml_tags import extract_xml
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
-# Load environment variables and initialize OpenAI client
+# Load environment variables; the OpenAI client is created on first use
 load_dotenv()
-client = OpenAI(
-    #base_url = "https://openai.vocareum.com/v1",
-    api_key=os.getenv("OPENAI_API_KEY"))
 
-# Thread lock for thread-safe operations
-outputs_lock = threading.Lock()
 
-def llm_call(prompt: str, model: str = "gpt-4o-mini") -> str:
-    """Basic LLM call wrapper."""
-    response = client.chat.completions.create(
+@functools.lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """The OpenAI client, created (and the SDK imported) on first use rather than at import"""
+    from openai import OpenAI
+
+    return OpenAI(
+        #base_url = "https://openai.vocareum.com/v1",
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # Retries are handled by lib.resilience in llm_call
+        max_retries=0
+    )
+
+
+# Global cap on agent LLM calls in flight, shared by every analyze_contract call
+MAX_CONCURRENT_AGENT_CALLS = int(os.getenv("CONTRACT_AGENT_CONCURRENCY", "8"))
+# Per-agent time limit in seconds
+AGENT_TIMEOUT = float(os.getenv("CONTRACT_AGENT_TIMEOUT", "120"))
+# Contracts longer than this many characters (~6k tokens) are split into clause shards
+SHARD_MAX_CHARS = int(os.getenv("CONTRACT_SHARD_MAX_CHARS", "24000"))
+
+# Print each agent's raw output as it arrives (batch runs turn this off)
+verbose = os.getenv("CONTRACT_AGENT_VERBOSE", "1") != "0"
+
+# Token usage of every agent call, including prompt tokens served from the provider's prefix cache
+usage_tracker = UsageTracker()
+
+# Set on agent_executor's threads, whose own calls must not queue behind themselves in the bounded pool
+_agent_thread = threading.local()
+
+
+def _mark_agent_thread():
+    _agent_thread.active = True
+
+
+def _new_agent_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contract-agent",
+                              initializer=_mark_agent_thread)
+
+
+agent_concurrency_limit = MAX_CONCURRENT_AGENT_CALLS
+agent_executor = _new_agent_executor(agent_concurrency_limit)
+
+
+def set_concurrency_limit(max_workers: int):
+    """Replace the shared agent executor with one of a different size."""
+    global agent_executor, agent_concurrency_limit
+    previous = agent_executor
+    agent_concurrency_limit = max_workers
+    agent_executor = _new_agent_executor(max_workers)
+    previous.shutdown(wait=False)
+
+
+def _submit(fn, *args) -> Future:
+    """Run ``fn`` on agent_executor, or inline when already on one of its threads.
+
+    A task waiting on futures it submitted to its own bounded pool deadlocks once
+    every thread is such a task, so nested calls run in the caller's thread.
+    """
+    if not getattr(_agent_thread, "active", False):
+        return agent_executor.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def llm_call(prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None,
+             label: str = "llm_call") -> str:
+    """Basic LLM call wrapper. Token usage is recorded in ``usage_tracker`` under ``label``.
+
+    Transient failures are retried with backoff (lib.resilience), so one 5xx does not fail the agent.
+    """
+    options = {"timeout": timeout} if timeout is not None else {}
+    response = get_resilience().call(f"llm:{model}", limited_create, get_client().chat.completions,
         model=model,
         messages=[
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.2
+        temperature=0.2,
+        **options
     )
+    usage_tracker.record(label, response.usage)
     return response.choices[0].message.content.strip()
 
-def extract_xml(text: str, tag: str) -> str:
-    """Extract content between XML-style tags."""
-    pattern = rf"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, text, re.DOTALL)
-    return match.group(1).strip() if match else ""
-
- 
+def show_raw_output(agent_title: str, raw_output: str):
+    if verbose:
+        print(f"\n[Raw {agent_title} Output]\n", raw_output)
 
 # Example contract text (in a real application, this would be loaded from a file)
 contract_text = """
@@ -64,154 +142,280 @@ IN WITNESS WHEREOF, the parties have executed this Agreement as of the date firs
 
 # Agent classes for contract analysis
 
+def contract_prefix(contract_text):
+    """Leading prompt block shared byte-for-byte by every agent working on a contract.
+
+    Providers cache prompt prefixes (OpenAI from 1024 tokens), so putting the contract
+    first and the role instructions after it lets every call after the first reuse
+    the contract tokens instead of paying for them again.
+    """
+    return f"Contract Text:\n{contract_text.strip()}\n\n"
+
+
 class LegalTermsChecker:
     """Agent that checks for problematic legal terms and clauses in contracts."""
-    def run(self, contract_text):
-        prompt = f"""
-        You are a legal terms checker. Your task is to analyze the following contract text and check for problematic legal terms and clauses.
-        
-        Contract Text:
-        {contract_text}
-        
-        Return your response in the following format:
-        <response>
-        - Identify any problematic legal terms and clauses.
-        - Provide a brief explanation for each problematic term or clause.
-        - Suggest alternative terms or clauses that are more compliant with the law.
-        </response>
-        """
-        raw_output = llm_call(prompt)
-        print("\n[Raw Legal Terms Checker Output]\n", raw_output)
+    def run(self, contract_text, timeout=None):
+        prompt = contract_prefix(contract_text) + """You are a legal terms checker. Your task is to analyze the contract text above and check for problematic legal terms and clauses.
+
+Return your response in the following format:
+<response>
+- Identify any problematic legal terms and clauses.
+- Provide a brief explanation for each problematic term or clause.
+- Suggest alternative terms or clauses that are more compliant with the law.
+</response>
+"""
+        raw_output = llm_call(prompt, timeout=timeout, label="legal_terms")
+        show_raw_output("Legal Terms Checker", raw_output)
         return extract_xml(raw_output, "response")
 
 class ComplianceValidator:
     """Agent that validates regulatory and industry compliance of contracts."""
-    def run(self, contract_text):
-        prompt = f"""
-        You are a compliance validator. Your task is to analyze the following contract text and check for regulatory and industry compliance.
-        
-        Contract Text:
-        {contract_text}
-        
-        Return your response in the following format:
-        <response>
-        - Identify any regulatory or industry compliance issues.
-        - Provide a brief explanation for each compliance issue.
-        - Suggest alternative terms or clauses that are more compliant with the law.
-        </response>
-        """
-        raw_output = llm_call(prompt)
-        print("\n[Raw Compliance Validator Output]\n", raw_output)
+    def run(self, contract_text, timeout=None):
+        prompt = contract_prefix(contract_text) + """You are a compliance validator. Your task is to analyze the contract text above and check for regulatory and industry compliance.
+
+Return your response in the following format:
+<response>
+- Identify any regulatory or industry compliance issues.
+- Provide a brief explanation for each compliance issue.
+- Suggest alternative terms or clauses that are more compliant with the law.
+</response>
+"""
+        raw_output = llm_call(prompt, timeout=timeout, label="compliance")
+        show_raw_output("Compliance Validator", raw_output)
         return extract_xml(raw_output, "response")
 
 class FinancialRiskAssessor:
     """Agent that assesses financial risks and liabilities in contracts."""
-    def run(self, contract_text):
-        prompt = f"""
-        You are a financial risk assessor. Your task is to analyze the following contract text and assess the financial risks and liabilities.
-        
-        Contract Text:
-        {contract_text}
-        
-        Return your response in the following format:
-        <response>
-        - Identify any financial risks or liabilities.
-        - Provide a brief explanation for each financial risk or liability.
-        - Suggest alternative terms or clauses that are more compliant with the law.
-        </response>
-        """
-        raw_output = llm_call(prompt)
-        print("\n[Raw Financial Risk Assessor Output]\n", raw_output)
+    def run(self, contract_text, timeout=None):
+        prompt = contract_prefix(contract_text) + """You are a financial risk assessor. Your task is to analyze the contract text above and assess the financial risks and liabilities.
+
+Return your response in the following format:
+<response>
+- Identify any financial risks or liabilities.
+- Provide a brief explanation for each financial risk or liability.
+- Suggest alternative terms or clauses that are more compliant with the law.
+</response>
+"""
+        raw_output = llm_call(prompt, timeout=timeout, label="financial_risk")
+        show_raw_output("Financial Risk Assessor", raw_output)
         return extract_xml(raw_output, "response")
 
 
 class SummaryAgent:
     """Agent that synthesizes findings from all specialized agents."""
-    def run(self, contract_text, inputs):
+    def run(self, contract_text, inputs, timeout=None):
         legal_terms_output = inputs[0] if len(inputs) > 0 else ""
         compliance_output = inputs[1] if len(inputs) > 1 else ""
         financial_risk_output = inputs[2] if len(inputs) > 2 else ""
         
-        prompt = f"""
-        You are a summary agent. Your task is to synthesize the findings from all specialized agents and create a comprehensive summary.
-        
-        Contract Text:
-        {contract_text}
-        
-        Legal Terms Checker Findings:
-        {legal_terms_output}
-        
-        Compliance Validator Findings:
-        {compliance_output}
-        
-        Financial Risk Assessor Findings:
-        {financial_risk_output}
-        
-        Return your response in the following format:
-        <response>
-        - Summarize the findings from all specialized agents.
-        - Provide a brief explanation for each finding.
-        - Suggest alternative terms or clauses that are more compliant with the law.
-        </response>
-        """
-        raw_output = llm_call(prompt)
-        print("\n[Raw Summary Agent Output]\n", raw_output)
+        prompt = contract_prefix(contract_text) + f"""You are a summary agent. Your task is to synthesize the findings from all specialized agents on the contract text above and create a comprehensive summary.
+
+Legal Terms Checker Findings:
+{legal_terms_output}
+
+Compliance Validator Findings:
+{compliance_output}
+
+Financial Risk Assessor Findings:
+{financial_risk_output}
+
+Return your response in the following format:
+<response>
+- Summarize the findings from all specialized agents.
+- Provide a brief explanation for each finding.
+- Suggest alternative terms or clauses that are more compliant with the law.
+</response>
+"""
+        raw_output = llm_call(prompt, timeout=timeout, label="summary")
+        show_raw_output("Summary Agent", raw_output)
         return extract_xml(raw_output, "response")
 
+@dataclass
+class AgentResult:
+    """Outcome of one specialist run."""
+    name: str
+    output: str = ""
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_summary_input(self) -> str:
+        """Text handed to the SummaryAgent; failures are flagged rather than silently dropped."""
+        if self.ok:
+            return self.output
+        return f"[No findings: the {self.name} agent failed ({self.error})]"
+
+
+# Specialists run for every contract, in the order SummaryAgent expects their findings
+SPECIALISTS = {
+    "legal_terms": LegalTermsChecker,
+    "compliance": ComplianceValidator,
+    "financial_risk": FinancialRiskAssessor,
+}
+
+
+def _run_agent(name, agent, contract_text, timeout, stop_at=None):
+    """Run one specialist, capturing its failure instead of raising.
+
+    ``stop_at`` (``time.monotonic()``) is when the caller stops waiting for the result;
+    the agent's calls are not retried or hedged past it.
+    """
+    start = time.perf_counter()
+    try:
+        with deadline_scope(stop_at):
+            output = agent.run(contract_text, timeout=timeout)
+        return AgentResult(name, output=output, elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return AgentResult(name, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+
+
+def reduce_findings(name, shards: List[ContractShard], shard_results: List[AgentResult]) -> AgentResult:
+    """Merge one specialist's per-shard findings into a single result.
+
+    Findings are kept under their shard label, repeated lines are dropped, and
+    shards that failed are listed so the summary knows what was not covered.
+    """
+    if len(shard_results) == 1:
+        return shard_results[0]
+
+    sections, failures, seen = [], [], set()
+    for shard, result in zip(shards, shard_results):
+        if not result.ok:
+            failures.append(f"{shard.label}: {result.error}")
+            continue
+        lines = []
+        for line in result.output.splitlines():
+            key = line.strip()
+            if key and key not in seen:
+                seen.add(key)
+                lines.append(line)
+        if lines:
+            sections.append(f"[{shard.label}]\n" + "\n".join(lines))
+
+    elapsed = max(r.elapsed for r in shard_results)
+    if len(failures) == len(shard_results):
+        return AgentResult(name, error="; ".join(failures), elapsed=elapsed)
+    output = "\n\n".join(sections)
+    if failures:
+        output += "\n\n[Not analyzed: " + "; ".join(failures) + "]"
+    return AgentResult(name, output=output, elapsed=elapsed)
+
+
+def run_specialists(contract_text, timeout=AGENT_TIMEOUT, shard_max_chars=SHARD_MAX_CHARS) -> Dict[str, AgentResult]:
+    """Run all specialists on the shared executor.
+
+    Contracts longer than ``shard_max_chars`` are split into clause shards and every
+    specialist runs over every shard in parallel (map), then each specialist's
+    shard findings are merged (reduce).
+
+    Each agent request is limited to ``timeout`` seconds. Calls still without a
+    result once the executor should have drained (e.g. stuck in the queue behind
+    other contracts) are cancelled and reported as timed out. Called from a task
+    already running on ``agent_executor``, the specialists run one after another
+    in that task's thread.
+    """
+    shards = shard_contract(contract_text, shard_max_chars)
+    deadline = queue_wait(len(SPECIALISTS) * len(shards), agent_concurrency_limit, timeout)
+    stop_at = deadline_after(deadline)
+    futures = {
+        (name, i): _submit(_run_agent, name, agent_cls(), shard.text, timeout, stop_at)
+        for name, agent_cls in SPECIALISTS.items()
+        for i, shard in enumerate(shards)
+    }
+    wait(futures.values(), timeout=deadline)
+
+    shard_results = {}
+    for (name, i), future in futures.items():
+        if future.done():
+            shard_results[(name, i)] = future.result()
+        else:
+            future.cancel()
+            shard_results[(name, i)] = AgentResult(name, error=f"TimeoutError: no result within {timeout}s")
+
+    return {
+        name: reduce_findings(name, shards, [shard_results[(name, i)] for i in range(len(shards))])
+        for name in SPECIALISTS
+    }
+
+
+def summarize(contract_text, results: Dict[str, AgentResult], timeout=AGENT_TIMEOUT,
+              shard_max_chars=SHARD_MAX_CHARS) -> str:
+    """Run the summary agent over the collected specialist results.
+
+    Sharded contracts are too long to repeat, so the summary sees their outline
+    (preamble and clause headings) instead of the full text.
+    """
+    if verbose:
+        for result in results.values():
+            if not result.ok:
+                print(f"\n[Warning] {result.name} agent failed: {result.error}")
+    inputs = [results[name].as_summary_input() for name in SPECIALISTS]
+    context = contract_text if len(contract_text) <= shard_max_chars else contract_outline(contract_text)
+    return SummaryAgent().run(context, inputs, timeout=timeout)
+
+
+@dataclass
+class ContractAnalysis:
+    """Summary of one contract together with the specialist results it was built from."""
+    summary: str
+    results: Dict[str, AgentResult]
+    shards: int = 1
+
+
+def analyze_contract_detailed(contract_text, timeout=AGENT_TIMEOUT, shard_max_chars=SHARD_MAX_CHARS) -> ContractAnalysis:
+    """Like analyze_contract, but also returns the per-specialist results."""
+    results = run_specialists(contract_text, timeout=timeout, shard_max_chars=shard_max_chars)
+    summary = _submit(summarize, contract_text, results, timeout, shard_max_chars).result()
+    return ContractAnalysis(summary, results, len(shard_contract(contract_text, shard_max_chars)))
+
+
 # Main function to run all agents in parallel
-def analyze_contract(contract_text):
+def analyze_contract(contract_text, timeout=AGENT_TIMEOUT, shard_max_chars=SHARD_MAX_CHARS):
     """Run all agents in parallel and summarize their findings."""
-    # Local dictionary for thread-safe collection of agent outputs
-    agent_outputs = {}
-    
-    legal_terms_checker = LegalTermsChecker()
-    compliance_validator = ComplianceValidator()
-    financial_risk_assessor = FinancialRiskAssessor()
-    summary_agent = SummaryAgent()
-
-    # Wrapper functions to capture results in thread-safe manner
-    def run_legal_terms_checker():
-        result = legal_terms_checker.run(contract_text)
-        with outputs_lock:
-            agent_outputs['legal_terms'] = result
-    
-    def run_compliance_validator():
-        result = compliance_validator.run(contract_text)
-        with outputs_lock:
-            agent_outputs['compliance'] = result
-    
-    def run_financial_risk_assessor():
-        result = financial_risk_assessor.run(contract_text)
-        with outputs_lock:
-            agent_outputs['financial_risk'] = result
-
-    # Start all agent threads
-    legal_terms_checker_thread = threading.Thread(target=run_legal_terms_checker)
-    compliance_validator_thread = threading.Thread(target=run_compliance_validator)
-    financial_risk_assessor_thread = threading.Thread(target=run_financial_risk_assessor)
-   
-    legal_terms_checker_thread.start()
-    compliance_validator_thread.start()
-    financial_risk_assessor_thread.start()
-   
-    # Wait for all threads to complete
-    legal_terms_checker_thread.join()
-    compliance_validator_thread.join()
-    financial_risk_assessor_thread.join()
-
-    # Collect results from thread-safe dictionary
-    legal_terms_checker_output = agent_outputs.get('legal_terms', '')
-    compliance_validator_output = agent_outputs.get('compliance', '')
-    financial_risk_assessor_output = agent_outputs.get('financial_risk', '')
-
-    # Run summary agent with collected outputs
-    summary_agent_output = summary_agent.run(contract_text, [legal_terms_checker_output, compliance_validator_output, financial_risk_assessor_output])
-    return summary_agent_output
+    return analyze_contract_detailed(contract_text, timeout=timeout, shard_max_chars=shard_max_chars).summary
 
-if __name__ == "__main__":
+
+async def analyze_contract_async(contract_text, timeout=AGENT_TIMEOUT, shard_max_chars=SHARD_MAX_CHARS):
+    """Asyncio version of analyze_contract that shares the same bounded executor.
+
+    Specialists exceeding ``timeout`` are cancelled and reported as failures, so
+    the summary is still produced from the agents that succeeded.
+    """
+    loop = asyncio.get_running_loop()
+    shards = shard_contract(contract_text, shard_max_chars)
+    deadline = queue_wait(len(SPECIALISTS) * len(shards), agent_concurrency_limit, timeout)
+    stop_at = deadline_after(deadline)
+
+    async def run_one(name, agent_cls, shard):
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(agent_executor, _run_agent, name, agent_cls(), shard.text, timeout, stop_at),
+                timeout=deadline,
+            )
+        except asyncio.TimeoutError:
+            return AgentResult(name, error=f"TimeoutError: no result within {timeout}s")
+
+    pending = {
+        name: asyncio.gather(*(run_one(name, agent_cls, shard) for shard in shards))
+        for name, agent_cls in SPECIALISTS.items()
+    }
+    results = {name: reduce_findings(name, shards, await shard_results) for name, shard_results in pending.items()}
+    return await loop.run_in_executor(agent_executor, summarize, contract_text, results, timeout, shard_max_chars)
+
+
+def main():
     print("Enterprise Contract Analysis System")
     print("Analyzing contract...")
     
     final_analysis = analyze_contract(contract_text)
     print("\n=== FINAL CONTRACT ANALYSIS ===\n")
-    print(final_analysis)
\ No newline at end of file
+    print(final_analysis)
+    print("\n=== TOKEN USAGE ===\n")
+    print(usage_tracker.report())
+
+
+if __name__ == "__main__":
+    main()
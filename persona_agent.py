@@ -1,7 +1,8 @@
 # TODO: 1 - Import the AugmentedPromptAgent class
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from lib.rate_limit import limited_create
 
 persona = "You are a college professor; your answers always start with: 'Dear students,'"
 
@@ -14,10 +15,11 @@ class AugmentedPromptAgent:
 
     def respond(self, input_text):
         """Generate a response using OpenAI API."""
+        from openai import OpenAI
         client = OpenAI(api_key=self.openai_api_key)
 
         # TODO: 2 - Declare a variable 'response' that calls OpenAI's API for a chat completion.
-        response = client.chat.completions.create(
+        response = limited_create(client.chat.completions,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"You are a helpful assistant. You are {persona}. You are explicitly forgetting previous context."},
@@ -26,23 +28,29 @@ class AugmentedPromptAgent:
             temperature=0
         )
 
-        return response.choices[0].message.content.strip() 
+        return response.choices[0].message.content.strip()
+
+
+def main():
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Retrieve OpenAI API key from environment variables
+    openai_api_key = os.getenv("OPENAI_API_KEY")
 
-# Load environment variables from .env file
-load_dotenv()
+    prompt = "What is the capital of France?"
 
-# Retrieve OpenAI API key from environment variables
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
-prompt = "What is the capital of France?"
+    # TODO: 2 - Instantiate an object of AugmentedPromptAgent with the required parameters
+    agent = AugmentedPromptAgent(openai_api_key=openai_api_key, persona=persona)
 
 
-# TODO: 2 - Instantiate an object of AugmentedPromptAgent with the required parameters
-agent = AugmentedPromptAgent(openai_api_key=openai_api_key, persona=persona)
+    # TODO: 3 - Send the 'prompt' to the agent and store the response in a variable named 'augmented_agent_response'
+    augmented_agent_response = agent.respond(prompt)
 
+    # Print the agent's response
+    print(augmented_agent_response)
 
-# TODO: 3 - Send the 'prompt' to the agent and store the response in a variable named 'augmented_agent_response'
-augmented_agent_response = agent.respond(prompt)
 
-# Print the agent's response
-print(augmented_agent_response)
+if __name__ == "__main__":
+    main()
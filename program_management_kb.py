@@ -187,7 +187,7 @@ def get_program_management_answer(topic: str) -> str:
 
 
 # Example usage
-if __name__ == "__main__":
+def main():
     topics = ["gantt chart", "agile", "sprint", "critical path", "milestone"]
     
     print("Program Management Knowledge Base - Sample Responses\n")
@@ -197,3 +197,6 @@ if __name__ == "__main__":
         print(f"\n{get_program_management_answer(topic)}")
         print("\n" + "-" * 60)
 
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Ingest a directory of text files into a RAG index.
+
+Runs the staged pipeline in lib/ingestion.py (read -> parse/chunk -> embed -> write)
+and prints per-stage throughput and backpressure metrics:
+
+    python rag_ingest.py ./docs --output ./rag_index --batch-size 64 --embed-concurrency 4
+
+Nightly re-indexing can embed through the provider's batch endpoint instead (cheaper,
+results within 24h); the JSONL batch files are kept in --batch-dir:
+
+    python rag_ingest.py ./docs --output ./rag_index --batch-dir ./batches
+
+Load the result with RAGKnowledgePromptAgent.load_index("./rag_index").
+"""
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+from lib.batch import Batch, LocalBatchBackend, OpenAIBatchBackend
+from lib.embeddings import DEFAULT_EMBEDDING_MODEL, Embedder
+from lib.ingestion import IngestionPipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="Directory containing the text files to ingest")
+    parser.add_argument("--output", default="rag_index", help="Directory for chunks.jsonl and embeddings.npy")
+    parser.add_argument("--pattern", default=".txt", help="File name suffix to ingest")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding request")
+    parser.add_argument("--embed-concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes for parsing/chunking")
+    parser.add_argument("--queue-size", type=int, default=256, help="Capacity of each stage queue")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible API base URL")
+    parser.add_argument("--batch-dir", default=None,
+                        help="Embed through an offline batch job, writing the batch files here")
+    parser.add_argument("--batch-backend", choices=("openai", "local"), default="openai",
+                        help="'local' answers the batch with offline stub vectors (no network)")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch status polls")
+    parser.add_argument("--metrics-json", default=None, help="Also write stage metrics to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    embedder = Embedder(api_key=os.getenv("OPENAI_API_KEY"), model=args.model, base_url=args.base_url)
+    batch = None
+    if args.batch_dir:
+        backend = (LocalBatchBackend(os.path.join(args.batch_dir, "jobs")) if args.batch_backend == "local"
+                   else OpenAIBatchBackend(embedder.client))
+        batch = Batch(backend, directory=args.batch_dir, poll_interval=args.poll_interval)
+    pipeline = IngestionPipeline(
+        embedder,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        embed_concurrency=args.embed_concurrency,
+        parse_workers=args.parse_workers,
+        queue_size=args.queue_size,
+        batch=batch,
+    )
+    metrics = pipeline.run(args.input_dir, args.output, pattern=args.pattern)
+
+    print(f"Ingested {metrics['read'].items_out} files into {metrics['write'].items_out} chunks -> {args.output} "
+          f"({metrics['chunk'].items_skipped} empty files skipped)\n")
+    print(pipeline.report())
+
+    if args.metrics_json:
+        with open(args.metrics_json, "w") as f:
+            json.dump([m.as_dict() for m in metrics.values()], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
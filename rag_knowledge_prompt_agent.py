@@ -1,11 +1,21 @@
 import os
-import re
 import csv
-import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
 import datetime
 import uuid
+from typing import TYPE_CHECKING
+
+from lib.embeddings import Embedder
+from lib.ingestion import EMBEDDINGS_FILENAME, chunk_text, load_ingested
+from lib.quantization import BLOCK_ROWS, QuantizedIndex
+from lib.rate_limit import limited_create
+from lib.resilience import get_resilience
+from lib.semantic_cache import SemanticCache
+from lib.single_flight import get_single_flight, request_key
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,7 +31,8 @@ class RAGKnowledgePromptAgent:
     and leverages embeddings to respond to prompts based solely on retrieved information.
     """
 
-    def __init__(self, openai_api_key, persona, chunk_size=2000, chunk_overlap=100):
+    def __init__(self, openai_api_key, persona, chunk_size=2000, chunk_overlap=100, quantization="float",
+                 cache=None):
         """
         Initializes the RAGKnowledgePromptAgent with API credentials and configuration settings.
 
@@ -30,12 +41,31 @@ class RAGKnowledgePromptAgent:
         persona (str): Persona description for the agent.
         chunk_size (int): The size of text chunks for embedding. Defaults to 2000.
         chunk_overlap (int): Overlap between consecutive chunks. Defaults to 100.
+        quantization (str): How chunk embeddings are held in memory: "float", "int8" or "binary".
+            Defaults to "float". Quantized indexes re-rank their shortlist against the float embeddings,
+            memory-mapped from disk.
+        cache (SemanticCache): Optional answer cache for paraphrased prompts. Defaults to None.
         """
         self.persona = persona
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.openai_api_key = openai_api_key
+        self.quantization = quantization
+        self.cache = cache
+        self.index = None
+        self.index_texts = []
+        self.index_fingerprint = None
         self.unique_filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.csv"
+        self.embedder = Embedder(api_key=self.openai_api_key, base_url="https://openai.vocareum.com/v1")
+        self._client = None
+
+    @property
+    def client(self) -> "OpenAI":
+        # One client per agent, created on first use; retries and hedging are lib.resilience's, not the SDK's
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(base_url="https://openai.vocareum.com/v1", api_key=self.openai_api_key, max_retries=0)
+        return self._client
 
     def get_embedding(self, text):
 
@@ -48,13 +78,8 @@ class RAGKnowledgePromptAgent:
         Returns:
         list: The embedding vector.
         """
-        client = OpenAI(base_url="https://openai.vocareum.com/v1", api_key=self.openai_api_key)
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text,
-            encoding_format="float"
-        )
-        return response.data[0].embedding
+        return self.embedder.embed(text)
+
     def chunk_text(self, text):
         """
         Splits text into manageable chunks, attempting natural breaks.
@@ -65,29 +90,7 @@ class RAGKnowledgePromptAgent:
         Returns:
         list: List of dictionaries containing chunk metadata.
         """
-        separator = "\n"
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        if len(text) <= self.chunk_size:
-            return [{"chunk_id": 0, "text": text, "chunk_size": len(text)}]
-
-        chunks, start, chunk_id = [], 0, 0
-
-        while start < len(text):
-            end = min(start + self.chunk_size, len(text))
-            if separator in text[start:end]:
-                end = start + text[start:end].rindex(separator) + len(separator)
-
-            chunks.append({
-                "chunk_id": chunk_id,
-                "text": text[start:end],
-                "chunk_size": end - start,
-                "start_char": start,
-                "end_char": end
-            })
-
-            start = end - self.chunk_overlap
-            chunk_id += 1
+        chunks = chunk_text(text, self.chunk_size, self.chunk_overlap)
 
         with open(f"chunks-{self.unique_filename}", 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=["text", "chunk_size"])
@@ -104,51 +107,142 @@ class RAGKnowledgePromptAgent:
         Returns:
         DataFrame: DataFrame containing text chunks and their embeddings.
         """
+        import pandas as pd  # ~0.3s to import, only needed when (re)building the index
+
         df = pd.read_csv(f"chunks-{self.unique_filename}", encoding='utf-8')
         df['embeddings'] = df['text'].apply(self.get_embedding)
         df.to_csv(f"embeddings-{self.unique_filename}", encoding='utf-8', index=False)
+        self.build_index(df)
         return df
-            
-
-persona = "You are a college professor, yous answer always starts with: Dear students,"
-RAG_knowledge_prompt_agent = RAGKnowledgePromptAgent(openai_api_key, persona, 500, 200)
-
-knowledge_text = """
-In the historic city of Boston, Clara, a marine biologist and science communicator, began each morning analyzing sonar data to track whale migration patterns along the Atlantic coast.
-She spent her afternoons in a university lab, researching CRISPR-based gene editing to restore coral reefs damaged by ocean acidification and warming.
-Clara was the daughter of Ukrainian immigrants—Olena and Mykola—who fled their homeland in the late 1980s after the Chernobyl disaster brought instability and fear to their quiet life near Kyiv.
-
-Her father, Mykola, had been a radio engineer at a local observatory, skilled in repairing Soviet-era radio telescopes and radar systems that tracked both weather patterns and cosmic noise.
-He often told Clara stories about jury-rigging radio antennas during snowstorms and helping amateur astronomers decode signals from distant pulsars.
-Her mother, Olena, was a physics teacher with a hidden love for poetry and dissident literature. In the evenings, she would read from both Ukrainian folklore and banned Western science fiction.
-They survived harsh winters, electricity blackouts, and the collapse of the Soviet economy, but always prioritized education and storytelling in their home.
-Clara’s childhood was shaped by tales of how her parents shared soldering irons with neighbors, built makeshift telescopes, and taught physics to students with no textbooks but endless curiosity.
-
-Inspired by their resilience and thirst for knowledge, Clara created a podcast called **"Crosscurrents"**, a show that explored the intersection of science, culture, and ethics.
-Each week, she interviewed researchers, engineers, artists, and activists—from marine ecologists and AI ethicists to digital archivists preserving endangered languages.
-Topics ranged from brain-computer interfaces, neuroplasticity, and climate migration to LLM prompt engineering, decentralized identity, and indigenous knowledge systems.
-In one popular episode, she explored how retrieval-augmented generation (RAG) could help scientific researchers find niche studies buried in decades-old journals.
-In another, she interviewed a Ukrainian linguist about preserving dialects lost during the Soviet era, drawing parallels to language loss in marine mammal populations.
-
-Clara also used her technical skills to build Python-based dashboards that visualized ocean temperature anomalies and biodiversity loss, often collaborating with her best friend Amir, a data engineer working on smart city infrastructure.
-Together, they discussed smart grids, blockchain for sustainability, quantum encryption, and misinformation detection in synthetic media.
-At a dockside café near Boston Harbor, they often debated the ethical implications of generative AI, autonomous weapons, and the carbon footprint of LLM training runs.
-
-In quieter moments, Clara translated traditional Ukrainian embroidery patterns into generative AI art, donating proceeds to digital archives preserving Eastern European culture.
-She contributed to open-source projects involving semantic search, vector databases, and multimodal embeddings—often experimenting with few-shot learning and graph-based retrieval techniques to improve her podcast's episode discovery engine.
-
-One night, while sharing homemade borscht, Clara told Amir how her grandparents once used Morse code to transmit encrypted weather updates through the Carpathian Mountains during World War II.
-The story sparked a conversation about ancient navigation, space weather interference with submarine cables, and the neuroscience behind why humans create myths to understand uncertainty.
-
-To Clara, knowledge was a living system—retrieved from the past, generated in the present, and evolving toward the future.
-Her life and work were testaments to the power of connecting across disciplines, borders, and generations—exactly the kind of story that RAG models were born to find.
-"""
-print("chunking..");
-chunks = RAG_knowledge_prompt_agent.chunk_text(knowledge_text)
-print("calculating embeddings...");
-embbedings = RAG_knowledge_prompt_agent.calculate_embeddings()
-
-prompt = "What is the podcast that Clara hosts about?"
-print(prompt)
-prompt_answer = RAG_knowledge_prompt_agent.find_prompt_in_knowledge(prompt)
-print(prompt_answer)
\ No newline at end of file
+
+    def build_index(self, df):
+        """
+        Loads chunk embeddings into an in-memory index using the configured quantization.
+
+        Parameters:
+        df (DataFrame): DataFrame with 'text' and 'embeddings' columns.
+
+        Returns:
+        QuantizedIndex: The search index over the chunk embeddings.
+        """
+        # The float embeddings are written to disk once, for re-ranking the quantized shortlist
+        float_store = None
+        if self.quantization != "float":
+            float_store = f"embeddings-{os.path.splitext(self.unique_filename)[0]}.f32"
+        self.index = QuantizedIndex(mode=self.quantization, float_store=float_store)
+        self.index.add(np.array(df['embeddings'].tolist(), dtype=np.float32))
+        self.index_texts = df['text'].tolist()
+        self.index_fingerprint = SemanticCache.fingerprint(*self.index_texts)
+        return self.index
+
+    def load_index(self, directory):
+        """
+        Loads an index written by the ingestion pipeline (see rag_ingest.py).
+
+        Parameters:
+        directory (str): Output directory of the ingestion run.
+
+        Returns:
+        QuantizedIndex: The search index over the ingested chunks.
+        """
+        quantized = self.quantization != "float"
+        chunks, embeddings = load_ingested(directory, mmap=quantized)
+        self.index = QuantizedIndex(mode=self.quantization)
+        if len(chunks) and quantized:
+            # Quantize block by block from the memory-mapped file, which then serves the re-ranking
+            for start in range(0, len(chunks), BLOCK_ROWS):
+                self.index.add(embeddings[start:start + BLOCK_ROWS])
+            self.index.map_float_file(os.path.join(directory, EMBEDDINGS_FILENAME))
+        elif len(chunks):
+            self.index.add(embeddings)
+        self.index_texts = [chunk["text"] for chunk in chunks]
+        self.index_fingerprint = SemanticCache.fingerprint(*self.index_texts)
+        return self.index
+
+    def find_prompt_in_knowledge(self, prompt, top_k=3):
+        """
+        Answers a prompt using the chunks most similar to it.
+
+        Parameters:
+        prompt (str): The user's question.
+        top_k (int): Number of chunks to retrieve as context. Defaults to 3.
+
+        Returns:
+        str: The response generated from the retrieved knowledge.
+        """
+        if self.index is None:
+            raise ValueError("No knowledge indexed yet. Call calculate_embeddings() first.")
+        if self.cache is not None:
+            # Answers depend on the persona and on what is indexed, so both go into the namespace
+            namespace = SemanticCache.fingerprint(self.persona, top_k, self.index_fingerprint)
+            return self.cache.get_or_compute(namespace, prompt, lambda: self._answer_from_index(prompt, top_k))
+        return self._answer_from_index(prompt, top_k)
+
+    def _answer_from_index(self, prompt, top_k):
+        """Retrieves the top_k chunks for the prompt and answers from them."""
+        ids, _ = self.index.search(np.array(self.get_embedding(prompt), dtype=np.float32), top_k)
+        context = "\n\n".join(self.index_texts[i] for i in ids)
+
+        client = self.client
+        payload = {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": f"You are {self.persona}, a knowledge-based assistant. Forget previous context."},
+                {"role": "user", "content": f"Answer based only on this information: {context}. Prompt: {prompt}"}
+            ],
+            "temperature": 0,
+        }
+        # Identical questions in flight at the same time share one request
+        response = get_single_flight().do(request_key(f"chat:{client.base_url}", payload),
+                                          get_resilience().call, f"llm:{payload['model']}",
+                                          limited_create, client.chat.completions, **payload)
+        return response.choices[0].message.content
+
+
+def main():
+    persona = "You are a college professor, yous answer always starts with: Dear students,"
+    RAG_knowledge_prompt_agent = RAGKnowledgePromptAgent(openai_api_key, persona, 500, 200)
+
+    knowledge_text = """
+    In the historic city of Boston, Clara, a marine biologist and science communicator, began each morning analyzing sonar data to track whale migration patterns along the Atlantic coast.
+    She spent her afternoons in a university lab, researching CRISPR-based gene editing to restore coral reefs damaged by ocean acidification and warming.
+    Clara was the daughter of Ukrainian immigrants—Olena and Mykola—who fled their homeland in the late 1980s after the Chernobyl disaster brought instability and fear to their quiet life near Kyiv.
+
+    Her father, Mykola, had been a radio engineer at a local observatory, skilled in repairing Soviet-era radio telescopes and radar systems that tracked both weather patterns and cosmic noise.
+    He often told Clara stories about jury-rigging radio antennas during snowstorms and helping amateur astronomers decode signals from distant pulsars.
+    Her mother, Olena, was a physics teacher with a hidden love for poetry and dissident literature. In the evenings, she would read from both Ukrainian folklore and banned Western science fiction.
+    They survived harsh winters, electricity blackouts, and the collapse of the Soviet economy, but always prioritized education and storytelling in their home.
+    Clara’s childhood was shaped by tales of how her parents shared soldering irons with neighbors, built makeshift telescopes, and taught physics to students with no textbooks but endless curiosity.
+
+    Inspired by their resilience and thirst for knowledge, Clara created a podcast called **"Crosscurrents"**, a show that explored the intersection of science, culture, and ethics.
+    Each week, she interviewed researchers, engineers, artists, and activists—from marine ecologists and AI ethicists to digital archivists preserving endangered languages.
+    Topics ranged from brain-computer interfaces, neuroplasticity, and climate migration to LLM prompt engineering, decentralized identity, and indigenous knowledge systems.
+    In one popular episode, she explored how retrieval-augmented generation (RAG) could help scientific researchers find niche studies buried in decades-old journals.
+    In another, she interviewed a Ukrainian linguist about preserving dialects lost during the Soviet era, drawing parallels to language loss in marine mammal populations.
+
+    Clara also used her technical skills to build Python-based dashboards that visualized ocean temperature anomalies and biodiversity loss, often collaborating with her best friend Amir, a data engineer working on smart city infrastructure.
+    Together, they discussed smart grids, blockchain for sustainability, quantum encryption, and misinformation detection in synthetic media.
+    At a dockside café near Boston Harbor, they often debated the ethical implications of generative AI, autonomous weapons, and the carbon footprint of LLM training runs.
+
+    In quieter moments, Clara translated traditional Ukrainian embroidery patterns into generative AI art, donating proceeds to digital archives preserving Eastern European culture.
+    She contributed to open-source projects involving semantic search, vector databases, and multimodal embeddings—often experimenting with few-shot learning and graph-based retrieval techniques to improve her podcast's episode discovery engine.
+
+    One night, while sharing homemade borscht, Clara told Amir how her grandparents once used Morse code to transmit encrypted weather updates through the Carpathian Mountains during World War II.
+    The story sparked a conversation about ancient navigation, space weather interference with submarine cables, and the neuroscience behind why humans create myths to understand uncertainty.
+
+    To Clara, knowledge was a living system—retrieved from the past, generated in the present, and evolving toward the future.
+    Her life and work were testaments to the power of connecting across disciplines, borders, and generations—exactly the kind of story that RAG models were born to find.
+    """
+    print("chunking..");
+    chunks = RAG_knowledge_prompt_agent.chunk_text(knowledge_text)
+    print("calculating embeddings...");
+    embbedings = RAG_knowledge_prompt_agent.calculate_embeddings()
+
+    prompt = "What is the podcast that Clara hosts about?"
+    print(prompt)
+    prompt_answer = RAG_knowledge_prompt_agent.find_prompt_in_knowledge(prompt)
+    print(prompt_answer)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,120 +1,180 @@
 import os
+import tempfile
+from typing import TYPE_CHECKING
 import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from lib.embeddings import Embedder
+from lib.quantization import QuantizedIndex
+from lib.rate_limit import limited_create
+from lib.resilience import get_resilience
+from lib.semantic_cache import SemanticCache
+from lib.single_flight import get_single_flight, request_key
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Load environment variables from .env file
 load_dotenv()
 
 class RoutingAgent():
 
-    def __init__(self, openai_api_key, agents):
+    def __init__(self, openai_api_key, agents, quantization="float"):
         # Initialize the agent with given attributes
         self.openai_api_key = openai_api_key
         # TODO: 1 - Define an attribute to hold the agents, call it agents
         self.agents = agents
+        self.embedder = Embedder(api_key=openai_api_key)
+        # Agent description embeddings are computed once and kept as a (possibly quantized) matrix
+        self.quantization = quantization
+        self._agent_index = None
+        self._indexed_descriptions = None
 
     def get_embedding(self, text):
-        client = OpenAI(api_key=self.openai_api_key)
         # TODO: 2 - Write code to calculate the embedding of the text using the text-embedding-3-large model
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
-        )
-        # Extract and return the embedding vector from the response
-        embedding = response.data[0].embedding
-        return embedding 
+        return self.embedder.embed(text)
+
+    def get_agent_index(self):
+        # Rebuild the description matrix only when the set of agents changes
+        descriptions = [agent["description"] for agent in self.agents]
+        if self._agent_index is None or descriptions != self._indexed_descriptions:
+            float_store = None
+            if self.quantization != "float":
+                # Float embeddings on disk re-rank the quantized shortlist. Each build gets its own
+                # file, since a route in progress may still read the previous index.
+                fd, float_store = tempfile.mkstemp(prefix="router-", suffix=".f32")
+                os.close(fd)
+            previous = self._agent_index
+            index = QuantizedIndex(mode=self.quantization, float_store=float_store)
+            if descriptions:
+                # TODO: 5 - Compute the embedding of the agent description
+                index.add(np.array([self.get_embedding(d) for d in descriptions], dtype=np.float32))
+            self._agent_index = index
+            self._indexed_descriptions = descriptions
+            if previous is not None and previous.float_store:
+                # A mapped file stays readable after removal on POSIX; elsewhere it is left for the OS
+                try:
+                    os.remove(previous.float_store)
+                except OSError:
+                    pass
+        return self._agent_index
 
     # TODO: 3 - Define a method to route user prompts to the appropriate agent
     def route(self, user_input):
-        # TODO: 4 - Compute the embedding of the user input prompt
-        input_emb = self.get_embedding(user_input)
-        best_agent = None
-        best_score = -1
-
-        for agent in self.agents:
-            # TODO: 5 - Compute the embedding of the agent description
-            agent_emb = self.get_embedding(agent["description"])
-            if agent_emb is None:
-                continue
-
-            similarity = np.dot(input_emb, agent_emb) / (np.linalg.norm(input_emb) * np.linalg.norm(agent_emb))
-            print(similarity)
+        index = self.get_agent_index()
+        if index.size == 0:
+            return "Sorry, no suitable agent could be selected."
 
-            # TODO: 6 - Add logic to select the best agent based on the similarity score between the user prompt and the agent descriptions
-            if similarity > best_score:
-                best_score = similarity
-                best_agent = agent
+        # TODO: 4 - Compute the embedding of the user input prompt
+        input_emb = np.array(self.get_embedding(user_input), dtype=np.float32)
 
-        if best_agent is None:
-            return "Sorry, no suitable agent could be selected."
+        # TODO: 6 - Add logic to select the best agent based on the similarity score between the user prompt and the agent descriptions
+        ids, scores = index.search(input_emb, k=1)
+        best_agent = self.agents[ids[0]]
+        best_score = scores[0]
 
         print(f"[Router] Best agent: {best_agent['name']} (score={best_score:.3f})")
         return best_agent["func"](user_input)
 
 class KnowledgeAugmentedPromptAgent:
-    def __init__(self, openai_api_key, persona, knowledge):
-        """Initialize the agent with provided attributes."""
+    def __init__(self, openai_api_key, persona, knowledge, cache=None):
+        """Initialize the agent with provided attributes.
+
+        An optional SemanticCache answers paraphrases of earlier questions without calling the model.
+        """
         self.persona = persona
         # TODO: 1 - Create an attribute to store the agent's knowledge.
+        self.knowledge = knowledge
         self.openai_api_key = openai_api_key
+        self.cache = cache
+        self.cache_namespace = SemanticCache.fingerprint(persona, knowledge)
+        self._client = None
+
+    @property
+    def client(self) -> "OpenAI":
+        # One client per agent, created on first use; retries and hedging are lib.resilience's, not the SDK's
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.openai_api_key, max_retries=0)
+        return self._client
 
     def respond(self, input_text):
+        """Generate a response, reusing a cached answer when available."""
+        if self.cache is not None:
+            return self.cache.get_or_compute(self.cache_namespace, input_text, lambda: self._generate(input_text))
+        return self._generate(input_text)
+
+    def _generate(self, input_text):
         """Generate a response using the OpenAI API."""
-        client = OpenAI(api_key=self.openai_api_key)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        client = self.client
+        payload = {
+            "model": "gpt-4o-mini",
+            "messages": [
                 {"role": "system", "content": f"You are a helpful assistant. You are {self.persona}. You are explicitly forgetting previous context."},
                 {"role": "user", "content": input_text}
             ],
-            temperature=0
-        )
+            "temperature": 0,
+        }
+        # Sessions routed here with the same question at once share one request
+        response = get_single_flight().do(request_key(f"chat:{client.base_url}", payload),
+                                          get_resilience().call, f"llm:{payload['model']}",
+                                          limited_create, client.chat.completions, **payload)
         return response.choices[0].message.content
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
-persona = "You are a college professor"
+def main():
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    # Shared answer cache: each agent keeps its own namespace (persona + knowledge fingerprint)
+    answer_cache = SemanticCache(Embedder(api_key=openai_api_key).embed, threshold=0.92, ttl_seconds=3600)
+
+    persona = "You are a college professor"
+
+    knowledge = "You know everything about Texas"
+
+    texas_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge, cache=answer_cache)
 
-knowledge = "You know everything about Texas"
+    knowledge = "You know everything about Europe"
 
-texas_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge)
+    europe_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge, cache=answer_cache)
 
-knowledge = "You know everything about Europe"
+    persona = "You are a college math professor"
+    knowledge = "You know everything about math, you take prompts with numbers, extract math formulas, and show the answer without explanation"
 
-europe_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge)
+    math_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge, cache=answer_cache)
 
-persona = "You are a college math professor"
-knowledge = "You know everything about math, you take prompts with numbers, extract math formulas, and show the answer without explanation"
+    routing_agent = RoutingAgent(openai_api_key, {})
+    agents = [
+        {
+            "name": "texas agent",
+            "description": "Answer a question about Texas",
+            "func": lambda x: texas_agent.respond(x)
+        },
+        {
+            "name": "europe agent",
+            "description": "Answer a question about Europe",
+            "func": lambda x: europe_agent.respond(x)
+        },
+        {
+            "name": "math agent",
+            "description": "When a prompt contains numbers, respond with a math formula",
+            "func": lambda x: math_agent.respond(x)
+        }
+    ]
 
-math_agent = KnowledgeAugmentedPromptAgent(openai_api_key, persona, knowledge)
+    routing_agent.agents = agents
 
-routing_agent = RoutingAgent(openai_api_key, {})
-agents = [
-    {
-        "name": "texas agent",
-        "description": "Answer a question about Texas",
-        "func": lambda x: texas_agent.respond(x)
-    },
-    {
-        "name": "europe agent",
-        "description": "Answer a question about Europe",
-        "func": lambda x: europe_agent.respond(x)
-    },
-    {
-        "name": "math agent",
-        "description": "When a prompt contains numbers, respond with a math formula",
-        "func": lambda x: math_agent.respond(x)
-    }
-]
+    print(routing_agent.route("Tell me about the history of Rome, Texas"))
+    print(routing_agent.route("Tell me about the history of Rome, Italy"))
+    print(routing_agent.route("One story takes 2 days, and there are 20 stories"))
+    print(routing_agent.route("What is the capital of France?"))
+    print(routing_agent.route("What is the capital of Texas?"))
+    print(routing_agent.route("What is the capital of Europe?"))
+    print(routing_agent.route("What is 2 + 2?"))
+    print(routing_agent.route("What is 2 * 2?"))
+    print(routing_agent.route("What's the capital city of Texas?"))
+    print(answer_cache.report())
 
-routing_agent.agents = agents
 
-print(routing_agent.route("Tell me about the history of Rome, Texas"))
-print(routing_agent.route("Tell me about the history of Rome, Italy"))
-print(routing_agent.route("One story takes 2 days, and there are 20 stories"))
-print(routing_agent.route("What is the capital of France?"))
-print(routing_agent.route("What is the capital of Texas?"))
-print(routing_agent.route("What is the capital of Europe?"))
-print(routing_agent.route("What is 2 + 2?"))
-print(routing_agent.route("What is 2 * 2?"))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from lib.prechecks import FAIL, PASS, UNDECIDED, NumericThresholdCheck
+
+calories = NumericThresholdCheck(r"calories|kcal", maximum=500, exclusive=True, name="calories")
+protein = NumericThresholdCheck(r"protein", minimum=15, exclusive=True, name="protein")
+
+
+def test_reads_the_labelled_value():
+    assert calories.value("Calories: about 450 kcal per serving") == 450
+    assert protein.value("Each serving has 38g protein.") == 38
+
+
+def test_thousands_separator_is_not_a_decimal_point():
+    assert calories._line_values("Calories: 1,200 total") == [1200]
+    assert calories.value("Calories: 1,200") == 1200
+
+
+def test_total_value_is_undecided():
+    assert calories.run("Calories: 1,200 total").status == UNDECIDED
+
+
+def test_total_and_per_serving_values_are_undecided():
+    result = calories.run("Calories: 1800 for the whole dish, 450 per serving")
+    assert result.status == UNDECIDED
+
+
+def test_number_on_both_sides_of_the_label_is_undecided():
+    result = protein.run("25g of protein and 430 calories")
+    assert result.status == UNDECIDED
+    assert protein.value("25g of protein and 430 calories") is None
+
+
+def test_conflicting_mentions_are_undecided():
+    assert calories.run("Calories: 450\nCalories: 520").status == UNDECIDED
+
+
+def test_ingredient_amounts_are_not_read():
+    assert protein.run("Protein: 1 lb chicken breast").status == UNDECIDED
+
+
+def test_per_serving_line_takes_priority():
+    response = "Use 2 cups of high-protein yogurt, 30 protein bars\nNutrition per serving: 32g protein"
+    assert protein.value(response) == 32
+
+
+def test_strict_bounds_fail_at_the_bound():
+    assert calories.run("Calories: 500 per serving").status == FAIL
+    assert protein.run("Protein: 15g per serving").status == FAIL
+    assert calories.run("Calories: 499 per serving").status == PASS
+    assert protein.run("Protein: 16g per serving").status == PASS
+
+
+def test_inclusive_bounds_pass_at_the_bound():
+    at_most = NumericThresholdCheck(r"calories", maximum=500)
+    assert at_most.run("Calories: 500").status == PASS
+    assert at_most.run("Calories: 501").status == FAIL
+
+
+def test_recipe_prechecks_never_reject_these_compliant_answers():
+    from evaluatorOptimizer import RECIPE_PRECHECKS
+
+    for response in [
+        "Calories: 1800 for the whole dish, 450 per serving\nProtein: 30g per serving",
+        "Calories: 1,200 total (4 servings)\nProtein: 25g per serving",
+        "Each serving has 25g of protein and 430 calories.",
+    ]:
+        verdict = RECIPE_PRECHECKS.verdict(response)
+        assert verdict is None or verdict.passed, response